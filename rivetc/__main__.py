@@ -4,6 +4,23 @@
 
 import sys
 
+args = sys.argv[1:]
+if len(args) > 0 and args[0] == "--client":
+    import client
+    args = args[1:]
+    if (exit_code := client.run(args)) != None:
+        exit(exit_code)
+    # no server running, compile in this process
+
 from src import Compiler
 
-Compiler(sys.argv[1:]).run()
+if len(args) > 0 and args[0] == "--server":
+    from src import server
+    server.Server().serve()
+else:
+    comp = Compiler(args)
+    if comp.prefs.watch:
+        from src import watch
+        watch.Watcher(args).watch()
+    else:
+        comp.run()
@@ -0,0 +1,37 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Thin client of the compiler server (see `src/server.py`), it does not
+# import the compiler, so it starts as fast as possible.
+
+from os import path
+import os, sys, json, socket
+
+SOCKET_PATH = path.join(path.expanduser("~"), ".rivet_lang", "server.sock")
+
+# Sends the build to the server and returns its exit code, or `None` if
+# there is no server running.
+def run(args):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(SOCKET_PATH)
+        except OSError:
+            return None
+        req = json.dumps({"cwd": os.getcwd(), "args": args})
+        socket.send_fds(sock, [req.encode()], [0, 1, 2])
+        res = b""
+        while chunk := sock.recv(4096):
+            res += chunk
+    if len(res) == 0:
+        print(
+            "rivetc: error: the compiler server closed the connection",
+            file = sys.stderr
+        )
+        return 1
+    res = json.loads(res)
+    if "error" in res:
+        print(
+            f"rivetc: error: compiler server: {res['error']}", file = sys.stderr
+        )
+    return res["exit_code"]
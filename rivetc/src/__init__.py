@@ -3,24 +3,64 @@
 # be found in the LICENSE file.
 
 from os import path
-import os, copy, glob
+import os, io, copy, glob, contextlib
+from concurrent import futures
 
 from . import (
-    ast, sym, type, token, prefs, report, utils,
+    ast, sym, type, token, prefs, report, utils, cache, stats,
 
     # stages
-    parser, register, resolver, checker, codegen
+    parser, register, resolver, checker, codegen, rechecker
 )
 
+class ParseJob:
+    def __init__(self, future, mod_sym, file):
+        self.future = future
+        self.mod_sym = mod_sym
+        self.file = file
+
+# State of each worker process used by the parallel frontend (see `-j`).
+_worker_comp = None
+
+def _init_parse_worker(args):
+    global _worker_comp
+    _worker_comp = Compiler(args)
+
+def _parse_file_worker(mod_name, is_root, file):
+    mod_sym = sym.Mod(False, mod_name)
+    mod_sym.is_root = is_root
+    report.ERRORS = 0
+    report.WARNS = 0
+    tokens = _worker_comp.stats.counters["tokens"]
+    output = io.StringIO()
+    with contextlib.redirect_stderr(output):
+        p = parser.Parser(_worker_comp)
+        p.mod_sym = mod_sym
+        source_file = p.parse_file(file)
+    mod_annotations = []
+    if mod_sym.annotations:
+        mod_annotations = mod_sym.annotations.annotations
+    return cache.dumps_ast(
+        _worker_comp, (
+            source_file, mod_annotations, report.ERRORS, report.WARNS,
+            output.getvalue(), _worker_comp.stats.counters["tokens"] - tokens
+        ), mod_sym
+    )
+
 class Compiler:
     def __init__(self, args):
-        #  `universe` is the mega-module where all the modules being
-        #  compiled reside.
-        self.universe = sym.universe()
+        self.args = args
 
         self.prefs = prefs.Prefs(args)
+        self.stats = stats.Stats(len(self.prefs.stats_format) > 0)
         self.pointer_size = 8 if self.prefs.target_bits == prefs.Bits.X64 else 4
 
+        #  `universe` is the mega-module where all the modules being
+        #  compiled reside.
+        self.universe = sym.universe(self.pointer_size * 8)
+        # values of the preprocessor symbols already evaluated
+        self.pp_symbols = {}
+
         self.core_mod = None
         self.vec_sym = None # from `core` module
         self.error_sym = None # from `core` module
@@ -50,35 +90,62 @@ class Compiler:
         self.mut_anyptr_t = type.Ptr(self.void_t, True)
         self.error_t = None # updated in register
 
+        self.ast_cache = cache.ASTCache(self) if self.prefs.use_cache else None
+        self.module_index = cache.ModuleIndex(self)
+
+        # `core` already checked, used by the compiler server (see
+        # `server.py`).
+        self.core_snapshot = None
+        # called after checking the modules imported by the root module,
+        # before checking it (see `watch.py`).
+        self.on_deps_checked = None
+        # `rechecker.Rechecker`, keeps the state of the root module
+        # between the builds of the watch mode.
+        self.rechecker = None
+
+        self.parse_pool = None
         self.parsed_files = []
         self.source_files = []
 
+        self.init_stages()
+
+        self.exit_code = 0
+
+    def init_stages(self):
         self.register = register.Register(self)
         self.resolver = resolver.Resolver(self)
         self.checker = checker.Checker(self)
         self.codegen = codegen.Codegen(self)
 
-        self.exit_code = 0
-
     def import_modules(self):
-        for sf in self.parsed_files:
+        i = 0
+        while i < len(self.parsed_files):
+            with self.stats.timed("parsing"):
+                sf = self.wait_parsed_file(i)
+            i += 1
             for decl in sf.decls:
                 if isinstance(decl, ast.ImportDecl):
-                    mod = self.load_module_files(
-                        decl.path, decl.alias, sf.file, decl.pos
-                    )
+                    with self.stats.timed("imports"):
+                        mod = self.load_module_files(
+                            decl.path, decl.alias, sf.file, decl.pos
+                        )
                     if mod.found:
                         if mod_sym_ := self.universe.find(mod.full_name):
                             mod_sym = mod_sym_ # module already imported
                         else:
                             mod_sym = sym.Mod(False, mod.full_name)
                             self.universe.add(mod_sym)
-                            self.parsed_files += parser.Parser(self).parse_mod(
+                            self.parsed_files += self.parse_files(
                                 mod_sym, mod.files
                             )
                         decl.alias = mod.alias
                         decl.mod_sym = mod_sym
-        self.resolve_deps()
+        if self.parse_pool:
+            self.parse_pool.shutdown(cancel_futures = True)
+            self.parse_pool = None
+        with self.stats.timed("imports"):
+            self.module_index.save()
+            self.resolve_deps()
         if report.ERRORS > 0:
             self.abort()
 
@@ -99,21 +166,25 @@ class Compiler:
             for node in g_resolved.nodes:
                 utils.eprint(f" > {node.name}")
             utils.eprint("-----------------------------------------")
+        mod_files = {}
+        for fp in self.parsed_files:
+            if fp.sym:
+                mod_files.setdefault(fp.sym.name, []).append(fp)
         for node in g_resolved.nodes:
-            for fp in self.parsed_files:
-                if not fp.sym:
-                    continue
-                if fp.sym.name == node.name:
-                    self.source_files.append(fp)
+            self.source_files += mod_files.get(node.name, [])
         self.parsed_files.clear()
 
     def import_graph(self):
         g = utils.DepGraph()
+        # modules resolved previously (from the `core` snapshot)
+        resolved_mods = set(sf.sym.name for sf in self.source_files)
         for fp in self.parsed_files:
             if not fp.sym:
                 continue
             deps = []
-            if fp.sym.name not in ["c.libc", "c", "c.ctypes", "core"]:
+            if fp.sym.name not in [
+                "c.libc", "c", "c.ctypes", "core"
+            ] and "core" not in resolved_mods:
                 deps.append("core")
             for d in fp.decls:
                 if isinstance(d, ast.ImportDecl):
@@ -122,36 +193,109 @@ class Compiler:
                     if d.mod_sym.name == fp.sym.name:
                         report.error("import cycle detected", d.pos)
                         continue
+                    if d.mod_sym.name in resolved_mods:
+                        continue
                     deps.append(d.mod_sym.name)
             g.add(fp.sym.name, deps)
         return g
 
     def run(self):
-        self.parsed_files += self.load_module("core", "core", "", token.NO_POS)
+        try:
+            self.build()
+        finally:
+            if self.stats.enabled:
+                self.report_stats()
+
+    def build(self):
+        if self.rechecker and self.rechecker.recheck(self):
+            self.gen_source_files()
+            return
+        if self.core_snapshot:
+            self.vlog("loading `core` module from snapshot...")
+            with self.stats.timed("core snapshot"):
+                self.core_snapshot.restore(self)
+        elif self.prefs.use_cache and not self.prefs.check_syntax:
+            self.load_cached_core()
+        else:
+            self.parsed_files += self.load_module(
+                "core", "core", "", token.NO_POS
+            )
+        checked_files = len(self.source_files)
         self.load_root_module()
+        if self.rechecker and not self.prefs.check_syntax:
+            self.rechecker.scan(self)
         self.import_modules()
         if not self.prefs.check_syntax:
-            self.vlog("registering symbols...")
-            self.register.walk_files(self.source_files)
-            if report.ERRORS > 0:
-                self.abort()
-            self.vlog("resolving symbols...")
-            self.resolver.resolve_files(self.source_files)
-            if report.ERRORS > 0:
-                self.abort()
-            self.vlog("checking files...")
-            self.checker.check_files(self.source_files)
+            source_files = self.source_files[checked_files:]
+            if self.on_deps_checked:
+                deps = [sf for sf in source_files if not sf.sym.is_root]
+                if len(deps) > 0:
+                    self.check_source_files(deps)
+                    self.on_deps_checked(self)
+                    source_files = [sf for sf in source_files if sf.sym.is_root]
+            warns = report.WARNS
+            self.check_source_files(source_files)
+            if self.rechecker:
+                self.rechecker.save(self, warns)
+            self.gen_source_files()
+
+    def gen_source_files(self):
+        if not self.prefs.check:
+            self.vlog("generating RIR...")
+            with self.stats.timed("rir"):
+                self.codegen.gen_source_files(self.source_files)
             if report.ERRORS > 0:
                 self.abort()
-            if not self.prefs.check:
-                self.vlog("generating RIR...")
-                self.codegen.gen_source_files(self.source_files)
-                if report.ERRORS > 0:
-                    self.abort()
-            if self.exit_code != 0:
-                exit(self.exit_code)
+        if self.exit_code != 0:
+            exit(self.exit_code)
 
-    def load_root_module(self):
+    # Loads `core` and the modules it imports, and checks them. The result
+    # can be saved with `cache.CoreSnapshot`.
+    def load_core(self):
+        self.parsed_files += self.load_module("core", "core", "", token.NO_POS)
+        self.import_modules()
+        self.check_source_files(self.source_files)
+
+    # Restores `core` from the snapshot saved in the cache, if it is outdated
+    # (or missing) `core` is loaded and a new snapshot is saved.
+    def load_cached_core(self):
+        with self.stats.timed("core snapshot"):
+            if snapshot := cache.CoreSnapshot.load(self):
+                self.vlog("loading `core` module from snapshot...")
+                snapshot.restore(self)
+                return
+        self.load_core()
+        if report.WARNS == 0: # the warnings would be lost
+            self.vlog("saving `core` module snapshot...")
+            with self.stats.timed("core snapshot"):
+                cache.CoreSnapshot(self).save(self)
+
+    def report_stats(self):
+        self.stats.counters["files"] = len(self.source_files)
+        self.stats.counters["ast_nodes"] = stats.count_ast_nodes(
+            self.source_files
+        )
+        self.stats.counters["symbols"] = sym.SYMBOL_COUNT
+        self.stats.report(self.prefs.stats_format, self.prefs.stats_file)
+
+    def check_source_files(self, source_files):
+        self.vlog("registering symbols...")
+        with self.stats.timed("register"):
+            self.register.walk_files(source_files)
+        if report.ERRORS > 0:
+            self.abort()
+        self.vlog("resolving symbols...")
+        with self.stats.timed("resolver"):
+            self.resolver.resolve_files(source_files)
+        if report.ERRORS > 0:
+            self.abort()
+        self.vlog("checking files...")
+        with self.stats.timed("checker"):
+            self.checker.check_files(source_files)
+        if report.ERRORS > 0:
+            self.abort()
+
+    def root_files(self):
         if path.isdir(self.prefs.input):
             files = self.filter_files(
                 glob.glob(path.join(self.prefs.input, "*.ri"))
@@ -161,39 +305,107 @@ class Compiler:
                 files += glob.glob(path.join(src_dir, "*.ri"))
         else:
             files = [self.prefs.input]
+        return files
+
+    def load_root_module(self):
+        files = self.root_files()
         if len(files) == 0:
             utils.error("no input received")
         root_sym = sym.Mod(False, self.prefs.mod_name)
         root_sym.is_root = True
         self.universe.add(root_sym)
         self.vlog("parsing root module files...")
-        self.parsed_files += parser.Parser(self).parse_mod(root_sym, files)
+        self.parsed_files += self.parse_files(root_sym, files)
 
     def load_module(self, pathx, alias, file_path, pos):
-        mod = self.load_module_files(pathx, alias, file_path, pos)
+        with self.stats.timed("imports"):
+            mod = self.load_module_files(pathx, alias, file_path, pos)
         if mod.found:
             mod_sym = sym.Mod(False, mod.full_name)
             self.universe.add(mod_sym)
             self.vlog(f"parsing `{pathx}` module files...")
-            return parser.Parser(self).parse_mod(mod_sym, mod.files)
+            return self.parse_files(mod_sym, mod.files)
         return []
 
+    # Returns the parsed files; with `-j N` they are `ParseJob`s running in
+    # a process pool, which are waited (in order) by `wait_parsed_file`.
+    def parse_files(self, mod_sym, files):
+        if self.prefs.jobs <= 1:
+            with self.stats.timed("parsing"):
+                return parser.Parser(self).parse_mod(mod_sym, files)
+        if self.parse_pool == None:
+            self.vlog(f"starting {self.prefs.jobs} parser processes...")
+            self.parse_pool = futures.ProcessPoolExecutor(
+                self.prefs.jobs, initializer = _init_parse_worker,
+                initargs = (self.args, )
+            )
+        return [
+            ParseJob(
+                self.parse_pool.submit(
+                    _parse_file_worker, mod_sym.name, mod_sym.is_root, file
+                ), mod_sym, file
+            ) for file in files
+        ]
+
+    def wait_parsed_file(self, i):
+        job = self.parsed_files[i]
+        if not isinstance(job, ParseJob):
+            return job
+        p = parser.Parser(self)
+        p.mod_sym = job.mod_sym
+        sf = None
+        # after an error the next files are parsed in this process, so the
+        # reports are the same as in a sequential build
+        if report.ERRORS == 0:
+            try:
+                data = job.future.result()
+                sf, mod_annotations, errors, warns, output, tokens = cache.loads_ast(
+                    self, data, job.mod_sym
+                )
+                utils.eprint(output, end = "")
+                self.stats.count("tokens", tokens)
+                report.ERRORS += errors
+                report.WARNS += warns
+                p.add_mod_annotations(mod_annotations)
+            except Exception:
+                sf = None
+        if sf == None:
+            sf = p.parse_file(job.file)
+        self.parsed_files[i] = sf
+        return sf
+
     def load_module_files(self, pathx, alias, file_path, pos):
+        found, name, full_name, files = self.module_index.find(
+            pathx, file_path
+        )
+        if not found:
+            report.error(f"module `{pathx}` not found", pos)
+        elif len(files) == 0:
+            report.error(f"module `{pathx}` contains no rivet files", pos)
+        return ast.ImportedMod(
+            found, name, name if len(alias) == 0 else alias, full_name, files
+        )
+
+    # Searches the module in the library path (or relative to `file_path`)
+    # and returns `(found, name, full_name, files, dirs)`, `dirs` are the
+    # directories inspected (see `cache.ModuleIndex`).
+    def find_module(self, pathx, file_path):
         found = False
         name = ""
         full_name = ""
         abspath = ""
         files = []
+        dirs = []
         is_super = pathx.startswith("../")
         if pathx.startswith("./") or is_super:
             pathx2 = pathx[3 if is_super else 2:]
             name = pathx2[pathx2.rfind("/") + 1:]
             dirname = path.abspath(path.dirname(file_path))
-            old_wd = os.getcwd()
-            os.chdir(dirname)
-            if path.isdir(pathx):
+            mod_path = path.join(dirname, pathx)
+            dirs.append(mod_path)
+            if path.isdir(mod_path):
                 found = True
-                abspath = path.abspath(pathx)
+                abspath = path.abspath(mod_path)
                 mod_basedir = path.dirname(abspath)
                 if mod_basedir.endswith("/src"):
                     mod_basedir = mod_basedir[:-4] # skip `src/`
@@ -208,8 +420,6 @@ class Compiler:
                     ])
                 else:
                     full_name = ".".join(names)
-            os.chdir(old_wd)
-            if found:
                 files = self.filter_files(
                     glob.glob(path.join(path.relpath(abspath), "*.ri"))
                 )
@@ -218,6 +428,7 @@ class Compiler:
             full_name = pathx.replace("/", ".")
             for l in self.prefs.library_path:
                 mod_path = path.relpath(path.join(l, pathx))
+                dirs.append(mod_path)
                 if path.isdir(mod_path):
                     found = True
                     files = self.filter_files(
@@ -231,6 +442,7 @@ class Compiler:
                     )
                 else:
                     src_dir = path.join(mod_path, "src")
+                dirs.append(src_dir)
                 if path.isdir(src_dir):
                     if not found: found = True
                     files = self.filter_files(
@@ -238,13 +450,7 @@ class Compiler:
                     )
                 if found:
                     break
-        if not found:
-            report.error(f"module `{pathx}` not found", pos)
-        elif len(files) == 0:
-            report.error(f"module `{pathx}` contains no rivet files", pos)
-        return ast.ImportedMod(
-            found, name, name if len(alias) == 0 else alias, full_name, files
-        )
+        return found, name, full_name, files, dirs
 
     def filter_files(self, inputs):
         new_inputs = []
@@ -293,29 +499,36 @@ class Compiler:
 
     # ========================================================
 
+    # Returns the properties of `typ` if it's a number, see `sym.NumberInfo`.
+    def number_info(self, typ):
+        if isinstance(typ, type.Type):
+            info = getattr(typ.sym, "info", None)
+            if isinstance(info, sym.NumberInfo):
+                return info
+        return None
+
     def is_number(self, typ):
-        return self.is_int(typ) or self.is_float(typ)
+        return self.number_info(typ) != None
 
     def is_int(self, typ):
-        return self.is_signed_int(typ) or self.is_unsigned_int(typ)
+        info = self.number_info(typ)
+        return info != None and not info.is_float
 
     def is_signed_int(self, typ):
-        return typ in (
-            self.int8_t, self.int16_t, self.int32_t, self.int64_t, self.isize_t,
-            self.comptime_int_t
-        )
+        info = self.number_info(typ)
+        return info != None and info.is_signed
 
     def is_unsigned_int(self, typ):
-        return typ in (
-            self.uint8_t, self.uint16_t, self.uint32_t, self.uint64_t,
-            self.usize_t
-        )
+        info = self.number_info(typ)
+        return info != None and not (info.is_float or info.is_signed)
 
     def is_float(self, typ):
-        return typ in (self.float32_t, self.float64_t, self.comptime_float_t)
+        info = self.number_info(typ)
+        return info != None and info.is_float
 
     def is_comptime_number(self, typ):
-        return typ == self.comptime_int_t or typ == self.comptime_float_t
+        info = self.number_info(typ)
+        return info != None and info.is_comptime
 
     def comptime_number_to_type(self, typ):
         if typ == self.comptime_int_t:
@@ -325,35 +538,21 @@ class Compiler:
         return typ
 
     def num_bits(self, typ):
-        if self.is_int(typ):
-            return self.int_bits(typ)
-        return self.float_bits(typ)
+        if info := self.number_info(typ):
+            return info.bits
+        return -1
 
     def int_bits(self, typ):
-        typ_sym = typ.symbol()
-        if typ_sym.kind == sym.TypeKind.ComptimeInt:
-            return 75 # only for checker
-        elif typ_sym.kind in (sym.TypeKind.Int8, sym.TypeKind.Uint8):
-            return 8
-        elif typ_sym.kind in (sym.TypeKind.Int16, sym.TypeKind.Uint16):
-            return 16
-        elif typ_sym.kind in (sym.TypeKind.Int32, sym.TypeKind.Uint32):
-            return 32
-        elif typ_sym.kind in (sym.TypeKind.Int64, sym.TypeKind.Uint64):
-            return 64
-        elif typ_sym.kind in (sym.TypeKind.Isize, sym.TypeKind.Usize):
-            return 32 if self.prefs.target_bits == prefs.Bits.X32 else 64
-        else:
+        info = self.number_info(typ)
+        if info == None or info.is_float:
             return -1
+        return info.bits
 
     def float_bits(self, typ):
-        typ_sym = typ.symbol()
-        if typ_sym.kind == sym.TypeKind.Float32:
-            return 32
-        elif typ_sym.kind in (sym.TypeKind.Float64, sym.TypeKind.ComptimeFloat):
-            return 64
-        else:
+        info = self.number_info(typ)
+        if info == None or not info.is_float:
             return -1
+        return info.bits
 
     # Returns the size and alignment (in bytes) of `typ`, similarly to
     # C's `sizeof(T)` and `_Alignof(T)`.
@@ -432,6 +631,16 @@ class Compiler:
         return size, align
 
     def evalue_pp_symbol(self, name, pos):
+        if name not in self.pp_symbols:
+            self.pp_symbols[name] = self.pp_symbol_value(name)
+        value = self.pp_symbols[name]
+        if value == None:
+            report.error(f"unknown builtin flag: `{name}`", pos)
+            return False
+        return value
+
+    # Returns `None` for unknown builtin flags.
+    def pp_symbol_value(self, name):
         # operating systems
         if name in ("_LINUX_", "_WINDOWS_"):
             return self.prefs.target_os.equals_to_string(name)
@@ -456,8 +665,7 @@ class Compiler:
                 return self.prefs.build_mode == prefs.BuildMode.Release
             return self.prefs.build_mode == prefs.BuildMode.Test
         elif name.startswith("_") and name.endswith("_"):
-            report.error(f"unknown builtin flag: `{name}`", pos)
-            return False
+            return None
         return name in self.prefs.flags
 
     # ========================================================
@@ -13,11 +13,21 @@ def is_comptime_constant(name):
     return name in COMPTIME_CONSTANTS
 
 class SourceFile:
+    __slots__ = ("file", "sym", "decls", "imported_symbols", "deps", "text")
+
     def __init__(self, file, decls, sym):
         self.file = file
         self.sym = sym
         self.decls = decls
         self.imported_symbols = {}
+        # the text that was parsed, kept for the skipped function bodies (see
+        # `LazyBody`), so that they are parsed from the same text even if
+        # the file is modified during the build
+        self.text = None
+        # the symbols used by the declarations of the root module, outside
+        # of functions, constants, variables and tests (see
+        # `rechecker.py`), each of these has its own `deps`
+        self.deps = None
 
     def find_imported_symbol(self, name):
         if name in self.imported_symbols:
@@ -32,6 +42,10 @@ class SourceFile:
 
 # Used in variable decls/stmts and guard exprs
 class ObjDecl:
+    __slots__ = (
+        "is_mut", "is_ref", "name", "has_typ", "typ", "level", "pos", "sym"
+    )
+
     def __init__(self, is_mut, is_ref, name, has_typ, typ, level, pos):
         self.is_mut = is_mut
         self.is_ref = is_ref
@@ -58,10 +72,14 @@ class ObjDecl:
 
 # ---- Declarations ----
 class EmptyDecl:
+    __slots__ = ("annotations", )
+
     def __init__(self):
         self.annotations = Annotations()
 
 class DocComment:
+    __slots__ = ("lines", "pos")
+
     def __init__(self, lines, pos):
         self.lines = lines
         self.pos = pos
@@ -80,12 +98,16 @@ class DocComment:
         return res
 
 class AnnotationArg:
+    __slots__ = ("name", "expr", "is_named")
+
     def __init__(self, name, expr):
         self.name = name
         self.expr = expr
         self.is_named = name != ""
 
 class Annotation:
+    __slots__ = ("name", "args", "pos")
+
     def __init__(self, name, args, pos):
         self.name = name
         self.args = args
@@ -98,6 +120,8 @@ class Annotation:
         return None
 
 class Annotations:
+    __slots__ = ("annotations", )
+
     def __init__(self):
         self.annotations = []
 
@@ -119,6 +143,11 @@ class Annotations:
         return len(self.annotations) > 0
 
 class ImportDecl:
+    __slots__ = (
+        "annotations", "is_public", "path", "alias", "glob", "import_list",
+        "mod_sym", "pos"
+    )
+
     def __init__(
         self, annotations, is_public, path, alias, glob, import_list, pos
     ):
@@ -132,12 +161,16 @@ class ImportDecl:
         self.pos = pos
 
 class ImportListInfo:
+    __slots__ = ("name", "alias", "pos")
+
     def __init__(self, name, alias, pos):
         self.name = name
         self.alias = alias
         self.pos = pos
 
 class ImportedMod:
+    __slots__ = ("found", "name", "alias", "full_name", "files")
+
     def __init__(self, found, name, alias, full_name, files):
         self.found = found
         self.name = name
@@ -146,6 +179,8 @@ class ImportedMod:
         self.files = files
 
 class ExternDecl:
+    __slots__ = ("annotations", "abi", "decls", "pos")
+
     def __init__(self, annotations, abi, decls, pos):
         self.annotations = annotations
         self.abi = abi
@@ -153,6 +188,11 @@ class ExternDecl:
         self.pos = pos
 
 class ConstDecl:
+    __slots__ = (
+        "docs", "annotations", "is_public", "name", "has_typ", "typ", "expr",
+        "sym", "deps", "pos"
+    )
+
     def __init__(
         self, docs, annotations, is_public, name, has_typ, typ, expr, pos
     ):
@@ -164,9 +204,15 @@ class ConstDecl:
         self.typ = typ
         self.expr = expr
         self.sym = None
+        self.deps = None
         self.pos = pos
 
 class VarDecl:
+    __slots__ = (
+        "docs", "annotations", "is_public", "is_extern", "abi", "lefts",
+        "right", "deps", "pos"
+    )
+
     def __init__(
         self, docs, annotations, is_public, is_extern, abi, lefts, right, pos
     ):
@@ -177,9 +223,15 @@ class VarDecl:
         self.abi = abi
         self.lefts = lefts
         self.right = right
+        self.deps = None
         self.pos = pos
 
 class AliasDecl:
+    __slots__ = (
+        "docs", "annotations", "is_public", "name", "parent", "is_typealias",
+        "sym", "pos"
+    )
+
     def __init__(
         self, docs, annotations, is_public, name, parent, is_typealias, pos
     ):
@@ -193,6 +245,8 @@ class AliasDecl:
         self.pos = pos
 
 class EnumVariant:
+    __slots__ = ("name", "typ", "has_typ", "has_value", "value", "decls")
+
     def __init__(self, name, typ, has_typ, value, decls):
         self.name = name
         self.typ = typ
@@ -202,6 +256,11 @@ class EnumVariant:
         self.decls = decls
 
 class EnumDecl:
+    __slots__ = (
+        "docs", "annotations", "is_public", "name", "underlying_typ", "bases",
+        "variants", "is_boxed_enum", "decls", "sym", "pos"
+    )
+
     def __init__(
         self, docs, annotations, is_public, name, underlying_typ, bases,
         variants, is_boxed_enum, decls, pos
@@ -219,6 +278,11 @@ class EnumDecl:
         self.pos = pos
 
 class TraitDecl:
+    __slots__ = (
+        "docs", "annotations", "is_public", "name", "bases", "decls", "pos",
+        "sym"
+    )
+
     def __init__(self, docs, annotations, is_public, name, bases, decls, pos):
         self.docs = docs
         self.annotations = annotations
@@ -229,6 +293,11 @@ class TraitDecl:
         self.pos = pos
 
 class StructDecl:
+    __slots__ = (
+        "docs", "annotations", "is_public", "name", "bases", "decls",
+        "is_opaque", "sym", "pos"
+    )
+
     def __init__(
         self, docs, annotations, is_public, name, bases, decls, is_opaque, pos
     ):
@@ -243,6 +312,11 @@ class StructDecl:
         self.pos = pos
 
 class FieldDecl:
+    __slots__ = (
+        "docs", "annotations", "is_public", "is_mut", "name", "typ", "def_expr",
+        "has_def_expr", "pos"
+    )
+
     def __init__(
         self, annotations, docs, is_public, is_mut, name, typ, def_expr,
         has_def_expr, pos
@@ -258,6 +332,8 @@ class FieldDecl:
         self.pos = pos
 
 class ExtendDecl:
+    __slots__ = ("annotations", "typ", "bases", "decls", "pos")
+
     def __init__(self, annotations, typ, bases, decls, pos):
         self.annotations = annotations
         self.typ = typ
@@ -266,6 +342,14 @@ class ExtendDecl:
         self.pos = pos
 
 class FnDecl:
+    __slots__ = (
+        "sym", "docs", "annotations", "is_public", "abi", "name", "name_pos",
+        "args", "self_typ", "self_is_mut", "self_is_ref", "is_main",
+        "is_extern", "is_unsafe", "is_method", "is_variadic", "ret_typ",
+        "has_named_args", "has_body", "scope", "stmts", "lazy_body",
+        "defer_stmts", "deps"
+    )
+
     def __init__(
         self, docs, annotations, is_public, is_extern, is_unsafe, name,
         name_pos, args, ret_typ, stmts, scope, has_body = False,
@@ -293,9 +377,30 @@ class FnDecl:
         self.has_body = has_body
         self.scope = scope
         self.stmts = stmts
+        # the body of the private functions of the imported modules is
+        # skipped, and parsed when the function is used (see `LazyBody`)
+        self.lazy_body = None
         self.defer_stmts = []
+        self.deps = None
+
+# The span of a function body that was not parsed, from its `{` to its `}`
+# (`end` is an offset of the same file). It is parsed by
+# `parser.Parser.parse_lazy_body` when the resolver finds a use of the
+# function, the bodies that are never used are not resolved, checked nor
+# generated. With `--no-dce` the bodies are not skipped.
+class LazyBody:
+    __slots__ = ("pos", "end", "source_file")
+
+    def __init__(self, pos, end):
+        self.pos = pos
+        self.end = end
+        self.source_file = None # set by the register
 
 class DestructorDecl:
+    __slots__ = (
+        "self_is_mut", "stmts", "scope", "self_typ", "pos", "defer_stmts"
+    )
+
     def __init__(self, self_is_mut, scope, stmts, pos):
         self.self_is_mut = self_is_mut
         self.stmts = stmts
@@ -305,14 +410,19 @@ class DestructorDecl:
         self.defer_stmts = []
 
 class TestDecl:
+    __slots__ = ("name", "stmts", "scope", "deps", "pos")
+
     def __init__(self, scope, name, stmts, pos):
         self.name = name
         self.stmts = stmts
         self.scope = scope
+        self.deps = None
         self.pos = pos
 
 # ------ Statements --------
 class VarDeclStmt:
+    __slots__ = ("lefts", "right", "scope", "pos")
+
     def __init__(self, scope, lefts, right, pos):
         self.lefts = lefts
         self.right = right
@@ -320,6 +430,11 @@ class VarDeclStmt:
         self.pos = pos
 
 class WhileStmt:
+    __slots__ = (
+        "cond", "is_inf", "continue_expr", "has_continue_expr", "stmt",
+        "else_stmt", "has_else_stmt", "pos"
+    )
+
     def __init__(self, cond, continue_expr, stmt, else_stmt, is_inf, pos):
         self.cond = cond
         self.is_inf = is_inf
@@ -331,6 +446,8 @@ class WhileStmt:
         self.pos = pos
 
 class ForStmt:
+    __slots__ = ("index", "value", "iterable", "scope", "stmt", "pos")
+
     def __init__(self, scope, index, value, iterable, stmt, pos):
         self.index = index
         self.value = value
@@ -340,6 +457,8 @@ class ForStmt:
         self.pos = pos
 
 class DeferStmt:
+    __slots__ = ("expr", "is_errdefer", "flag_var", "pos")
+
     def __init__(self, expr, is_errdefer, pos):
         self.expr = expr
         self.is_errdefer = is_errdefer
@@ -347,6 +466,8 @@ class DeferStmt:
         self.pos = pos
 
 class ExprStmt:
+    __slots__ = ("expr", "pos")
+
     def __init__(self, expr, pos):
         self.expr = expr
         self.pos = pos
@@ -359,6 +480,8 @@ class ExprStmt:
 
 # ------ Expressions -------
 class EmptyExpr:
+    __slots__ = ("pos", )
+
     def __init__(self, pos):
         self.pos = pos
 
@@ -369,6 +492,8 @@ class EmptyExpr:
         return self.__repr__()
 
 class TypeNode:
+    __slots__ = ("typ", "pos")
+
     def __init__(self, typ, pos):
         self.typ = typ
         self.pos = pos
@@ -380,6 +505,8 @@ class TypeNode:
         return self.__repr__()
 
 class AssignExpr:
+    __slots__ = ("left", "op", "right", "typ", "pos")
+
     def __init__(self, left, op, right, pos):
         self.left = left
         self.op = op
@@ -394,6 +521,11 @@ class AssignExpr:
         return self.__repr__()
 
 class Ident:
+    __slots__ = (
+        "name", "obj", "sym", "is_obj", "is_sym", "is_comptime", "not_found",
+        "scope", "pos", "typ"
+    )
+
     def __init__(self, name, pos, scope, is_comptime):
         self.name = name
         self.obj = None
@@ -415,6 +547,8 @@ class Ident:
         return self.__repr__()
 
 class SelfExpr:
+    __slots__ = ("scope", "obj", "typ", "pos")
+
     def __init__(self, scope, pos):
         self.scope = scope
         self.obj = None
@@ -428,6 +562,8 @@ class SelfExpr:
         return self.__repr__()
 
 class SelfTyExpr:
+    __slots__ = ("scope", "sym", "pos")
+
     def __init__(self, scope, pos):
         self.scope = scope
         self.sym = None
@@ -440,6 +576,8 @@ class SelfTyExpr:
         return self.__repr__()
 
 class NoneLiteral:
+    __slots__ = ("pos", "typ")
+
     def __init__(self, pos):
         self.pos = pos
         self.typ = None
@@ -451,6 +589,8 @@ class NoneLiteral:
         return self.__repr__()
 
 class BoolLiteral:
+    __slots__ = ("lit", "pos", "typ")
+
     def __init__(self, lit, pos):
         self.lit = lit
         self.pos = pos
@@ -463,6 +603,8 @@ class BoolLiteral:
         return self.__repr__()
 
 class CharLiteral:
+    __slots__ = ("lit", "pos", "is_byte", "typ")
+
     def __init__(self, lit, pos, is_byte):
         self.lit = lit
         self.pos = pos
@@ -477,6 +619,8 @@ class CharLiteral:
         return self.__repr__()
 
 class IntegerLiteral:
+    __slots__ = ("lit", "pos", "typ")
+
     def __init__(self, lit, pos):
         self.lit = lit
         self.pos = pos
@@ -489,6 +633,8 @@ class IntegerLiteral:
         return self.__repr__()
 
 class FloatLiteral:
+    __slots__ = ("lit", "pos", "typ")
+
     def __init__(self, lit, pos):
         self.lit = lit
         self.pos = pos
@@ -501,6 +647,8 @@ class FloatLiteral:
         return self.__repr__()
 
 class StringLiteral:
+    __slots__ = ("lit", "is_raw", "is_bytestr", "is_cstr", "pos", "typ")
+
     def __init__(self, lit, is_raw, is_bytestr, is_cstr, pos):
         self.lit = lit
         self.is_raw = is_raw
@@ -517,6 +665,11 @@ class StringLiteral:
         return self.__repr__()
 
 class EnumLiteral:
+    __slots__ = (
+        "value", "from_is_cmp", "is_instance", "sym", "variant_info", "pos",
+        "typ"
+    )
+
     def __init__(self, value, pos, from_is_cmp = False):
         self.value = value
         self.from_is_cmp = from_is_cmp
@@ -533,6 +686,8 @@ class EnumLiteral:
         return self.__repr__()
 
 class TupleLiteral:
+    __slots__ = ("exprs", "pos", "typ")
+
     def __init__(self, exprs, pos):
         self.exprs = exprs
         self.pos = pos
@@ -545,6 +700,8 @@ class TupleLiteral:
         return self.__repr__()
 
 class VectorLiteral:
+    __slots__ = ("elems", "pos", "is_arr", "typ")
+
     def __init__(self, elems, is_arr, pos):
         self.elems = elems
         self.pos = pos
@@ -565,6 +722,10 @@ class VectorLiteral:
         return self.__repr__()
 
 class GuardExpr:
+    __slots__ = (
+        "vars", "expr", "has_cond", "cond", "is_result", "scope", "pos", "typ"
+    )
+
     # Examples:
     # - if x := optional_or_result_fn() { ... }
     # - while byte := reader.read() { ... }
@@ -588,6 +749,8 @@ class GuardExpr:
         return self.__repr__()
 
 class UnaryExpr:
+    __slots__ = ("op", "right", "right_typ", "pos", "is_ref_mut", "typ")
+
     def __init__(self, right, op, is_ref_mut, pos):
         self.op = op
         self.right = right
@@ -605,6 +768,8 @@ class UnaryExpr:
         return self.__repr__()
 
 class BinaryExpr:
+    __slots__ = ("left", "op", "right", "has_var", "var", "scope", "pos", "typ")
+
     def __init__(self, left, op, right, pos, var = None, scope = None):
         self.left = left
         self.op = op
@@ -628,6 +793,8 @@ class BinaryExpr:
         return self.__repr__()
 
 class ParExpr:
+    __slots__ = ("expr", "pos", "typ")
+
     def __init__(self, expr, pos):
         self.expr = expr
         self.pos = pos
@@ -637,6 +804,8 @@ class ParExpr:
         return f"({self.expr})"
 
 class IndexExpr:
+    __slots__ = ("left", "index", "left_typ", "pos", "is_ref", "typ")
+
     def __init__(self, left, index, pos):
         self.left = left
         self.index = index
@@ -652,6 +821,12 @@ class IndexExpr:
         return self.__repr__()
 
 class CallExpr:
+    __slots__ = (
+        "sym", "left", "args", "has_spread_expr", "spread_expr", "err_handler",
+        "is_closure", "is_ctor", "is_enum_variant", "enum_variant_sym", "pos",
+        "typ"
+    )
+
     def __init__(
         self, left, args, has_spread_expr, spread_expr, err_handler, pos
     ):
@@ -709,6 +884,8 @@ class CallExpr:
         return self.__repr__()
 
 class CallArg:
+    __slots__ = ("expr", "typ", "pos", "name", "is_named")
+
     def __init__(self, expr, pos, name = ""):
         self.expr = expr
         self.typ = None
@@ -725,6 +902,11 @@ class CallArg:
         return self.__repr__()
 
 class CallErrorHandler:
+    __slots__ = (
+        "is_propagate", "varname", "varname_pos", "expr", "has_expr", "scope",
+        "pos"
+    )
+
     def __init__(
         self, is_propagate, varname, expr, has_expr, varname_pos, scope, pos
     ):
@@ -750,6 +932,8 @@ class CallErrorHandler:
         return self.__repr__()
 
 class BuiltinCallExpr:
+    __slots__ = ("name", "args", "pos", "vec_is_mut", "typ")
+
     def __init__(self, name, args, pos):
         self.name = name
         self.args = args
@@ -764,6 +948,10 @@ class BuiltinCallExpr:
         return self.__repr__()
 
 class RangeExpr:
+    __slots__ = (
+        "start", "end", "is_inclusive", "has_start", "has_end", "pos", "typ"
+    )
+
     def __init__(
         self, start, end, is_inclusive, pos, has_start = True, has_end = True
     ):
@@ -787,6 +975,12 @@ class RangeExpr:
         return self.__repr__()
 
 class SelectorExpr:
+    __slots__ = (
+        "left", "left_sym", "left_typ", "field_name", "field_is_mut",
+        "field_pos", "field_sym", "is_indirect", "is_option_check", "is_path",
+        "not_found", "pos", "typ"
+    )
+
     def __init__(
         self, left, field_name, pos, field_pos, is_indirect = False,
         is_option_check = False
@@ -816,6 +1010,8 @@ class SelectorExpr:
         return self.__repr__()
 
 class BranchExpr:
+    __slots__ = ("op", "pos", "typ")
+
     def __init__(self, op, pos):
         self.op = op
         self.pos = pos
@@ -828,6 +1024,8 @@ class BranchExpr:
         return self.__repr__()
 
 class ReturnExpr:
+    __slots__ = ("expr", "has_expr", "pos", "typ")
+
     def __init__(self, expr, has_expr, pos):
         self.expr = expr
         self.has_expr = has_expr
@@ -843,6 +1041,8 @@ class ReturnExpr:
         return self.__repr__()
 
 class Block:
+    __slots__ = ("is_unsafe", "stmts", "expr", "is_expr", "typ", "scope", "pos")
+
     def __init__(self, scope, is_unsafe, stmts, expr, is_expr, pos):
         self.is_unsafe = is_unsafe
         self.stmts = stmts
@@ -869,6 +1069,8 @@ class Block:
         return self.__repr__()
 
 class IfBranch:
+    __slots__ = ("cond", "expr", "is_else", "op", "typ")
+
     def __init__(self, cond, expr, is_else, op):
         self.cond = cond
         self.expr = expr
@@ -885,6 +1087,8 @@ class IfBranch:
         return self.__repr__()
 
 class IfExpr:
+    __slots__ = ("expected_typ", "branches", "has_else", "pos", "typ")
+
     def __init__(self, branches, has_else, pos):
         self.expected_typ = None
         self.branches = branches
@@ -899,6 +1103,11 @@ class IfExpr:
         return self.__repr__()
 
 class SwitchBranch:
+    __slots__ = (
+        "pats", "has_var", "var_is_mut", "var_name", "var_pos", "var_typ",
+        "has_cond", "cond", "expr", "is_else", "typ"
+    )
+
     def __init__(
         self, pats, has_var, var_is_mut, var_name, var_pos, has_cond, cond,
         expr, is_else
@@ -928,6 +1137,11 @@ class SwitchBranch:
         return self.__repr__()
 
 class SwitchExpr:
+    __slots__ = (
+        "expr", "branches", "is_typeswitch", "scope", "pos", "typ",
+        "expected_typ"
+    )
+
     def __init__(self, expr, branches, is_typeswitch, scope, pos):
         self.expr = expr
         self.branches = branches
@@ -0,0 +1,383 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+from os import path
+import os, io, glob, pickle, hashlib
+
+from . import sym, prefs, utils
+
+CACHE_DIR = path.join(prefs.RIVET_DIR, "cache")
+
+# The symbols and the ASTs are deeply nested (scopes, parents, etc.), this
+# limit is used while they are serialized.
+RECURSION_LIMIT = 10000
+
+# Returns a fingerprint of the compiler sources, so that the cached files
+# produced by an older (or modified) compiler are never reused.
+def compiler_fingerprint():
+    h = hashlib.sha256(utils.VERSION.encode())
+    src_dir = path.dirname(path.realpath(__file__))
+    files = glob.glob(path.join(src_dir, "**", "*.py"), recursive = True)
+    for file in sorted(files):
+        st = os.stat(file)
+        h.update(f"{file}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+class _ASTPickler(pickle.Pickler):
+    def __init__(self, file, shared):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.shared = shared
+
+    def persistent_id(self, obj):
+        return self.shared.get(id(obj))
+
+class _ASTUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared):
+        super().__init__(file)
+        self.shared = shared
+
+    def persistent_load(self, pid):
+        return self.shared[pid]
+
+# Objects shared by all the ASTs (the module symbol and the primitive types
+# created by the compiler), they are not serialized, only referenced by name.
+SHARED_TYPES = [
+    "void_t", "never_t", "none_t", "bool_t", "rune_t", "int8_t", "int16_t",
+    "int32_t", "int64_t", "isize_t", "uint8_t", "uint16_t", "uint32_t",
+    "uint64_t", "usize_t", "comptime_int_t", "comptime_float_t", "float32_t",
+    "float64_t", "string_t", "anyptr_t", "mut_anyptr_t"
+]
+
+def shared_objects(comp, mod_sym):
+    objs = {"mod_sym": mod_sym}
+    for name in SHARED_TYPES:
+        objs[name] = getattr(comp, name)
+    return objs
+
+def dump_ast(comp, file, obj, mod_sym):
+    shared = {
+        id(shared_obj): name
+        for name, shared_obj in shared_objects(comp, mod_sym).items()
+    }
+    _ASTPickler(file, shared).dump(obj)
+
+def load_ast(comp, file, mod_sym):
+    return _ASTUnpickler(file, shared_objects(comp, mod_sym)).load()
+
+def dumps_ast(comp, obj, mod_sym):
+    buf = io.BytesIO()
+    dump_ast(comp, buf, obj, mod_sym)
+    return buf.getvalue()
+
+def loads_ast(comp, data, mod_sym):
+    return load_ast(comp, io.BytesIO(data), mod_sym)
+
+# `ASTCache` stores the parsed `ast.SourceFile` of each file in
+# `~/.rivet_lang/cache/ast/`. The key of each entry is formed by the file
+# content, the compiler fingerprint, the preprocessor symbols and whether the
+# bodies of the top-level functions are skipped (in the imported modules,
+# unless `--no-dce` is used, see `ast.LazyBody`), so a hit always produces
+# the same AST that the parser would produce.
+class ASTCache:
+    def __init__(self, comp):
+        self.comp = comp
+        self.dir = path.join(CACHE_DIR, "ast")
+        self.hits = 0
+        self.misses = 0
+        p = comp.prefs
+        self.key_prefix = ":".join([
+            compiler_fingerprint(),
+            str(p.target_os),
+            str(p.target_arch),
+            str(p.target_bits),
+            str(p.target_endian),
+            str(p.build_mode), ",".join(sorted(p.flags))
+        ])
+
+    # Returns the path of the entry of `file` and the text of the file, or
+    # `(None, None)` if it cannot be read.
+    def entry(self, file, lazy_fn_bodies):
+        try:
+            with open(file, encoding = 'UTF-8') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None, None
+        h = hashlib.sha256(self.key_prefix.encode())
+        h.update(f"{file}:{lazy_fn_bodies}".encode())
+        h.update(text.encode())
+        return path.join(self.dir, f"{h.hexdigest()}.ast"), text
+
+    # Returns `(source_file, mod_annotations)` or `None` on a miss.
+    def load(self, entry, mod_sym):
+        if entry == None or not path.isfile(entry):
+            self.misses += 1
+            return None
+        try:
+            with open(entry, "rb") as f:
+                res = load_ast(self.comp, f, mod_sym)
+            self.hits += 1
+            return res
+        except Exception:
+            # corrupt entry, the file is parsed again and the entry replaced
+            self.misses += 1
+            return None
+
+    def store(self, entry, source_file, mod_annotations):
+        if entry == None:
+            return
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.dir, exist_ok = True)
+            with open(tmp, "wb") as f:
+                dump_ast(
+                    self.comp, f, (source_file, mod_annotations),
+                    source_file.sym
+                )
+            os.replace(tmp, entry)
+        except (OSError, pickle.PicklingError, RecursionError) as e:
+            self.comp.vlog(
+                f"ast-cache: cannot cache `{source_file.file}`: {e}"
+            )
+            if path.exists(tmp):
+                os.remove(tmp)
+
+# Returns the modification time of `dir`, or of its nearest existing parent
+# directory (to detect the creation of `dir`).
+def dir_stamp(dir):
+    while True:
+        try:
+            return os.stat(dir).st_mtime_ns
+        except OSError:
+            parent = path.dirname(dir)
+            if parent == dir or len(parent) == 0:
+                return None
+            dir = parent
+
+# `ModuleIndex` maps the imported paths to the modules found by
+# `Compiler.find_module`, so that each module is searched only once per
+# build. The index is saved in `~/.rivet_lang/cache/modules/`; an entry is
+# valid while the directories inspected to find the module (and their
+# parents, if they don't exist) have not been modified.
+class ModuleIndex:
+    VERSION = 1
+
+    def __init__(self, comp):
+        self.comp = comp
+        self.entries = None # loaded on the first lookup
+        self.checked = set()
+        self.is_dirty = False
+        self.file = ""
+        if comp.prefs.use_cache:
+            p = comp.prefs
+            h = hashlib.sha256(":".join([
+                os.getcwd(),
+                str(p.target_os),
+                str(p.target_arch),
+                str(p.target_bits),
+                str(p.target_endian),
+                str(p.target_backend), ",".join(sorted(p.flags)),
+                ",".join(p.library_path)
+            ]).encode())
+            self.file = path.join(CACHE_DIR, "modules", f"{h.hexdigest()}.idx")
+
+    # Returns `(found, name, full_name, files)`.
+    def find(self, pathx, file_path):
+        if self.entries == None:
+            self.load()
+        if pathx.startswith("./") or pathx.startswith("../"):
+            key = (path.abspath(path.dirname(file_path)), pathx)
+        else:
+            key = pathx
+        entry = self.entries.get(key)
+        if entry and key not in self.checked:
+            _, _, _, _, stamps = entry
+            if any(dir_stamp(dir) != stamp for dir, stamp in stamps):
+                entry = None
+        if entry == None:
+            found, name, full_name, files, dirs = self.comp.find_module(
+                pathx, file_path
+            )
+            stamps = [(dir, dir_stamp(dir)) for dir in dirs]
+            entry = (found, name, full_name, files, stamps)
+            self.entries[key] = entry
+            self.is_dirty = True
+        self.checked.add(key)
+        return entry[:4]
+
+    def load(self):
+        self.entries = {}
+        if len(self.file) == 0 or not path.isfile(self.file):
+            return
+        try:
+            with open(self.file, "rb") as f:
+                version, entries = pickle.load(f)
+            if version == ModuleIndex.VERSION:
+                self.entries = entries
+        except Exception:
+            pass # corrupt index, it is created again
+
+    def save(self):
+        if len(self.file) == 0 or not self.is_dirty:
+            return
+        tmp = f"{self.file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(path.dirname(self.file), exist_ok = True)
+            with open(tmp, "wb") as f:
+                pickle.dump(
+                    (ModuleIndex.VERSION, self.entries), f,
+                    pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp, self.file)
+            self.is_dirty = False
+        except OSError as e:
+            self.comp.vlog(f"module-index: cannot save `{self.file}`: {e}")
+            if path.exists(tmp):
+                os.remove(tmp)
+
+# Version of the format of the `core` snapshot files, it must be increased
+# when `CoreSnapshot` changes.
+CORE_SNAPSHOT_VERSION = 1
+
+# `CoreSnapshot` saves the state of the compiler after loading and checking
+# `core` and the modules it imports (see `Compiler.load_core`), so that it
+# can be restored instead of processing those modules again. The snapshots
+# are kept in memory by the compiler server and saved in
+# `~/.rivet_lang/cache/core/` by the normal builds. The watch mode also
+# takes snapshots after checking all the modules imported by the root
+# module, the root module itself is never saved.
+class CoreSnapshot:
+    ATTRS = [
+        "universe", "source_files", "core_mod", "vec_sym", "error_sym",
+        "error_t", *SHARED_TYPES
+    ]
+
+    def __init__(self, comp):
+        source_files = [sf for sf in comp.source_files if not sf.sym.is_root]
+        self.key = CoreSnapshot.key_of(comp)
+        self.files = CoreSnapshot.files_of(source_files)
+        self.stamps = self.current_stamps()
+        self.hashes = self.current_hashes()
+        state = {name: getattr(comp, name) for name in CoreSnapshot.ATTRS}
+        state["source_files"] = source_files
+        state["symbol_count"] = sym.SYMBOL_COUNT
+        universe = comp.universe
+        universe_syms, universe_index = universe.syms, universe.syms_index
+        universe.syms = [s for s in universe_syms if not s.is_root]
+        universe.syms_index = {s.name: s for s in universe.syms}
+        try:
+            with utils.recursion_limit(RECURSION_LIMIT):
+                self.data = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        finally:
+            universe.syms, universe.syms_index = universe_syms, universe_index
+
+    @staticmethod
+    def key_of(comp):
+        p = comp.prefs
+        return ":".join([
+            os.getcwd(),
+            str(p.target_os),
+            str(p.target_arch),
+            str(p.target_bits),
+            str(p.target_endian),
+            str(p.target_backend),
+            str(p.build_mode), ",".join(sorted(p.flags)),
+            str(p.dce), # see `ast.LazyBody`
+            ",".join(p.library_path[:-1]) # without the module directory
+        ])
+
+    @staticmethod
+    def files_of(source_files):
+        files = [sf.file for sf in source_files]
+        # a new file in a module directory changes its modification time
+        files += sorted(set(path.dirname(file) for file in files))
+        return files
+
+    @staticmethod
+    def entry_path(comp):
+        h = hashlib.sha256(CoreSnapshot.key_of(comp).encode())
+        return path.join(CACHE_DIR, "core", f"{h.hexdigest()}.snapshot")
+
+    # Returns the snapshot saved for the preferences of `comp`, or `None`
+    # if it doesn't exist, it was created by another compiler or the files
+    # of the modules have changed.
+    @staticmethod
+    def load(comp):
+        entry = CoreSnapshot.entry_path(comp)
+        if not path.isfile(entry):
+            return None
+        try:
+            with open(entry, "rb") as f:
+                version, fingerprint = pickle.load(f)
+                if version != CORE_SNAPSHOT_VERSION:
+                    return None
+                if fingerprint != compiler_fingerprint():
+                    return None
+                snapshot = pickle.load(f)
+        except Exception:
+            return None # corrupt snapshot, it is created again
+        if not snapshot.is_valid_for(comp):
+            return None
+        return snapshot
+
+    def save(self, comp):
+        entry = CoreSnapshot.entry_path(comp)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(path.dirname(entry), exist_ok = True)
+            with open(tmp, "wb") as f:
+                pickle.dump(
+                    (CORE_SNAPSHOT_VERSION, compiler_fingerprint()), f,
+                    pickle.HIGHEST_PROTOCOL
+                )
+                pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, entry)
+        except OSError as e:
+            comp.vlog(f"core-snapshot: cannot save `{entry}`: {e}")
+            if path.exists(tmp):
+                os.remove(tmp)
+
+    def current_stamps(self):
+        stamps = []
+        for file in self.files:
+            try:
+                st = os.stat(file)
+                stamps.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def current_hashes(self):
+        hashes = []
+        for file in self.files:
+            try:
+                if path.isdir(file):
+                    content = "\n".join(sorted(os.listdir(file))).encode()
+                else:
+                    with open(file, "rb") as f:
+                        content = f.read()
+                hashes.append(hashlib.sha256(content).hexdigest())
+            except OSError:
+                hashes.append(None)
+        return hashes
+
+    def is_valid_for(self, comp):
+        if self.key != CoreSnapshot.key_of(comp):
+            return False
+        stamps = self.current_stamps()
+        if self.stamps == stamps:
+            return True
+        # the files were touched (e.g. by `git checkout`), but their content
+        # may be the same
+        if self.hashes != self.current_hashes():
+            return False
+        self.stamps = stamps
+        return True
+
+    def restore(self, comp):
+        with utils.recursion_limit(RECURSION_LIMIT):
+            state = pickle.loads(self.data)
+        for name in CoreSnapshot.ATTRS:
+            setattr(comp, name, state[name])
+        sym.SYMBOL_COUNT = state["symbol_count"]
+        comp.init_stages()
@@ -24,6 +24,15 @@ class Checker:
 
         self.defer_stmts = []
 
+        # results of `check_compatible_types` and `promote_number` by the
+        # keys of the types (see `type.TBase.key`). The traits marked with
+        # `mark_has_objects` while checking two types are saved with the
+        # result, to mark them again when it's reused.
+        self.compatible_types = {}
+        self.promoted_numbers = {}
+        self.marked_traits = []
+        self.implements_version = sym.IMPLEMENTS_VERSION
+
     def check_global_vars(self, decls):
         for decl in decls:
             old_sym = self.sym
@@ -47,8 +56,26 @@ class Checker:
             self.expected_type = self.comp.void_t
             self.check_decls(self.source_file.decls)
 
+        # the functions of the modules already checked whose body was
+        # resolved for these files (see `Resolver.resolve_lazy_fns`)
+        self.check_reached_fns([
+            (sf, decl) for sf, decl in self.comp.resolver.reached_fns
+            if sf not in source_files
+        ])
+
+        # the uses of the variables in the bodies that were never parsed are
+        # unknown
+        lazy_mods = [
+            sf.sym for sf in source_files if any(
+                isinstance(decl, ast.FnDecl) and decl.lazy_body != None
+                for decl in sf.decls
+            )
+        ]
+        checked_mods = [
+            sf.sym for sf in source_files if sf.sym not in lazy_mods
+        ]
         for m in self.comp.universe:
-            if isinstance(m, sym.Mod):
+            if isinstance(m, sym.Mod) and m in checked_mods:
                 for mod_var in m.syms:
                     if isinstance(mod_var, sym.Var):
                         if not mod_var.is_public and mod_var.is_mut and not mod_var.is_changed:
@@ -57,6 +84,13 @@ class Checker:
                                 mod_var.pos
                             )
 
+    def check_reached_fns(self, reached_fns):
+        for sf, decl in reached_fns:
+            self.sym = sf.sym
+            self.source_file = sf
+            self.expected_type = self.comp.void_t
+            self.check_decl(decl)
+
     def check_decls(self, decls):
         for decl in decls:
             if not isinstance(decl, (ast.ConstDecl, ast.VarDecl)):
@@ -173,11 +207,12 @@ class Checker:
                 report.note(
                     "this is because Rivet cannot ensure that the function does not always return `none`"
                 )
-            self.cur_fn = decl.sym
-            self.check_stmts(decl.stmts)
-            decl.defer_stmts = self.defer_stmts
-            self.defer_stmts = []
-            self.check_mut_vars(decl.scope)
+            if decl.lazy_body == None: # never used, see `ast.LazyBody`
+                self.cur_fn = decl.sym
+                self.check_stmts(decl.stmts)
+                decl.defer_stmts = self.defer_stmts
+                self.defer_stmts = []
+                self.check_mut_vars(decl.scope)
         elif isinstance(decl, ast.DestructorDecl):
             self.check_stmts(decl.stmts)
             decl.defer_stmts = self.defer_stmts
@@ -1709,6 +1744,31 @@ class Checker:
                 )
 
     def check_compatible_types(self, got, expected):
+        if self.implements_version != sym.IMPLEMENTS_VERSION:
+            # a trait has new implementors
+            self.compatible_types.clear()
+            self.implements_version = sym.IMPLEMENTS_VERSION
+        key = (got.key(), expected.key(), self.sym.is_core_mod())
+        self.comp.stats.count("compat_checks")
+        if res := self.compatible_types.get(key):
+            self.comp.stats.count("compat_cache_hits")
+            for trait_sym in res[1]:
+                self.mark_trait_has_objects(trait_sym)
+            return res[0]
+        self.marked_traits.append([])
+        is_compatible = self.check_compatible_types_uncached(got, expected)
+        marked_traits = self.marked_traits.pop()
+        if len(self.marked_traits) > 0:
+            self.marked_traits[-1] += marked_traits
+        self.compatible_types[key] = (is_compatible, marked_traits)
+        return is_compatible
+
+    def mark_trait_has_objects(self, trait_sym):
+        trait_sym.info.mark_has_objects()
+        if len(self.marked_traits) > 0:
+            self.marked_traits[-1].append(trait_sym)
+
+    def check_compatible_types_uncached(self, got, expected):
         if expected == got:
             return True
 
@@ -1788,7 +1848,7 @@ class Checker:
         elif exp_sym.kind == TypeKind.Trait:
             if self.comp.comptime_number_to_type(got).symbol(
             ) in exp_sym.info.implements:
-                exp_sym.info.mark_has_objects()
+                self.mark_trait_has_objects(exp_sym)
                 return True
         elif exp_sym.kind == TypeKind.Array and got_sym.kind == TypeKind.Array:
             if exp_sym.info.is_mut and not got_sym.info.is_mut:
@@ -1830,38 +1890,43 @@ class Checker:
         return left_typ
 
     def promote_number(self, expected, got):
-        type_hi = expected
-        type_lo = got
-        bits_hi = self.comp.num_bits(type_hi)
-        bits_lo = self.comp.num_bits(type_lo)
-        if bits_hi < bits_lo:
-            old_hi = type_hi
-            type_hi = type_lo
-            type_lo = old_hi
-
-            old_bhi = bits_hi
-            bits_hi = bits_lo
-            bits_lo = old_bhi
-
-        if self.comp.is_float(type_hi):
-            if self.comp.is_float(type_lo):
+        key = (expected.key(), got.key())
+        # the index of the promoted type (`expected`, `got` or `void`), the
+        # types are not shared between expressions
+        if (idx := self.promoted_numbers.get(key)) == None:
+            promoted = self.promote_number_uncached(expected, got)
+            if promoted is expected:
+                idx = 0
+            elif promoted is got:
+                idx = 1
+            else:
+                idx = 2
+            self.promoted_numbers[key] = idx
+        return (expected, got, self.comp.void_t)[idx]
+
+    def promote_number_uncached(self, expected, got):
+        type_hi, info_hi = expected, self.comp.number_info(expected)
+        type_lo, info_lo = got, self.comp.number_info(got)
+        if info_hi.bits < info_lo.bits:
+            type_hi, type_lo = type_lo, type_hi
+            info_hi, info_lo = info_lo, info_hi
+
+        if info_hi.is_float:
+            if info_lo.is_float:
                 # float -> float (good)
                 return type_hi
             # float -> int (bad)
             return self.comp.void_t
 
-        is_signed_lo = self.comp.is_signed_int(type_lo)
-        is_unsigned_lo = not is_signed_lo
-        is_signed_hi = self.comp.is_signed_int(type_hi)
-        is_unsigned_hi = not is_signed_hi
-
-        if is_unsigned_lo and is_unsigned_hi:
+        if not info_lo.is_signed and not info_hi.is_signed:
             # unsigned number -> unsigned number (good)
             return type_hi
-        elif is_signed_lo and is_signed_hi:
+        elif info_lo.is_signed and info_hi.is_signed:
             # signed number -> signed number (good)
-            return type_lo if (bits_lo == 64 and is_signed_lo) else type_hi
-        elif is_unsigned_lo and is_signed_hi and (bits_lo < bits_hi):
+            return type_lo if info_lo.bits == 64 else type_hi
+        elif not info_lo.is_signed and info_hi.is_signed and (
+            info_lo.bits < info_hi.bits
+        ):
             # unsigned number -> signed number (good, if signed type is larger)
             return type_lo
         else:
@@ -8,9 +8,24 @@ from ..sym import TypeKind
 from .. import ast, sym, type, token, prefs, report, utils
 from ..token import Kind, OVERLOADABLE_OPERATORS_STR, NO_POS
 
-from . import ir
+from . import ir, dce
 from .c import CGen
 
+# The functions of `core` called by the generated code, their bodies are
+# always resolved (see `ast.LazyBody`).
+RUNTIME_FNS = (
+    "main", "assert", "assert_test", "test_error_returned", "error_panic",
+    "process_panic", "internal_alloc", "internal_dup", "mem_copy",
+    "trait_cast", "enum_cast", "array_index", "array_slice",
+    "array_slice_from", "array_eq", "array_ne"
+)
+
+# Returns the mangled name of the function `name` of `core`, which must be
+# in `RUNTIME_FNS`.
+def runtime_fn(name):
+    assert name in RUNTIME_FNS, name
+    return f"_R4core{len(name)}{name}F"
+
 def prefix_type(tt):
     prefix = ""
     if isinstance(tt, type.Ptr):
@@ -133,7 +148,9 @@ class Codegen:
         self.inside_lhs_assign = False
 
         self.generated_string_literals = {}
-        self.generated_opt_res_types = []
+        self.generated_opt_res_types = set()
+        # the RIR types, by the key of the types (see `type.TBase.key`)
+        self.generated_ir_types = {}
         self.generated_array_returns = []
         self.generated_tests = []
 
@@ -162,7 +179,10 @@ class Codegen:
                 self.gen_mod_annotations(mod.name, mod.annotations)
         for source_file in source_files:
             self.source_file = source_file
+            decls_len = len(self.out_rir.decls)
             self.gen_decls(source_file.decls)
+            for decl in self.out_rir.decls[decls_len:]:
+                decl.mod_name = source_file.sym.name
 
         # generate '_R12drop_globalsZ' function
         g_fn = ir.FnDecl(
@@ -246,7 +266,7 @@ class Codegen:
                 )
             )
             main_fn.add_call(
-                "_R4core4mainF", [
+                runtime_fn("main"), [
                     argc,
                     ir.Inst(ir.InstKind.Cast,
                             [argv, ir.UINT8_T.ptr().ptr()]),
@@ -255,7 +275,7 @@ class Codegen:
             )
         else:
             main_fn.add_call(
-                "_R4core4mainF", [
+                runtime_fn("main"), [
                     argc,
                     ir.Inst(ir.InstKind.Cast,
                             [argv, ir.UINT8_T.ptr().ptr()]),
@@ -268,15 +288,25 @@ class Codegen:
         self.out_rir.decls.append(main_fn)
 
         if report.ERRORS == 0:
+            if self.comp.prefs.dce:
+                removed = dce.eliminate_dead_code(self.out_rir)
+                self.comp.vlog(f"removed {removed} unreachable declarations")
             if self.comp.prefs.emit_rir:
                 self.comp.vlog("generating RIR output (with --emit-rir)...")
                 with open(f"{self.comp.prefs.mod_name}.rir", "w") as f:
                     f.write(str(self.out_rir).strip())
+            if self.comp.stats.enabled:
+                self.comp.stats.count("rir_instrs", sum(
+                    len(decl.instrs) for decl in self.out_rir.decls
+                    if isinstance(decl, ir.FnDecl)
+                ))
             if self.comp.prefs.target_backend == prefs.Backend.C:
                 self.comp.vlog("generating C output from RIR...")
-                CGen(self.comp).gen(self.out_rir)
+                with self.comp.stats.timed("cgen"):
+                    CGen(self.comp).gen(self.out_rir)
             if self.comp.prefs.build_mode == prefs.BuildMode.Test:
-                self.comp.exit_code = os.system(self.comp.prefs.mod_output)
+                with self.comp.stats.timed("tests"):
+                    self.comp.exit_code = os.system(self.comp.prefs.mod_output)
                 os.remove(self.comp.prefs.mod_output)
 
     def gen_mod_annotations(self, mod_name, annotations):
@@ -315,7 +345,8 @@ class Codegen:
                 for f in self.comp.prefs.flags:
                     args.append(f"-D{f}")
                 self.comp.vlog(f"  compile_c_source: Arguments: {args}")
-                res = utils.execute(*args)
+                with self.comp.stats.timed("backend"):
+                    res = utils.execute(*args)
                 if res.exit_code != 0:
                     utils.error(
                         f"error while compiling the object file `{objfile}`:\n{res.err}"
@@ -349,7 +380,7 @@ class Codegen:
                         if isinstance(value,
                                       ir.ArrayLit) and len(value.elems) > 0:
                             self.cur_fn.add_call(
-                                "_R4core8mem_copyF", [
+                                runtime_fn("mem_copy"), [
                                     ident, value,
                                     ir.IntLit(ir.USIZE_T, str(size))
                                 ]
@@ -372,6 +403,8 @@ class Codegen:
         elif isinstance(decl, ast.FnDecl):
             if self.inside_trait and not decl.has_body:
                 return
+            if decl.lazy_body != None: # never used, see `ast.LazyBody`
+                return
             if decl.is_main and self.comp.prefs.build_mode == prefs.BuildMode.Test:
                 return
             args = []
@@ -411,6 +444,7 @@ class Codegen:
                 mangle_symbol(decl.sym), args, decl.is_variadic
                 and decl.is_extern, ret_typ, decl.ret_typ == self.comp.never_t
             )
+            fn_decl.is_export = decl.is_extern and decl.has_body
             self.cur_fn = fn_decl
             self.cur_fn.arr_ret_struct = arr_ret_struct
             self.cur_fn_is_main = decl.is_main
@@ -611,7 +645,7 @@ class Codegen:
                     val = self.gen_expr_with_cast(left.typ, stmt.right, ident)
                     if isinstance(val, ir.ArrayLit) and len(val.elems) > 0:
                         self.cur_fn.add_call(
-                            "_R4core8mem_copyF",
+                            runtime_fn("mem_copy"),
                             [ident, val,
                              ir.IntLit(ir.USIZE_T, str(size))]
                         )
@@ -633,7 +667,7 @@ class Codegen:
                         size, _ = self.comp.type_size(left.typ)
                         self.cur_fn.alloca(ident)
                         self.cur_fn.add_call(
-                            "_R4core8mem_copyF", [
+                            runtime_fn("mem_copy"), [
                                 ident,
                                 ir.Selector(
                                     left_ir_typ, right, ir.Name(f"f{i}")
@@ -733,7 +767,7 @@ class Codegen:
                 ir.InstKind.Cast, [
                     ir.Inst(
                         ir.InstKind.Call, [
-                            ir.Name("_R4core9enum_castF"), res_expr,
+                            ir.Name(runtime_fn("enum_cast")), res_expr,
                             expr_sym.info.get_variant_by_type(expected_typ_
                                                               ).value
                         ]
@@ -873,7 +907,7 @@ class Codegen:
                             ir.InstKind.Cast, [
                                 ir.Inst(
                                     ir.InstKind.Call, [
-                                        ir.Name("_R4core10trait_castF"),
+                                        ir.Name(runtime_fn("trait_cast")),
                                         ir.Selector(
                                             ir.VOID_PTR_T, res, ir.Name("obj")
                                         ),
@@ -902,7 +936,7 @@ class Codegen:
                         ir.InstKind.Cast, [
                             ir.Inst(
                                 ir.InstKind.Call, [
-                                    ir.Name("_R4core9enum_castF"), res,
+                                    ir.Name(runtime_fn("enum_cast")), res,
                                     typ_sym.info.get_variant_by_type(expr.typ
                                                                      ).value
                                 ]
@@ -931,7 +965,7 @@ class Codegen:
                     tmp_idx_ = ir.Ident(ir.TEST_T.ptr(), "test")
                     pos = utils.smart_quote(str(expr.pos), False)
                     self.cur_fn.add_call(
-                        "_R4core11assert_testF", [
+                        runtime_fn("assert_test"), [
                             self.gen_expr(expr.args[0]),
                             self.gen_string_literal(
                                 msg,
@@ -955,7 +989,7 @@ class Codegen:
                     self.cur_fn.add_label(l2)
                 else:
                     self.cur_fn.add_call(
-                        "_R4core6assertF", [
+                        runtime_fn("assert"), [
                             self.gen_expr(expr.args[0]),
                             self.gen_string_literal(
                                 msg,
@@ -1367,7 +1401,7 @@ class Codegen:
                         id = ir.Ident(self.ir_type(expr.sym.ret_typ), tmp)
                         self.cur_fn.alloca(id)
                     self.cur_fn.add_call(
-                        "_R4core8mem_copyF", [
+                        runtime_fn("mem_copy"), [
                             id,
                             ir.Selector(
                                 self.ir_type(expr.sym.ret_typ), inst,
@@ -1417,7 +1451,7 @@ class Codegen:
                         self.gen_defer_stmts(True, res_value_is_err)
                         if self.cur_fn_is_main or self.inside_let_decl:
                             self.cur_fn.add_call(
-                                "_R4core11error_panicF", [
+                                runtime_fn("error_panic"), [
                                     ir.Selector(
                                         self.ir_type(self.comp.error_t),
                                         res_value, ir.Name("err")
@@ -1427,7 +1461,7 @@ class Codegen:
                         elif self.inside_test:
                             pos = utils.smart_quote(str(expr.pos), False)
                             self.cur_fn.add_call(
-                                "_R4core19test_error_returnedF", [
+                                runtime_fn("test_error_returned"), [
                                     ir.Selector(
                                         self.ir_type(self.comp.error_t),
                                         res_value, ir.Name("err")
@@ -1605,7 +1639,7 @@ class Codegen:
                 if custom_tmp:
                     size, _ = self.comp.type_size(expr.typ)
                     self.cur_fn.add_call(
-                        "_R4core8mem_copyF",
+                        runtime_fn("mem_copy"),
                         [custom_tmp, arr_lit,
                          ir.IntLit(ir.USIZE_T, str(size))]
                     )
@@ -1676,7 +1710,7 @@ class Codegen:
                     if end == None:
                         inst = ir.Inst(
                             ir.InstKind.Call, [
-                                ir.Name("_R4core16array_slice_fromF"),
+                                ir.Name(runtime_fn("array_slice_from")),
                                 ir.Inst(ir.InstKind.GetRef, [left]),
                                 ir.IntLit(ir.USIZE_T, str(size)),
                                 ir.IntLit(ir.USIZE_T, s.info.size.lit), start
@@ -1685,7 +1719,7 @@ class Codegen:
                     else:
                         inst = ir.Inst(
                             ir.InstKind.Call, [
-                                ir.Name("_R4core11array_sliceF"),
+                                ir.Name(runtime_fn("array_slice")),
                                 ir.Inst(ir.InstKind.GetRef, [left]),
                                 ir.IntLit(ir.USIZE_T, str(size)),
                                 ir.IntLit(ir.USIZE_T, s.info.size.lit), start,
@@ -1697,7 +1731,7 @@ class Codegen:
             idx = self.gen_expr(expr.index)
             if isinstance(s.info, sym.ArrayInfo):
                 self.cur_fn.add_call(
-                    "_R4core11array_indexF",
+                    runtime_fn("array_index"),
                     [ir.IntLit(ir.USIZE_T, s.info.size.lit), idx]
                 )
             tmp = self.cur_fn.local_name()
@@ -2001,9 +2035,9 @@ class Codegen:
             ) and not isinstance(expr_left_typ, type.Ptr):
                 if typ_sym.kind == TypeKind.Array:
                     if expr.op == Kind.Eq:
-                        name = "_R4core8array_eqF"
+                        name = runtime_fn("array_eq")
                     elif expr.op == Kind.Ne:
-                        name = "_R4core8array_neF"
+                        name = runtime_fn("array_ne")
                     size, _ = self.comp.type_size(expr_left_typ)
                     self.cur_fn.inline_alloca(
                         self.ir_type(expr.typ), tmp,
@@ -2341,7 +2375,7 @@ class Codegen:
                     )
                     self.cur_fn.alloca(tmp)
                     self.cur_fn.add_call(
-                        "_R4core8mem_copyF", [
+                        runtime_fn("mem_copy"), [
                             ir.Selector(
                                 self.ir_type(ret_typ), tmp, ir.Name("arr")
                             ), expr_,
@@ -2521,7 +2555,7 @@ class Codegen:
 
     def panic(self, msg):
         self.cur_fn.add_call(
-            "_R4core13process_panicF", [
+            runtime_fn("process_panic"), [
                 self.gen_string_literal(utils.smart_quote(msg, False)),
                 self.empty_vec(self.comp.universe["[]core.Stringable"])
             ]
@@ -2653,7 +2687,7 @@ class Codegen:
         to_fn = self.init_string_lits_fn if custom_name else self.cur_fn
         inst = ir.Inst(
             ir.InstKind.Call,
-            [ir.Name("_R4core14internal_allocF"),
+            [ir.Name(runtime_fn("internal_alloc")),
              ir.Name(f"sizeof({name})")]
         )
         if custom_name:
@@ -2683,7 +2717,7 @@ class Codegen:
             value = ir.Inst(ir.InstKind.GetRef, [value])
         value = value if is_ptr else ir.Inst(
             ir.InstKind.Call, [
-                ir.Name("_R4core12internal_dupF"), value,
+                ir.Name(runtime_fn("internal_dup")), value,
                 ir.IntLit(ir.Name("usize"), str(size))
             ]
         )
@@ -2730,7 +2764,7 @@ class Codegen:
             else:
                 value = ir.Inst(
                     ir.InstKind.Call, [
-                        ir.Name("_R4core12internal_dupF"),
+                        ir.Name(runtime_fn("internal_dup")),
                         ir.Inst(ir.InstKind.GetRef, [arg0]),
                         ir.IntLit(usize_t, str(size))
                     ]
@@ -2836,6 +2870,14 @@ class Codegen:
         return cond
 
     def ir_type(self, typ, gen_self_arg = False):
+        key = (typ.key(), gen_self_arg)
+        if ir_typ := self.generated_ir_types.get(key):
+            return ir_typ
+        ir_typ = self.gen_ir_type(typ, gen_self_arg)
+        self.generated_ir_types[key] = ir_typ
+        return ir_typ
+
+    def gen_ir_type(self, typ, gen_self_arg):
         if isinstance(typ, type.Result):
             name = f"_R7Result_{mangle_type(typ.typ)}"
             if name not in self.generated_opt_res_types:
@@ -2852,7 +2894,7 @@ class Codegen:
                         ]
                     )
                 )
-                self.generated_opt_res_types.append(name)
+                self.generated_opt_res_types.add(name)
             return ir.Type(name)
         elif isinstance(typ, type.Option):
             if typ.is_ref_or_ptr():
@@ -2871,7 +2913,7 @@ class Codegen:
                         ]
                     )
                 )
-                self.generated_opt_res_types.append(name)
+                self.generated_opt_res_types.add(name)
             return ir.Type(name)
         elif isinstance(typ, type.Fn):
             args = []
@@ -3047,10 +3089,10 @@ class Codegen:
 
     def sort_type_symbols(self, tss):
         dg = utils.DepGraph()
-        typ_names = []
+        typ_names = set()
         for ts in tss:
             ts.mangled_name = mangle_symbol(ts)
-            typ_names.append(ts.mangled_name)
+            typ_names.add(ts.mangled_name)
         for ts in tss:
             field_deps = []
             if ts.kind == TypeKind.Array:
@@ -3096,11 +3138,12 @@ class Codegen:
                 "rivetc.codegen: the following types form a dependency cycle:\n"
                 + dg_sorted.display_cycles()
             )
+        types_by_name = {}
+        for ts in tss:
+            types_by_name.setdefault(ts.mangled_name, []).append(ts)
         types_sorted = []
         for node in dg_sorted.nodes:
-            for ts in tss:
-                if ts.mangled_name == node.name:
-                    types_sorted.append(ts)
+            types_sorted += types_by_name[node.name]
         return types_sorted
 
     def decode_escape(self, ch):
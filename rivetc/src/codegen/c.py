@@ -2,7 +2,9 @@
 # Use of this source code is governed by an MIT license that can
 # be found in the LICENSE file.
 
-import os
+from os import path
+import os, re, hashlib
+from concurrent import futures
 
 from .. import prefs, utils
 
@@ -22,6 +24,8 @@ C_RESERVED = [
     'volatile', 'template', 'far', 'near', 'huge', 'linux'
 ]
 
+C_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
 def c_escape(kw):
     return f"_ri_{kw}" if kw in C_RESERVED else kw
 
@@ -34,6 +38,15 @@ class CGen:
         self.globals = utils.Builder()
         self.out = utils.Builder()
 
+        # `--incremental`: one translation unit per module, the global
+        # definitions go into the main unit. `--split-c`: the function
+        # bodies are distributed between shards. `interface` contains the
+        # declarations of the shared header, by name.
+        self.units = {"": self.out}
+        self.fn_bodies = []
+        self.global_defs = utils.Builder()
+        self.interface = {}
+
     def gen(self, out_rir):
         self.comp.vlog("cgen: generating structs...")
         self.gen_structs(out_rir.structs)
@@ -44,17 +57,15 @@ class CGen:
         self.comp.vlog("cgen: generating decls...")
         self.gen_decls(out_rir.decls)
 
+        if self.comp.prefs.incremental or self.comp.prefs.split_c > 0:
+            self.gen_units()
+            return
+
         self.comp.vlog("cgen: generating C file...")
         c_file = f"module.{self.comp.prefs.mod_name}.c"
         with open(c_file, "w+") as out:
-            out.write(c_headers.HEADER)
-            if self.comp.prefs.build_mode != prefs.BuildMode.Release:
-                out.write(c_headers.RIVET_BREAKPOINT)
-            out.write(str(self.typedefs).strip() + "\n\n")
-            out.write(str(self.structs).strip() + "\n\n")
-            out.write(str(self.protos).strip() + "\n\n")
-            out.write(str(self.globals).strip() + "\n\n")
-            out.write(str(self.out).strip())
+            self.comp.stats.count("c_bytes", out.write(self.gen_header()))
+            self.comp.stats.count("c_bytes", out.write(str(self.out).strip()))
 
         self.comp.vlog("cgen: generating C compiler arguments...")
         args = [
@@ -81,7 +92,8 @@ class CGen:
         self.comp.vlog(f"C compiler arguments: {' '.join(args)}")
 
         self.comp.vlog("cgen: compiling C file...")
-        res = utils.execute(*args)
+        with self.comp.stats.timed("backend"):
+            res = utils.execute(*args)
         if res.exit_code == 0:
             if not self.comp.prefs.keep_c:
                 os.remove(c_file)
@@ -90,6 +102,167 @@ class CGen:
                 f"error while compiling the output C file `{c_file}`:\n{res.err}"
             )
 
+    def gen_header(self):
+        sb = utils.Builder()
+        sb.writeln(f"// Auto-generated by {utils.full_version()}. DO NOT MODIFY!")
+        sb.writeln()
+        sb.write(c_headers.HEADER)
+        if self.comp.prefs.build_mode != prefs.BuildMode.Release:
+            sb.write(c_headers.RIVET_BREAKPOINT)
+        sb.write(str(self.typedefs).strip() + "\n\n")
+        sb.write(str(self.structs).strip() + "\n\n")
+        sb.write(str(self.protos).strip() + "\n\n")
+        sb.write(str(self.globals).strip() + "\n\n")
+        return str(sb)
+
+    # Splits the function bodies between `n` shards of similar size, the
+    # first shard also contains the global definitions.
+    def gen_shards(self, n):
+        shards = [utils.Builder() for _ in range(n)]
+        shards[0].write(str(self.global_defs))
+        for body in self.fn_bodies:
+            shard = min(shards, key = lambda sb: sb.len())
+            shard.write(str(body))
+        return [("" if i == 0 else f"shard{i}", sb)
+                for i, sb in enumerate(shards)]
+
+    # Writes a shared header and a C file for each unit and compiles them
+    # concurrently (see `-j`), then links everything. With `--incremental`
+    # there is one unit per module, and the objects of the units whose code
+    # (and used declarations) have not changed are taken from
+    # `~/.rivet_lang/obj/<postfix>/`.
+    def gen_units(self):
+        mod_name = self.comp.prefs.mod_name
+        h_file = f"module.{mod_name}.h"
+        self.comp.vlog(f"cgen: generating C header `{h_file}`...")
+        with open(h_file, "w+") as out:
+            out.write("#define RIVET_MULTIPLE_UNITS\n")
+            self.comp.stats.count("c_bytes", out.write(self.gen_header()))
+        c_files = [h_file]
+
+        if self.comp.prefs.incremental:
+            units = list(self.units.items())
+            units[0] = ("", str(self.global_defs) + "\n" + str(units[0][1]))
+            obj_dir = path.join(
+                prefs.RIVET_DIR, "obj", self.comp.prefs.get_obj_postfix()
+            )
+            os.makedirs(obj_dir, exist_ok = True)
+        else:
+            units = self.gen_shards(self.comp.prefs.split_c)
+
+        args = self.unit_compiler_args()
+        self.comp.vlog(f"C compiler arguments: {' '.join(args)}")
+        objects = []
+        jobs = []
+        for i, (unit_name, unit) in enumerate(units):
+            if unit_name == "":
+                unit_name = f"{mod_name}.main"
+            code = f'#include "{h_file}"\n\n{str(unit).strip()}\n'
+            c_file = f"module.{mod_name}.{i}.c"
+            if self.comp.prefs.incremental:
+                key = self.unit_key(args, code)
+                obj_file = path.join(obj_dir, f"{unit_name}.{key}.o")
+                objects.append(obj_file)
+                if path.exists(obj_file):
+                    self.comp.vlog(f"cgen: unit `{unit_name}` is up to date")
+                    continue
+            else:
+                obj_file = f"{c_file}.o"
+                objects.append(obj_file)
+            c_files.append(c_file)
+            with open(c_file, "w+") as out:
+                self.comp.stats.count("c_bytes", out.write(code))
+            jobs.append((unit_name, c_file, obj_file))
+
+        with self.comp.stats.timed("backend"), futures.ThreadPoolExecutor(
+            self.comp.prefs.jobs or os.cpu_count()
+        ) as pool:
+            results = []
+            for unit_name, c_file, obj_file in jobs:
+                self.comp.vlog(f"cgen: compiling unit `{unit_name}`...")
+                tmp_file = f"{obj_file}.{os.getpid()}.tmp"
+                results.append((
+                    c_file, obj_file, tmp_file,
+                    pool.submit(
+                        utils.execute, *args, "-c", "-o", tmp_file, c_file
+                    )
+                ))
+            for c_file, obj_file, tmp_file, res in results:
+                res = res.result()
+                if res.exit_code != 0:
+                    utils.error(
+                        f"error while compiling the output C file `{c_file}`:\n{res.err}"
+                    )
+                os.replace(tmp_file, obj_file)
+
+        args = [
+            self.comp.prefs.target_backend_compiler, "-o",
+            self.comp.prefs.mod_output,
+            "-m64" if self.comp.prefs.target_bits == prefs.Bits.X64 else "-m32",
+        ]
+        if self.comp.prefs.build_mode == prefs.BuildMode.Release:
+            args.append("-flto")
+            args.append("-O3")
+        else:
+            args.append("-g")
+        if self.comp.prefs.target_os == prefs.OS.Windows:
+            args.append(f"-municode")
+        for l in self.comp.prefs.library_path:
+            args.append(f"-L{l}")
+        args += objects
+        for obj in self.comp.prefs.objects_to_link:
+            args.append(obj)
+        for l in self.comp.prefs.libraries_to_link:
+            args.append(f"-l{l}")
+        self.comp.vlog(f"cgen: linking objects: {' '.join(args)}")
+        with self.comp.stats.timed("backend"):
+            res = utils.execute(*args)
+        if res.exit_code != 0:
+            utils.error(f"error while linking the module objects:\n{res.err}")
+        if not self.comp.prefs.incremental:
+            for obj_file in objects:
+                os.remove(obj_file)
+        if not self.comp.prefs.keep_c:
+            for c_file in c_files:
+                os.remove(c_file)
+
+    def unit_compiler_args(self):
+        args = [
+            self.comp.prefs.target_backend_compiler, "-Werror", "-fno-builtin",
+            "-m64" if self.comp.prefs.target_bits == prefs.Bits.X64 else "-m32",
+        ]
+        if self.comp.prefs.build_mode == prefs.BuildMode.Release:
+            args.append("-flto")
+            args.append("-O3")
+        else:
+            args.append("-g")
+        if self.comp.prefs.target_os == prefs.OS.Windows:
+            args.append(f"-municode")
+        for f in self.comp.prefs.flags:
+            args.append(f"-D{f}")
+        return args
+
+    # The key of a unit is formed by its code and the declarations of the
+    # header that it uses (directly or indirectly), so that changes in other
+    # modules do not invalidate its object.
+    def unit_key(self, args, code):
+        used = set()
+        names = C_NAME.findall(code)
+        while len(names) > 0:
+            name = names.pop()
+            if name in used or name not in self.interface:
+                continue
+            used.add(name)
+            names += C_NAME.findall(self.interface[name])
+        h = hashlib.sha256(" ".join(args).encode())
+        h.update(c_headers.HEADER.encode())
+        if self.comp.prefs.build_mode != prefs.BuildMode.Release:
+            h.update(c_headers.RIVET_BREAKPOINT.encode())
+        for name in sorted(used):
+            h.update(self.interface[name].encode())
+        h.update(code.encode())
+        return h.hexdigest()[:32]
+
     def write(self, txt):
         self.out.write(txt)
 
@@ -98,20 +271,24 @@ class CGen:
 
     def gen_structs(self, structs):
         for s in structs:
-            self.typedefs.writeln(f"typedef struct {s.name} {s.name};")
+            typedef = f"typedef struct {s.name} {s.name};\n"
+            self.typedefs.write(typedef)
+            sb = utils.Builder()
             if not s.is_opaque:
-                self.structs.writeln(f"struct {s.name} {{")
+                sb.writeln(f"struct {s.name} {{")
                 for i, f in enumerate(s.fields):
-                    self.structs.write("  ")
-                    self.structs.write(self.gen_type(f.typ, f.name))
+                    sb.write("  ")
+                    sb.write(self.gen_type(f.typ, f.name))
                     if not isinstance(f.typ, (ir.Array, ir.Function)):
-                        self.structs.write(f" {f.name}")
+                        sb.write(f" {f.name}")
                     if i < len(s.fields) - 1:
-                        self.structs.writeln(";")
+                        sb.writeln(";")
                     else:
-                        self.structs.writeln(";")
-                self.structs.writeln("};")
-            self.structs.writeln()
+                        sb.writeln(";")
+                sb.writeln("};")
+            sb.writeln()
+            self.structs.write(str(sb))
+            self.interface[s.name] = typedef + str(sb)
 
     def gen_externs(self, externs):
         for extern_fn in externs:
@@ -119,100 +296,122 @@ class CGen:
 
     def gen_globals(self, globals):
         for g in globals:
+            sb = utils.Builder()
             if not g.is_pub:
-                self.globals.write("RIVET_LOCAL ")
+                sb.write("RIVET_LOCAL ")
             if g.is_extern:
-                self.globals.write("extern ")
+                sb.write("extern ")
             if isinstance(g.typ, ir.Array):
-                self.globals.write(self.gen_type(g.typ, g.name))
+                sb.write(self.gen_type(g.typ, g.name))
             else:
-                self.globals.write(self.gen_type(g.typ))
-                self.globals.write(" ")
-                self.globals.write(g.name)
-            self.globals.writeln(";")
+                sb.write(self.gen_type(g.typ))
+                sb.write(" ")
+                sb.write(g.name)
+            sb.writeln(";")
+            decl = str(sb)
+            if (
+                self.comp.prefs.incremental or self.comp.prefs.split_c > 0
+            ) and not g.is_extern:
+                self.global_defs.write(decl)
+                decl = f"extern {decl}"
+            self.globals.write(decl)
+            self.interface[g.name] = decl
 
     def gen_decls(self, decls):
         for decl in decls:
             if isinstance(decl, ir.FnDecl):
+                if self.comp.prefs.incremental:
+                    if decl.mod_name not in self.units:
+                        self.units[decl.mod_name] = utils.Builder()
+                    self.out = self.units[decl.mod_name]
+                elif self.comp.prefs.split_c > 0:
+                    self.out = utils.Builder()
+                    self.fn_bodies.append(self.out)
                 self.gen_fn_decl(decl)
             else:
                 self.gen_vtable(decl)
             self.writeln()
 
     def gen_vtable(self, decl):
-        self.globals.writeln(
+        sb = utils.Builder()
+        sb.writeln(
             f"static {decl.structure} {decl.name}[{decl.implement_nr}] = {{"
         )
         for i, ft in enumerate(decl.funcs):
-            self.globals.writeln('  {')
+            sb.writeln('  {')
             items = ft.items()
             for i2, (f, impl) in enumerate(items):
-                self.globals.write(f'    .{f} = (void*){impl}')
+                sb.write(f'    .{f} = (void*){impl}')
                 if i2 < len(items) - 1:
-                    self.globals.writeln(", ")
+                    sb.writeln(", ")
                 else:
-                    self.globals.writeln()
-            self.globals.write("  }")
+                    sb.writeln()
+            sb.write("  }")
             if i < len(decl.funcs) - 1:
-                self.globals.writeln(",")
+                sb.writeln(",")
             else:
-                self.globals.writeln()
-        self.globals.writeln("};")
+                sb.writeln()
+        sb.writeln("};")
+        self.globals.write(str(sb))
+        self.interface[decl.name] = str(sb)
 
     def gen_fn_decl(self, decl):
+        proto = utils.Builder()
         if decl.is_never:
             if not decl.is_extern:
                 self.write("RIVET_NEVER ")
-            self.protos.write("RIVET_NEVER ")
+            proto.write("RIVET_NEVER ")
         if not decl.is_extern:
             if decl.is_pub:
                 self.write("RIVET_EXPORT ")
-                self.protos.write("RIVET_EXPORT ")
+                proto.write("RIVET_EXPORT ")
             else:
                 self.write("RIVET_LOCAL ")
-                self.protos.write("RIVET_LOCAL ")
+                proto.write("RIVET_LOCAL ")
         if decl.attrs.has("inline") and not decl.is_extern:
             self.write("inline ")
         if isinstance(decl.ret_typ, ir.Function):
             ret_typ = self.gen_type(decl.ret_typ.ret_typ) + " (*"
         else:
             ret_typ = self.gen_type(decl.ret_typ)
-        self.protos.write(f"{ret_typ} {decl.name}(")
+        proto.write(f"{ret_typ} {decl.name}(")
         if not decl.is_extern:
             self.write(f"{ret_typ} {decl.name}(")
         if len(decl.args) == 0:
             if not decl.is_extern:
                 self.write("void")
-            self.protos.write("void")
+            proto.write("void")
         else:
             for i, arg in enumerate(decl.args):
                 arg_typ = self.gen_type(arg.typ, arg.name)
-                self.protos.write(arg_typ)
+                proto.write(arg_typ)
                 if not decl.is_extern:
                     self.write(arg_typ)
                 if not isinstance(arg.typ, (ir.Array, ir.Function)):
-                    self.protos.write(f" {arg.name}")
+                    proto.write(f" {arg.name}")
                     if not decl.is_extern:
                         self.write(f" {arg.name}")
                 if i < len(decl.args) - 1:
-                    self.protos.write(", ")
+                    proto.write(", ")
                     if not decl.is_extern:
                         self.write(", ")
             if decl.is_variadic:
                 if len(decl.args) > 0:
                     if not decl.is_extern:
                         self.write(", ")
-                    self.protos.write(", ")
+                    proto.write(", ")
                 if not decl.is_extern:
                     self.write("...")
-                self.protos.write("...")
+                proto.write("...")
         if isinstance(decl.ret_typ, ir.Function):
-            self.protos.write(")) (")
+            proto.write(")) (")
             for i, arg in enumerate(decl.ret_typ.args):
-                self.protos.write(self.gen_type(arg))
+                proto.write(self.gen_type(arg))
                 if i < len(decl.ret_typ.args) - 1:
-                    self.protos.write(", ")
-        self.protos.writeln(");")
+                    proto.write(", ")
+        proto.writeln(");")
+        self.protos.write(str(proto))
+        self.interface[decl.name] = str(proto)
         if not decl.is_extern:
             if isinstance(decl.ret_typ, ir.Function):
                 self.write(") (")
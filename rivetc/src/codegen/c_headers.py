@@ -2,16 +2,20 @@
 # Use of this source code is governed by an MIT license that can
 # be found in the LICENSE file.
 
-from ..utils import full_version
-
-HEADER = f"// Auto-generated by {full_version()}" + """. DO NOT MODIFY!
-
-#include <stddef.h>
+HEADER = """#include <stddef.h>
 #include <stdint.h>
 
+// When the module is compiled as multiple translation units, the local
+// symbols are shared between them, so they cannot be `static`.
+#if defined(RIVET_MULTIPLE_UNITS)
+	#define RIVET_STATIC
+#else
+	#define RIVET_STATIC static
+#endif
+
 #if defined(_WIN32) || defined(__CYGWIN__)
 	#define RIVET_EXPORT extern __declspec(dllexport)
-	#define RIVET_LOCAL static
+	#define RIVET_LOCAL RIVET_STATIC
 #else
 	// 4 < GCC < 5 is used by some older Ubuntu LTS and CentOS versions, and does
 	// not support __has_attribute(visibility):
@@ -27,13 +31,13 @@ HEADER = f"// Auto-generated by {full_version()}" + """. DO NOT MODIFY!
 		#endif
 
 		#if defined(__clang__) && (defined(_VUSECACHE) || defined(_VBUILDMODULE))
-			#define RIVET_LOCAL static
+			#define RIVET_LOCAL RIVET_STATIC
 		#else
 			#define RIVET_LOCAL __attribute__ ((visibility ("hidden")))
 		#endif
 	#else
 		#define RIVET_EXPORT extern
-		#define RIVET_LOCAL static
+		#define RIVET_LOCAL RIVET_STATIC
 	#endif
 #endif
 
@@ -0,0 +1,88 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+from . import ir
+
+# Removes from the RIR file the functions, virtual tables, structs and
+# extern declarations that are not reachable from `main` (which also
+# references the tests, in test mode), the global variables and the
+# exported functions. RIR refers to the declarations by their (mangled)
+# names, so a declaration is reachable if its name is used by a reachable
+# declaration. Returns the number of removed declarations.
+def eliminate_dead_code(out_rir):
+    decls = {}
+    for decl in out_rir.structs + out_rir.externs + out_rir.decls:
+        decls[decl.name] = decl
+
+    reachable = set()
+    names = ["main"]
+    for decl in out_rir.decls:
+        if isinstance(decl, ir.FnDecl) and (decl.is_pub or decl.is_export):
+            names.append(decl.name)
+    for g in out_rir.globals:
+        refs(g.typ, names)
+    while len(names) > 0:
+        name = names.pop()
+        if name in reachable or name not in decls:
+            continue
+        reachable.add(name)
+        decl_refs(decls[name], names)
+
+    removed = len(decls) - len(reachable)
+    out_rir.structs = [s for s in out_rir.structs if s.name in reachable]
+    out_rir.externs = [e for e in out_rir.externs if e.name in reachable]
+    out_rir.decls = [d for d in out_rir.decls if d.name in reachable]
+    return removed
+
+def decl_refs(decl, names):
+    if isinstance(decl, ir.FnDecl):
+        for arg in decl.args:
+            refs(arg.typ, names)
+        refs(decl.ret_typ, names)
+        if decl.arr_ret_struct:
+            names.append(decl.arr_ret_struct)
+        for local in decl.locals:
+            refs(local.typ, names)
+        for inst in decl.instrs:
+            refs(inst, names)
+    elif isinstance(decl, ir.Struct):
+        for f in decl.fields:
+            refs(f.typ, names)
+    elif isinstance(decl, ir.VTable):
+        names.append(decl.structure)
+        for funcs in decl.funcs:
+            names += funcs.values()
+
+# Adds to `names` the names used by an instruction, a value or a type.
+def refs(node, names):
+    stack = [node]
+    while len(stack) > 0:
+        node = stack.pop()
+        if isinstance(node, ir.Inst):
+            stack += node.args
+            stack.append(node.typ)
+        elif isinstance(node, (ir.Ident, ir.Name)):
+            names.append(node.name)
+            if isinstance(node, ir.Ident):
+                stack.append(node.typ)
+        elif isinstance(node, ir.Selector):
+            stack.append(node.left)
+            stack.append(node.typ)
+        elif isinstance(node, ir.ArrayLit):
+            stack += node.elems
+            stack.append(node.typ)
+        elif isinstance(node, ir.Type):
+            names.append(node.name)
+        elif isinstance(node, (ir.Pointer, ir.Array)):
+            stack.append(node.typ)
+        elif isinstance(node, ir.Function):
+            if isinstance(node.args, list):
+                stack += node.args
+            else:
+                stack.append(node.args)
+            stack.append(node.ret_typ)
+        elif isinstance(
+            node, (ir.NoneLit, ir.IntLit, ir.FloatLit, ir.RuneLit, ir.StringLit)
+        ):
+            stack.append(node.typ)
@@ -33,6 +33,8 @@ def get_ir_op(op):
     return op_kind
 
 class Type:
+    __slots__ = ("name", )
+
     def __init__(self, name):
         self.name = name
 
@@ -49,6 +51,8 @@ class Type:
         return str(self) == str(other)
 
 class Pointer:
+    __slots__ = ("typ", "is_managed")
+
     def __init__(self, typ, is_managed = False):
         self.typ = typ
         self.is_managed = is_managed
@@ -92,6 +96,8 @@ TEST_T = Type("_R4core4Test")
 TEST_RUNNER_T = Type("_R4core10TestRunner")
 
 class Array:
+    __slots__ = ("typ", "size")
+
     def __init__(self, typ, size):
         self.typ = typ
         self.size = size
@@ -109,6 +115,8 @@ class Array:
         return str(self) == str(other)
 
 class Function:
+    __slots__ = ("args", "ret_typ")
+
     def __init__(self, args, ret_typ):
         self.args = args
         self.ret_typ = ret_typ
@@ -126,6 +134,8 @@ class Function:
         return str(self) == str(other)
 
 class RIRFile:
+    __slots__ = ("mod_name", "structs", "externs", "globals", "decls")
+
     def __init__(self, mod_name):
         self.mod_name = mod_name
         self.structs = []
@@ -167,6 +177,8 @@ class RIRFile:
         return self.__repr__()
 
 class VTable:
+    __slots__ = ("structure", "name", "trait_name", "implement_nr", "funcs")
+
     def __init__(self, structure, name, trait_name, implement_nr, funcs):
         self.structure = structure
         self.name = name
@@ -190,6 +202,8 @@ class VTable:
         return str(sb)
 
 class Struct:
+    __slots__ = ("is_opaque", "name", "fields")
+
     def __init__(self, is_opaque, name, fields):
         self.is_opaque = is_opaque
         self.name = name
@@ -211,11 +225,15 @@ class Struct:
         return str(sb)
 
 class Field:
+    __slots__ = ("name", "typ")
+
     def __init__(self, name, typ):
         self.name = name
         self.typ = typ
 
 class GlobalVar:
+    __slots__ = ("is_pub", "is_extern", "typ", "name")
+
     def __init__(self, is_pub, is_extern, typ, name):
         self.is_pub = is_pub
         self.is_extern = is_extern
@@ -232,11 +250,19 @@ class GlobalVar:
         return f'{kw}var %{self.name}: {self.typ}'
 
 class Local:
+    __slots__ = ("name", "typ")
+
     def __init__(self, name, typ):
         self.name = name
         self.typ = typ
 
 class FnDecl:
+    __slots__ = (
+        "is_pub", "attrs", "is_extern", "name", "args", "is_variadic",
+        "ret_typ", "is_never", "arr_ret_struct", "mod_name", "is_export",
+        "locals", "locals_nr", "uniq_ids", "instrs"
+    )
+
     def __init__(
         self, is_pub, attrs, is_extern, name, args, is_variadic, ret_typ,
         is_never
@@ -250,6 +276,8 @@ class FnDecl:
         self.ret_typ = ret_typ
         self.is_never = is_never
         self.arr_ret_struct = ""
+        self.mod_name = "" # module in which this function was generated
+        self.is_export = False # `extern` function with body
 
         self.locals = []
         self.locals_nr = 0
@@ -373,6 +401,8 @@ class FnDecl:
         return str(sb)
 
 class Comment:
+    __slots__ = ("text", )
+
     def __init__(self, text):
         self.text = text
 
@@ -383,6 +413,8 @@ class Comment:
         return self.__repr__()
 
 class NoneLit:
+    __slots__ = ("typ", )
+
     def __init__(self, typ):
         self.typ = typ
 
@@ -393,6 +425,8 @@ class NoneLit:
         return self.__repr__()
 
 class IntLit:
+    __slots__ = ("typ", "lit")
+
     def __init__(self, typ, lit):
         self.typ = typ
         self.lit = lit
@@ -407,6 +441,8 @@ class IntLit:
         return self.__repr__()
 
 class FloatLit:
+    __slots__ = ("typ", "lit")
+
     def __init__(self, typ, lit):
         self.typ = typ
         self.lit = lit
@@ -418,6 +454,8 @@ class FloatLit:
         return self.__repr__()
 
 class RuneLit:
+    __slots__ = ("lit", "typ")
+
     def __init__(self, typ, lit):
         self.lit = lit
         self.typ = typ
@@ -429,6 +467,8 @@ class RuneLit:
         return self.__repr__()
 
 class StringLit:
+    __slots__ = ("lit", "len", "typ")
+
     def __init__(self, lit, len_):
         self.lit = lit
         self.len = len_
@@ -441,6 +481,8 @@ class StringLit:
         return self.__repr__()
 
 class ArrayLit:
+    __slots__ = ("typ", "elems")
+
     def __init__(self, typ, elems):
         self.typ = typ
         self.elems = elems
@@ -452,6 +494,8 @@ class ArrayLit:
         return self.__repr__()
 
 class Ident: # Local and global values
+    __slots__ = ("name", "typ")
+
     def __init__(self, typ, name):
         self.name = name
         self.typ = typ
@@ -463,6 +507,8 @@ class Ident: # Local and global values
         return self.__repr__()
 
 class Selector:
+    __slots__ = ("typ", "left", "name")
+
     def __init__(self, typ, left, name):
         self.typ = typ
         self.left = left
@@ -475,6 +521,8 @@ class Selector:
         return self.__repr__()
 
 class Name: # Simple identifier, e.g. labels
+    __slots__ = ("name", )
+
     def __init__(self, name):
         self.name = name
 
@@ -485,6 +533,8 @@ class Name: # Simple identifier, e.g. labels
         return self.name
 
 class Label:
+    __slots__ = ("label", )
+
     def __init__(self, label):
         self.label = label
 
@@ -495,6 +545,8 @@ class Label:
         return self.__repr__()
 
 class Skip:
+    __slots__ = ("typ", )
+
     def __init__(self):
         self.typ = Type("void")
 
@@ -582,6 +634,8 @@ class InstKind(Enum):
         return self.__repr__()
 
 class Inst:
+    __slots__ = ("kind", "args", "typ")
+
     def __init__(self, kind, args, typ = Type("void")):
         self.kind = kind
         self.args = args
@@ -2,6 +2,9 @@
 # Use of this source code is governed by an MIT license that can
 # be found in the LICENSE file.
 
+import re
+from array import array
+
 from .token import Kind
 from . import utils, token, report
 
@@ -9,6 +12,47 @@ LF = chr(10)
 CR = chr(13)
 NUM_SEP = "_"
 
+WHITESPACE_RE = re.compile("[\x08-\x0d \x85\xa0]+")
+IDENT_RE = re.compile("[A-Za-z_0-9]+")
+DEC_DIGITS_RE = re.compile("[0-9]+")
+NAME_START = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_"
+)
+
+KINDS = {kind.value: kind for kind in Kind}
+
+# Files of this size or larger are lexed while they are parsed, keeping
+# only a small window of tokens in memory (see `Lexer.fill`).
+STREAMING_THRESHOLD = 1024 * 1024
+STREAMING_CHUNK = 256
+
+# tokens of one character, and the tokens of two characters that start
+# with the same character
+OPERATORS = {
+    "+": (Kind.Plus, {"=": Kind.PlusAssign}),
+    "-": (Kind.Minus, {"=": Kind.MinusAssign}),
+    "*": (Kind.Mul, {"=": Kind.MulAssign}),
+    "%": (Kind.Mod, {"=": Kind.ModAssign}),
+    "@": (Kind.At, {}),
+    "=": (Kind.Assign, {"=": Kind.Eq, ">": Kind.Arrow}),
+    "<": (Kind.Lt, {"=": Kind.Le}),
+    ">": (Kind.Gt, {"=": Kind.Ge}),
+    ",": (Kind.Comma, {}),
+    ":": (Kind.Colon, {"=": Kind.DeclAssign}),
+    ";": (Kind.Semicolon, {}),
+    "?": (Kind.Question, {"?": Kind.OrElse}),
+    "&": (Kind.Amp, {"=": Kind.AmpAssign}),
+    "|": (Kind.Pipe, {"=": Kind.PipeAssign}),
+    "~": (Kind.BitNot, {}),
+    "^": (Kind.Xor, {"=": Kind.XorAssign}),
+    "{": (Kind.Lbrace, {}),
+    "}": (Kind.Rbrace, {}),
+    "[": (Kind.Lbracket, {}),
+    "]": (Kind.Rbracket, {}),
+    "(": (Kind.Lparen, {}),
+    ")": (Kind.Rparen, {}),
+}
+
 def is_hex_digit(ch):
     return ch.isdigit() or (ch >= "a"
                             and ch <= "f") or (ch >= "A" and ch <= "F")
@@ -25,88 +69,143 @@ class Conditional:
         self.else_found = False
         self.skip_section = False
 
+# A token of the token buffer of a lexer, its position is created only when
+# it is used.
+class BufferedToken(token.Token):
+    __slots__ = ("file_id", "offset", "cached_pos")
+
+    def __init__(self, lit, kind, file_id, offset):
+        self.lit = lit
+        self.kind = kind
+        self.file_id = file_id
+        self.offset = offset
+        self.cached_pos = None
+
+    @property
+    def pos(self):
+        if self.cached_pos == None:
+            self.cached_pos = token.Pos(self.file_id, self.offset)
+        return self.cached_pos
+
 class Lexer:
-    def __init__(self, comp, text):
+    def __init__(self, comp, text, file = "<in-memory>"):
         self.comp = comp
-        self.file = "<in-memory>"
+        self.file = file
+        self.file_id = token.add_file(file)
         self.text = text
         self.text_len = len(text)
 
-        self.line = 0
-        self.last_nl_pos = 0
         self.pos = 0
 
         self.is_started = False
-        self.is_cr_lf = False
 
         self.conditional_stack = []
 
-        self.all_tokens = []
+        # the token buffer: the kind and offset of each token, and the
+        # literals of the tokens that have one (by token index); in streaming
+        # mode the tokens already read by the parser are dropped, and
+        # `first_idx` is the index of the first token of the buffer
+        self.kinds = array("H")
+        self.offsets = array("I")
+        self.lits = {}
+        self.first_idx = 0
         self.tidx = 0
+        self.is_streaming = False
+        self.is_done = False
+
+        self.tok_offset = 0 # start of the token being read
 
     @staticmethod
-    def from_file(comp, file):
-        s = Lexer(comp, open(file, encoding = 'UTF-8').read())
-        s.file = file
-        s.tokenize_remaining_text()
+    def from_file(comp, file, text = None):
+        with comp.stats.timed("lexing"):
+            if text == None:
+                text = open(file, encoding = 'UTF-8').read()
+            s = Lexer(comp, text, file)
+            if s.text_len >= STREAMING_THRESHOLD:
+                s.is_streaming = True
+                return s
+            s.tokenize_remaining_text()
+        comp.stats.count("tokens", len(s.kinds))
+        return s
+
+    # Lexes the span `[start, end]` of the text of a file, see
+    # `ast.LazyBody`.
+    @staticmethod
+    def from_span(comp, file, text, start, end):
+        with comp.stats.timed("lexing"):
+            s = Lexer(comp, text[:end + 1], file)
+            s.pos = start
+            s.tokenize_remaining_text()
+        comp.stats.count("tokens", len(s.kinds))
         return s
 
     def tokenize_remaining_text(self):
-        while True:
-            t = self.internal_next()
-            self.all_tokens.append(t)
-            if t.kind == Kind.EOF:
+        while not self.is_done:
+            self.tokenize(STREAMING_CHUNK)
+
+    def tokenize(self, n):
+        idx = self.first_idx + len(self.kinds)
+        for _ in range(n):
+            kind, lit = self.internal_next()
+            if len(lit) > 0:
+                self.lits[idx] = lit
+            self.kinds.append(kind)
+            self.offsets.append(self.tok_offset)
+            idx += 1
+            if kind == Kind.EOF:
+                self.is_done = True
                 break
 
-    def current_char(self):
-        return self.text[self.pos]
-
-    def current_pos(self):
-        return token.Pos(
-            self.file, self.line, max(1, self.current_column()), self.pos
+    # Lexes the next tokens of the file (in streaming mode) until the token
+    # `idx` is in the buffer, and drops the tokens already read.
+    def fill(self, idx):
+        if self.tidx - 2 - self.first_idx >= STREAMING_CHUNK:
+            # the parser may look back up to 2 tokens
+            drop = self.tidx - 2 - self.first_idx
+            for i in range(self.first_idx, self.first_idx + drop):
+                self.lits.pop(i, None)
+            del self.kinds[:drop]
+            del self.offsets[:drop]
+            self.first_idx += drop
+        with self.comp.stats.timed("lexing"):
+            while not self.is_done and idx >= self.first_idx + len(self.kinds):
+                tokens = len(self.kinds)
+                self.tokenize(STREAMING_CHUNK)
+                self.comp.stats.count("tokens", len(self.kinds) - tokens)
+
+    def token_at(self, idx):
+        if idx >= self.first_idx + len(self.kinds):
+            if self.is_streaming:
+                self.fill(idx)
+            if idx >= self.first_idx + len(self.kinds):
+                return token.Token("", Kind.EOF, self.current_pos())
+        i = idx - self.first_idx
+        return BufferedToken(
+            self.lits.get(idx, ""), KINDS[self.kinds[i]], self.file_id,
+            self.offsets[i]
         )
 
-    def ignore_line(self):
-        self.eat_to_end_of_line()
-        self.inc_line_number()
+    def start_token(self):
+        self.tok_offset = self.pos
 
-    def eat_to_end_of_line(self):
-        while self.pos < self.text_len and self.current_char() != LF:
-            self.pos += 1
+    def current_char(self):
+        return self.text[self.pos]
 
-    def inc_line_number(self):
-        self.last_nl_pos = min(self.text_len - 1, self.pos)
-        if self.is_cr_lf:
-            self.last_nl_pos += 1
-        self.line += 1
+    def current_pos(self):
+        return token.Pos(self.file_id, self.pos)
 
-    def current_column(self):
-        return self.pos - self.last_nl_pos
+    def is_same_line(self, pos, other_pos):
+        start, end = min(pos, other_pos), max(pos, other_pos)
+        return self.text.find(LF, start, end) == -1
 
-    def is_new_line(self, ch):
-        return ch in (CR, LF)
+    def ignore_line(self):
+        self.pos = self.text.find(LF, self.pos)
+        if self.pos == -1:
+            self.pos = self.text_len
 
     def skip_whitespace(self):
-        while self.pos < self.text_len:
-            c = self.current_char()
-            if c == chr(8):
-                self.pos += 1
-                continue
-            if not (
-                c == chr(32) or (c > chr(8) and c < chr(14)) or
-                (c == chr(0x85)) or (c == chr(0xA0))
-            ):
-                return
-            if (
-                self.pos + 1 < self.text_len and c == CR
-                and self.text[self.pos + 1] == LF
-            ):
-                self.is_cr_lf = True
-            if self.is_new_line(c) and not (
-                self.pos > 0 and self.text[self.pos - 1] == CR and c == LF
-            ):
-                self.inc_line_number()
-            self.pos += 1
+        if m := WHITESPACE_RE.match(self.text, self.pos):
+            self.pos = m.end()
 
     def matches(self, want, start_pos):
         end_pos = start_pos + len(want)
@@ -121,10 +220,7 @@ class Lexer:
         return True
 
     def peek_token(self, n):
-        idx = self.tidx + n
-        if idx >= len(self.all_tokens):
-            return token.Token("", Kind.EOF, self.current_pos())
-        return self.all_tokens[idx]
+        return self.token_at(self.tidx + n)
 
     def look_ahead(self, pos):
         return self.text[self.pos +
@@ -132,6 +228,9 @@ class Lexer:
 
     def read_ident(self):
         start = self.pos
+        if m := IDENT_RE.match(self.text, self.pos):
+            self.pos = m.end()
+        # non-ASCII digits
         while self.pos < self.text_len:
             c = self.text[self.pos]
             if utils.is_valid_name(c) or c.isdigit():
@@ -272,6 +371,14 @@ class Lexer:
 
     def read_dec_number(self):
         start = self.pos
+        # fast path: only ASCII digits
+        if m := DEC_DIGITS_RE.match(self.text, self.pos):
+            end = m.end()
+            if end >= self.text_len or not (
+                self.text[end].isalnum() or self.text[end] in "_."
+            ):
+                self.pos = end - 1
+                return self.text[start:end]
         while self.pos < self.text_len:
             ch = self.current_char()
             if ch == NUM_SEP and self.text[self.pos + 1] == NUM_SEP:
@@ -452,8 +559,6 @@ class Lexer:
                 break # handle "\\" at the end
             if c == CR:
                 n_cr_chars += 1
-            if c == LF:
-                self.inc_line_number()
             if backslash_count % 2 == 1 and not (is_cstr or is_raw):
                 # escape `\x`
                 if c == "x":
@@ -469,14 +574,38 @@ class Lexer:
                 lit = lit.replace("\r", "")
         return lit
 
+    def skip_block_comment(self):
+        start_pos = self.current_pos()
+        end = self.text.find("*/", self.pos + 2)
+        if end == -1:
+            report.error("comment not terminated", start_pos)
+            self.pos = self.text_len - 1
+        else:
+            self.pos = end + 1
+
     def next(self):
+        self.tidx += 1
+        return self.token_at(self.tidx - 1)
+
+    # Returns the index of the `}` that closes the block whose first token is
+    # `idx`, or -1 if the block is not closed. In streaming mode the tokens
+    # are lexed as needed.
+    def closing_brace(self, idx):
+        depth = 1
         while True:
-            cidx = self.tidx
-            self.tidx += 1
-            if cidx >= len(self.all_tokens):
-                return token.Token("", Kind.EOF, self.current_pos())
-            return self.all_tokens[cidx]
-        return token.Token("", Kind.EOF, self.current_pos())
+            kinds = self.kinds
+            for i in range(idx - self.first_idx, len(kinds)):
+                kind = kinds[i]
+                if kind == Kind.Lbrace:
+                    depth += 1
+                elif kind == Kind.Rbrace:
+                    depth -= 1
+                    if depth == 0:
+                        return self.first_idx + i
+            idx = self.first_idx + len(kinds)
+            if not self.is_streaming or self.is_done:
+                return -1
+            self.fill(idx)
 
     def internal_next(self):
         while True:
@@ -485,13 +614,13 @@ class Lexer:
             else:
                 self.is_started = True
             self.skip_whitespace()
+            self.start_token()
             if self.pos >= self.text_len:
-                return token.Token("", Kind.EOF, self.current_pos())
-            pos = self.current_pos()
+                return Kind.EOF, ""
             ch, nextc = self.current_char(), self.look_ahead(1)
-            if utils.is_valid_name(ch):
+            if ch in NAME_START:
                 lit = self.read_ident()
-                return token.Token(lit, token.lookup(lit), pos)
+                return token.lookup(lit), lit
             elif ch.isdigit():
                 # decimals with 0 prefix = error
                 if ch == "0" and nextc.isdigit():
@@ -500,25 +629,13 @@ class Lexer:
                         self.current_pos()
                     )
                     report.help("use an `0o` prefix for octal integers")
-                return token.Token(
-                    self.read_number().replace("_", ""), Kind.Number, pos
-                )
+                return Kind.Number, self.read_number().replace("_", "")
             # delimiters and operators
-            if ch == "+":
-                if nextc == "=":
+            elif op := OPERATORS.get(ch):
+                if kind := op[1].get(nextc):
                     self.pos += 1
-                    return token.Token("", Kind.PlusAssign, pos)
-                return token.Token("", Kind.Plus, pos)
-            elif ch == "-":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.MinusAssign, pos)
-                return token.Token("", Kind.Minus, pos)
-            elif ch == "*":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.MulAssign, pos)
-                return token.Token("", Kind.Mul, pos)
+                    return kind, ""
+                return op[0], ""
             elif ch == "/":
                 if nextc == "/":
                     start_pos = self.pos
@@ -526,139 +643,53 @@ class Lexer:
                         start_pos += 3
                         self.ignore_line()
                         line = self.text[start_pos:self.pos].strip()
-                        return token.Token(line, Kind.DocComment, pos)
+                        return Kind.DocComment, line
                     self.ignore_line()
                     continue
                 elif nextc == "*":
-                    start_pos = self.pos
-                    self.pos += 1
-                    while self.pos < self.text_len - 1:
-                        self.pos += 1
-                        if self.current_char() == LF:
-                            self.inc_line_number()
-                            continue
-                        elif self.matches("*/", self.pos):
-                            self.pos += 1
-                            break
-                    if self.pos >= self.text_len:
-                        self.pos = start_pos
-                        report.error(
-                            "comment not terminated", self.current_pos()
-                        )
+                    self.skip_block_comment()
                     continue
                 elif nextc == "=":
                     self.pos += 1
-                    return token.Token("", Kind.DivAssign, pos)
-                return token.Token("", Kind.Div, pos)
-            elif ch == "%":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.ModAssign, pos)
-                return token.Token("", Kind.Mod, pos)
-            elif ch == "@":
-                return token.Token("", Kind.At, pos)
-            #
-            elif ch == "=":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.Eq, pos)
-                elif nextc == ">":
-                    self.pos += 1
-                    return token.Token("", Kind.Arrow, pos)
-                return token.Token("", Kind.Assign, pos)
-            #
-            elif ch == "<":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.Le, pos)
-                return token.Token("", Kind.Lt, pos)
-            elif ch == ">":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.Ge, pos)
-                return token.Token("", Kind.Gt, pos)
-            #
+                    return Kind.DivAssign, ""
+                return Kind.Div, ""
             elif ch == ".":
                 if nextc == "." and self.text[self.pos + 2] == ".":
                     self.pos += 2
-                    return token.Token("", Kind.Ellipsis, pos)
+                    return Kind.Ellipsis, ""
                 elif nextc == ".":
                     self.pos += 1
-                    return token.Token("", Kind.DotDot, pos)
-                return token.Token("", Kind.Dot, pos)
-            elif ch == ",":
-                return token.Token("", Kind.Comma, pos)
-            elif ch == ":":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.DeclAssign, pos)
-                return token.Token("", Kind.Colon, pos)
-            elif ch == ";":
-                return token.Token("", Kind.Semicolon, pos)
-            elif ch == "?":
-                if nextc == "?":
-                    self.pos += 1
-                    return token.Token("", Kind.OrElse, pos)
-                return token.Token("", Kind.Question, pos)
+                    return Kind.DotDot, ""
+                return Kind.Dot, ""
             elif ch == "#":
                 self.pp_directive()
                 continue
-            elif ch == "&":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.AmpAssign, pos)
-                return token.Token("", Kind.Amp, pos)
             elif ch == "!":
                 if (
                     self.matches("is", self.pos + 1)
                     and self.text[self.pos + 3].isspace()
                 ):
                     self.pos += 2
-                    return token.Token("", Kind.KwNotIs, pos)
+                    return Kind.KwNotIs, ""
                 elif (
                     self.matches("in", self.pos + 1)
                     and self.text[self.pos + 3].isspace()
                 ):
                     self.pos += 2
-                    return token.Token("", Kind.KwNotIn, pos)
+                    return Kind.KwNotIn, ""
                 elif nextc == "=":
                     self.pos += 1
-                    return token.Token("", Kind.Ne, pos)
-                return token.Token("", Kind.Bang, pos)
-            elif ch == "|":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.PipeAssign, pos)
-                return token.Token("", Kind.Pipe, pos)
-            elif ch == "~":
-                return token.Token("", Kind.BitNot, pos)
-            elif ch == "^":
-                if nextc == "=":
-                    self.pos += 1
-                    return token.Token("", Kind.XorAssign, pos)
-                return token.Token("", Kind.Xor, pos)
-            #
-            elif ch == "{":
-                return token.Token("", Kind.Lbrace, pos)
-            elif ch == "}":
-                return token.Token("", Kind.Rbrace, pos)
-            elif ch == "[":
-                return token.Token("", Kind.Lbracket, pos)
-            elif ch == "]":
-                return token.Token("", Kind.Rbracket, pos)
-            elif ch == "(":
-                return token.Token("", Kind.Lparen, pos)
-            elif ch == ")":
-                return token.Token("", Kind.Rparen, pos)
+                    return Kind.Ne, ""
+                return Kind.Bang, ""
             # characters and strings
             elif ch == "'":
-                return token.Token(self.read_char(), Kind.Char, pos)
+                return Kind.Char, self.read_char()
             elif ch == '"':
-                return token.Token(self.read_string(), Kind.String, pos)
+                return Kind.String, self.read_string()
             else:
-                report.error(f"invalid character `{ch}`", pos)
+                report.error(f"invalid character `{ch}`", self.current_pos())
                 break
-        return token.Token("", Kind.EOF, self.current_pos())
+        return Kind.EOF, ""
 
     def pp_directive(self):
         pos = self.current_pos()
@@ -680,16 +711,13 @@ class Lexer:
         if len(self.conditional_stack
                ) > 0 and self.conditional_stack[-1].skip_section:
             # skip tokens until next preprocessing directive
-            while self.pos < self.text_len:
-                cc = self.current_char()
-                if cc == '#':
-                    self.pos -= 1
-                    return
-                elif cc == '\n':
-                    self.inc_line_number()
-                self.pos += 1
+            next_pos = self.text.find("#", self.pos)
+            if next_pos != -1:
+                self.pos = next_pos - 1
+                return
             # if we get EOF, then no corresponding `#endif` has been written
-            if self.pos == self.text_len:
+            if self.pos <= self.text_len:
+                self.pos = self.text_len
                 report.error("expected `#endif`, found end of file", pos)
 
     def pp_if(self):
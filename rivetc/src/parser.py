@@ -8,6 +8,35 @@ from .token import Kind
 from .lexer import Lexer
 from . import ast, sym, type, prefs, report, token, utils
 
+# Precedences of the binary operators, from lowest to highest. `<` and `>`
+# followed by another token without spaces are the shift operators.
+(
+    OR_PREC, AND_PREC, EQ_PREC, REL_PREC, SHIFT_PREC, ADD_PREC, MUL_PREC
+) = range(1, 8)
+BINARY_PRECEDENCES = {
+    Kind.KwOr: OR_PREC,
+    Kind.KwAnd: AND_PREC,
+    Kind.Eq: EQ_PREC,
+    Kind.Ne: EQ_PREC,
+    Kind.Gt: REL_PREC,
+    Kind.Lt: REL_PREC,
+    Kind.Ge: REL_PREC,
+    Kind.Le: REL_PREC,
+    Kind.OrElse: REL_PREC,
+    Kind.KwIn: REL_PREC,
+    Kind.KwNotIn: REL_PREC,
+    Kind.KwIs: REL_PREC,
+    Kind.KwNotIs: REL_PREC,
+    Kind.Amp: SHIFT_PREC,
+    Kind.Pipe: SHIFT_PREC,
+    Kind.Xor: SHIFT_PREC,
+    Kind.Plus: ADD_PREC,
+    Kind.Minus: ADD_PREC,
+    Kind.Mul: MUL_PREC,
+    Kind.Div: MUL_PREC,
+    Kind.Mod: MUL_PREC
+}
+
 class Parser:
     def __init__(self, comp):
         self.comp = comp
@@ -33,6 +62,9 @@ class Parser:
         self.inside_switch_header = False
         self.inside_block = False
 
+        # skip the bodies of the functions, see `ast.LazyBody`
+        self.lazy_fn_bodies = False
+
     def parse_mod(self, mod_sym, files):
         self.mod_sym = mod_sym
         source_files = []
@@ -41,13 +73,50 @@ class Parser:
         return source_files
 
     def parse_file(self, file):
+        # with `--no-dce` all the functions are checked and generated
+        lazy_fn_bodies = self.comp.prefs.dce and not self.mod_sym.is_root
+        ast_cache = self.comp.ast_cache
+        text = None
+        if ast_cache:
+            cache_entry, text = ast_cache.entry(file, lazy_fn_bodies)
+            if cached := ast_cache.load(cache_entry, self.mod_sym):
+                source_file, mod_annotations = cached
+                self.add_mod_annotations(mod_annotations)
+                if lazy_fn_bodies:
+                    source_file.text = text
+                return source_file
         self.file_path = file
         self.file_dir = os.path.dirname(file)
-        self.lexer = Lexer.from_file(self.comp, file)
+        errors, warns = report.ERRORS, report.WARNS
+        if self.mod_sym.annotations:
+            annotations_len = len(self.mod_sym.annotations.annotations)
+        else:
+            annotations_len = 0
+        self.lexer = Lexer.from_file(self.comp, file, text)
         if report.ERRORS > 0:
             return ast.SourceFile(file, [], None)
+        self.lazy_fn_bodies = lazy_fn_bodies
         self.advance(2)
-        return ast.SourceFile(file, self.parse_decls(), self.mod_sym)
+        source_file = ast.SourceFile(file, self.parse_decls(), self.mod_sym)
+        if ast_cache and errors == report.ERRORS and warns == report.WARNS:
+            # files with errors or warnings are not cached, so that the
+            # reports are emitted again in the next compilation
+            mod_annotations = []
+            if self.mod_sym.annotations:
+                mod_annotations = self.mod_sym.annotations.annotations[
+                    annotations_len:]
+            ast_cache.store(cache_entry, source_file, mod_annotations)
+        if lazy_fn_bodies: # not stored in the cache
+            source_file.text = self.lexer.text
+        return source_file
+
+    def add_mod_annotations(self, mod_annotations):
+        if len(mod_annotations) == 0:
+            return
+        if self.mod_sym.annotations == None:
+            self.mod_sym.annotations = ast.Annotations()
+        for annotation in mod_annotations:
+            self.mod_sym.annotations.add(annotation)
 
     # ---- useful functions for working with tokens ----
     def next(self):
@@ -62,6 +131,13 @@ class Parser:
         for _ in range(n):
             self.next()
 
+    # Moves to the token `idx` of the token buffer.
+    def skip_to(self, idx):
+        prev_tok = self.lexer.token_at(idx - 1)
+        self.lexer.tidx = idx
+        self.advance(2)
+        self.prev_tok = prev_tok
+
     def accept(self, kind):
         if self.tok.kind == kind:
             self.next()
@@ -157,10 +233,10 @@ class Parser:
     def parse_decls(self):
         decls = []
         while self.tok.kind != Kind.EOF:
-            decls.append(self.parse_decl())
+            decls.append(self.parse_decl(True))
         return decls
 
-    def parse_decl(self):
+    def parse_decl(self, is_top_level = False):
         doc_comment = self.parse_doc_comment()
         annotations = self.parse_annotations(
             self.tok.kind == Kind.Bang and self.peek_tok.kind == Kind.Lbracket
@@ -404,7 +480,9 @@ class Parser:
                 doc_comment, annotations, is_public,
                 annotations.has("unsafe")
                 or (self.inside_extern and self.extern_abi != sym.ABI.Rivet),
-                self.extern_abi if self.inside_extern else sym.ABI.Rivet
+                self.extern_abi if self.inside_extern else sym.ABI.Rivet,
+                is_top_level and self.lazy_fn_bodies
+                and len(annotations.annotations) == 0
             )
         elif self.inside_struct and self.accept(Kind.BitNot):
             # destructor
@@ -471,7 +549,8 @@ class Parser:
         )
 
     def parse_fn_decl(
-        self, doc_comment, annotations, is_public, is_unsafe, abi
+        self, doc_comment, annotations, is_public, is_unsafe, abi,
+        is_lazy = False
     ):
         pos = self.tok.pos
         if self.tok.kind.is_overloadable_op():
@@ -537,36 +616,66 @@ class Parser:
             ret_typ = type.Result(ret_typ)
 
         stmts = []
+        lazy_body = None
         has_body = True
         if (self.inside_trait
             or self.inside_extern) and self.accept(Kind.Semicolon):
             has_body = False
         else:
-            self.expect(Kind.Lbrace)
-            while not self.accept(Kind.Rbrace):
-                stmts.append(self.parse_stmt())
+            lbrace_idx = self.lexer.tidx - 2
+            if is_lazy and not is_method and self.tok.kind == Kind.Lbrace and (
+                end := self.lexer.closing_brace(lbrace_idx + 1)
+            ) != -1:
+                lazy_body = ast.LazyBody(
+                    self.tok.pos, self.lexer.token_at(end).pos.pos
+                )
+                self.skip_to(end + 1)
+            else:
+                self.expect(Kind.Lbrace)
+                while not self.accept(Kind.Rbrace):
+                    stmts.append(self.parse_stmt())
         self.close_scope()
-        return ast.FnDecl(
+        fn_decl = ast.FnDecl(
             doc_comment, annotations, is_public, self.inside_extern, is_unsafe,
             name, pos, args, ret_typ, stmts, sc, has_body, is_method,
             self_is_mut, self_is_ref, has_named_args, self.mod_sym.is_root
             and name == "main", is_variadic, abi
         )
+        fn_decl.lazy_body = lazy_body
+        return fn_decl
+
+    # Parses the body of a function that was skipped by `parse_fn_decl`,
+    # see `ast.LazyBody`.
+    def parse_lazy_body(self, decl):
+        body = decl.lazy_body
+        decl.lazy_body = None
+        self.mod_sym = body.source_file.sym
+        self.file_path = body.source_file.file
+        self.file_dir = os.path.dirname(self.file_path)
+        self.lexer = Lexer.from_span(
+            self.comp, self.file_path, body.source_file.text, body.pos.pos,
+            body.end
+        )
+        self.scope = decl.scope
+        self.advance(2)
+        self.expect(Kind.Lbrace)
+        while not self.accept(Kind.Rbrace) and self.tok.kind != Kind.EOF:
+            decl.stmts.append(self.parse_stmt())
 
     # ---- statements --------------------------
     def decl_operator_is_used(self):
-        line_nr = self.tok.pos.line
+        pos = self.tok.pos.pos
         i = 1
         assign_was_used = False
-        while i < len(self.lexer.all_tokens):
+        while True:
             tok = self.peek_token(i)
             if tok.kind == Kind.Assign:
                 assign_was_used = True
             elif tok.kind == Kind.DeclAssign and not assign_was_used:
                 return True
-            elif tok.kind == Kind.Semicolon:
+            elif tok.kind in (Kind.Semicolon, Kind.EOF):
                 break
-            elif tok.pos.line != line_nr:
+            elif not self.lexer.is_same_line(pos, tok.pos.pos):
                 break
             i += 1
         return False
@@ -671,49 +780,31 @@ class Parser:
 
     # ---- expressions -------------------------
     def parse_expr(self):
-        return self.parse_or_expr()
-
-    def parse_or_expr(self):
-        left = self.parse_and_expr()
-        while self.accept(Kind.KwOr):
-            right = self.parse_and_expr()
-            left = ast.BinaryExpr(left, Kind.KwOr, right, left.pos)
-        return left
-
-    def parse_and_expr(self):
-        left = self.parse_equality_expr()
-        while self.accept(Kind.KwAnd):
-            right = self.parse_equality_expr()
-            left = ast.BinaryExpr(left, Kind.KwAnd, right, left.pos)
-        return left
+        return self.parse_binary_expr(OR_PREC)
 
-    def parse_equality_expr(self):
-        left = self.parse_relational_expr()
+    # Parses the binary expressions whose operators have a precedence of
+    # at least `min_prec`, with precedence climbing.
+    def parse_binary_expr(self, min_prec):
+        left = self.parse_unary_expr()
         while True:
-            if self.tok.kind in [Kind.Eq, Kind.Ne]:
-                op = self.tok.kind
-                self.next()
-                right = self.parse_relational_expr()
+            op = self.tok.kind
+            if op in (
+                Kind.Lt, Kind.Gt
+            ) and self.tok.pos.pos + 1 == self.peek_tok.pos.pos:
+                # `<<` and `>>`
+                if SHIFT_PREC < min_prec:
+                    break
+                op = Kind.Lshift if op == Kind.Lt else Kind.Rshift
+                self.advance(2)
+                right = self.parse_binary_expr(SHIFT_PREC + 1)
                 left = ast.BinaryExpr(left, op, right, left.pos)
-            else:
+                continue
+            prec = BINARY_PRECEDENCES.get(op)
+            if prec == None or prec < min_prec:
                 break
-        return left
-
-    def parse_relational_expr(self):
-        left = self.parse_shift_expr()
-        while True:
-            if self.tok.kind in [
-                Kind.Gt, Kind.Lt, Kind.Ge, Kind.Le, Kind.OrElse, Kind.KwIn,
-                Kind.KwNotIn
-            ]:
-                op = self.tok.kind
-                self.next()
-                right = self.parse_shift_expr()
-                left = ast.BinaryExpr(left, op, right, left.pos)
-            elif self.tok.kind in [Kind.KwIs, Kind.KwNotIs]:
+            if op in (Kind.KwIs, Kind.KwNotIs):
                 if self.inside_switch_header and self.peek_tok.kind == Kind.Lbrace:
                     break
-                op = self.tok.kind
                 self.next()
                 pos = self.tok.pos
                 if self.accept(Kind.Dot):
@@ -728,66 +819,21 @@ class Parser:
                 left = ast.BinaryExpr(
                     left, op, right, left.pos, var, self.scope
                 )
-            else:
-                break
-        return left
-
-    def parse_shift_expr(self):
-        left = self.parse_additive_expr()
-        while True:
-            if self.tok.kind in [Kind.Lt, Kind.Gt]:
-                op = Kind.Lshift if self.tok.kind == Kind.Lt else Kind.Rshift
-                if self.tok.pos.pos + 1 == self.peek_tok.pos.pos:
-                    self.advance(2)
-                    right = self.parse_additive_expr()
-                    left = ast.BinaryExpr(left, op, right, left.pos)
-                else:
-                    break
-            elif self.tok.kind in [Kind.Amp, Kind.Pipe, Kind.Xor]:
-                op = self.tok.kind
-                self.next()
-                right = self.parse_additive_expr()
-                left = ast.BinaryExpr(left, op, right, left.pos)
-            else:
-                break
-        return left
-
-    def parse_additive_expr(self):
-        left = self.parse_multiplicative_expr()
-        while True:
-            if self.tok.kind in [Kind.Plus, Kind.Minus]:
-                op = self.tok.kind
-                self.next()
-                right = self.parse_multiplicative_expr()
-                left = ast.BinaryExpr(left, op, right, left.pos)
-            else:
-                break
-        return left
-
-    def parse_multiplicative_expr(self):
-        left = self.parse_unary_expr()
-        while True:
-            if self.tok.kind in [Kind.Mul, Kind.Div, Kind.Mod]:
-                op = self.tok.kind
-                self.next()
-                right = self.parse_unary_expr()
-                left = ast.BinaryExpr(left, op, right, left.pos)
-            else:
-                break
+                continue
+            self.next()
+            right = self.parse_binary_expr(prec + 1)
+            left = ast.BinaryExpr(left, op, right, left.pos)
         return left
 
     def parse_unary_expr(self):
-        expr = self.empty_expr()
         if self.tok.kind in [Kind.Amp, Kind.Bang, Kind.BitNot, Kind.Minus]:
             op = self.tok.kind
             pos = self.tok.pos
             self.next()
             is_ref_mut = op == Kind.Amp and self.accept(Kind.KwMut)
             right = self.parse_unary_expr()
-            expr = ast.UnaryExpr(right, op, is_ref_mut, pos)
-        else:
-            expr = self.parse_primary_expr()
-        return expr
+            return ast.UnaryExpr(right, op, is_ref_mut, pos)
+        return self.parse_primary_expr()
 
     def parse_primary_expr(self):
         expr = self.empty_expr()
@@ -994,10 +1040,9 @@ class Parser:
                 self.expect(Kind.Rbracket)
                 expr = ast.IndexExpr(expr, index, expr.pos)
             elif (
-                self.prev_tok.pos.line != self.tok.pos.line
-                and self.tok.kind == Kind.Dot
-                and self.peek_tok.kind == Kind.Name
-                and self.peek_tok.lit[0].isupper()
+                self.tok.kind == Kind.Dot and self.peek_tok.kind == Kind.Name
+                and self.peek_tok.lit[0].isupper() and
+                not self.lexer.is_same_line(self.prev_tok.pos.pos, self.tok.pos.pos)
             ):
                 break
             elif self.accept(Kind.Dot):
@@ -161,6 +161,14 @@ class Prefs:
         self.check = False
         self.emit_rir = False
         self.keep_c = False
+        self.incremental = False
+        self.split_c = 0
+        self.use_cache = True
+        self.dce = True
+        self.jobs = 0 # 0 = default
+        self.stats_format = "" # `text` or `json`, empty = disabled
+        self.stats_file = ""
+        self.watch = False
         self.is_verbose = False
 
         if len(args) == 0:
@@ -277,6 +285,46 @@ class Prefs:
                 self.emit_rir = True
             elif arg == "--keep-c":
                 self.keep_c = True
+            elif arg == "--incremental":
+                self.incremental = True
+            elif arg == "--split-c":
+                if shards := option(current_args, arg):
+                    if not shards.isdigit() or int(shards) == 0:
+                        error(f"`{arg}` requires a positive number as argument")
+                    self.split_c = int(shards)
+                else:
+                    error(f"`{arg}` requires a number as argument")
+                i += 1
+            elif arg == "--no-dce":
+                self.dce = False
+            elif arg == "--no-cache":
+                self.use_cache = False
+            elif arg in ("-j", "--jobs"):
+                if jobs := option(current_args, arg):
+                    if not jobs.isdigit() or int(jobs) == 0:
+                        error(f"`{arg}` requires a positive number as argument")
+                    self.jobs = int(jobs)
+                else:
+                    error(f"`{arg}` requires a number as argument")
+                i += 1
+            elif arg == "--watch":
+                self.watch = True
+            elif arg == "--time-passes":
+                self.stats_format = "text"
+            elif arg == "--stats":
+                if fmt := option(current_args, arg):
+                    if fmt not in ("text", "json"):
+                        error(f"unknown stats format: `{fmt}`")
+                    self.stats_format = fmt
+                else:
+                    error(f"`{arg}` requires a format as argument")
+                i += 1
+            elif arg == "--stats-file":
+                if file := option(current_args, arg):
+                    self.stats_file = file
+                else:
+                    error(f"`{arg}` requires a filename as argument")
+                i += 1
             elif arg in ("-v", "--verbose"):
                 self.is_verbose = True
             elif arg.startswith("-"):
@@ -295,6 +343,11 @@ class Prefs:
                             self.mod_name = path.basename(path.realpath(arg))
             i += 1
 
+        if self.incremental and self.split_c > 0:
+            error("`--split-c` cannot be used with `--incremental`")
+        if len(self.stats_file) > 0 and len(self.stats_format) == 0:
+            self.stats_format = "json"
+
         self.build_rivet_dir()
 
         if self.build_mode == BuildMode.Test:
@@ -0,0 +1,534 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+from enum import Enum
+import io, pickle, hashlib, contextlib
+
+from . import ast, sym, token, parser, report, utils, cache
+
+# `Rechecker` checks again only the declarations of the root module that
+# have changed since the last build, and the declarations that depend on
+# them, instead of the whole module. It is kept between the builds by the
+# watch mode (see `watch.py`).
+#
+# The units are the functions, the methods, the constants, the global
+# variables and the tests. Each unit has two fingerprints, computed from
+# its fresh AST: its interface (e.g. the signature of a function) and its
+# body. The other declarations (imports, types, traits, aliases, fields,
+# the signatures of the methods, etc.) form the list of fingerprints of
+# each file (`others`). They are not tracked per symbol: if one of them
+# changes (e.g. a field is added to a struct, or the signature of a method
+# changes), the whole root module is checked again, as when a file is added
+# or removed, or the module annotations change. The resolver records the
+# symbols used by each unit (`deps`), so when the interface of a unit
+# changes, the units that use it are checked again; the constants and the
+# variables without type propagate the change, because their interface
+# depends on their value.
+#
+# The state of the compiler is saved after checking the root module (before
+# the code generation). In the next build it's restored, and the fresh
+# declarations of the units replace the old ones, reusing their symbols, so
+# the references of the other declarations remain valid.
+CONTAINERS = (ast.StructDecl, ast.EnumDecl, ast.ExtendDecl)
+SKIPPED_SLOTS = ("deps", "lazy_body")
+
+_SLOTS = {}
+
+def slots_of(cls):
+    slots = _SLOTS.get(cls)
+    if slots == None:
+        slots = []
+        for c in reversed(cls.__mro__):
+            for name in c.__dict__.get("__slots__", ()):
+                if name not in SKIPPED_SLOTS:
+                    slots.append(name)
+        _SLOTS[cls] = slots
+    return slots
+
+# Returns a hashable value with the structure of a fresh AST node, without
+# positions and scopes.
+def fingerprint(node):
+    if node == None or isinstance(node, (bool, int, float, str, Enum)):
+        return node
+    elif isinstance(node, (list, tuple)):
+        return tuple(fingerprint(n) for n in node)
+    elif isinstance(node, (token.Pos, sym.Scope)):
+        return None
+    elif isinstance(node, sym.Sym):
+        return node.qualname()
+    return fingerprint_without(node, ())
+
+def fingerprint_without(node, skipped):
+    return (node.__class__.__name__, ) + tuple(
+        fingerprint(getattr(node, name, None))
+        for name in slots_of(node.__class__) if name not in skipped
+    )
+
+# Copies the positions of the fresh AST `fresh` to the nodes of `old`, which
+# has the same structure (the nodes added while checking are skipped). The
+# positions are updated in place, because they are shared with the symbols.
+def patch_positions(old, fresh):
+    if isinstance(fresh, token.Pos):
+        if isinstance(old, token.Pos):
+            old.file_id = fresh.file_id
+            old.pos = fresh.pos
+    elif isinstance(fresh, (list, tuple)):
+        if isinstance(old, (list, tuple)) and len(old) == len(fresh):
+            for old_node, fresh_node in zip(old, fresh):
+                patch_positions(old_node, fresh_node)
+    elif fresh == None or isinstance(
+        fresh, (bool, int, float, str, Enum, sym.Sym, sym.Scope)
+    ):
+        pass
+    elif old.__class__ is fresh.__class__:
+        for name in slots_of(fresh.__class__):
+            patch_positions(getattr(old, name, None), getattr(fresh, name, None))
+
+def is_unit(decl, is_member):
+    if isinstance(decl, ast.FnDecl):
+        return not decl.is_extern
+    elif is_member:
+        return False
+    elif isinstance(decl, ast.VarDecl):
+        return not decl.is_extern
+    return isinstance(decl, (ast.ConstDecl, ast.TestDecl))
+
+# Yields the key and the declaration of each element of `decls` (the
+# members of the `container`-th container of the file, or the declarations
+# of the file if it's `-1`), the key is `None` if it's not a unit.
+def units_of(decls, container = -1):
+    tests = {}
+    for decl in decls:
+        if not is_unit(decl, container != -1):
+            yield None, decl
+        elif isinstance(decl, ast.TestDecl):
+            n = tests.get(decl.name, 0)
+            tests[decl.name] = n + 1
+            yield (container, f"test {decl.name} {n}"), decl
+        elif isinstance(decl, ast.VarDecl):
+            yield (container, ",".join(v.name for v in decl.lefts)), decl
+        else:
+            yield (container, decl.name), decl
+
+def names_of(decl):
+    if isinstance(decl, ast.VarDecl):
+        return [v.name for v in decl.lefts]
+    elif isinstance(decl, ast.TestDecl):
+        return []
+    return [decl.name]
+
+def file_hash(file):
+    try:
+        with open(file, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+class Unit:
+    __slots__ = ("iface", "body", "propagates", "names", "deps")
+
+    def __init__(self, decl):
+        self.propagates = False
+        if isinstance(decl, ast.FnDecl):
+            self.iface = hash(fingerprint_without(decl, ("stmts", )))
+            self.body = hash(fingerprint(decl.stmts))
+        elif isinstance(decl, ast.TestDecl):
+            self.iface = decl.name
+            self.body = hash(fingerprint(decl))
+        elif isinstance(decl, ast.VarDecl) and all(
+            v.has_typ for v in decl.lefts
+        ):
+            self.iface = hash(fingerprint_without(decl, ("right", )))
+            self.body = hash(fingerprint(decl.right))
+        else:
+            self.iface = hash(fingerprint(decl))
+            self.body = None
+            self.propagates = True
+        self.names = [] # the qualified names of its symbols
+        self.deps = set()
+
+# The fingerprints of a fresh file, and the dependencies recorded while it
+# was checked.
+class FileInfo:
+    __slots__ = ("hash", "others", "units", "deps")
+
+    def __init__(self, sf, file_hash):
+        self.hash = file_hash
+        self.others = []
+        self.units = {}
+        for key, decl in units_of(sf.decls):
+            if key != None:
+                self.add_unit(key, decl)
+            elif isinstance(decl, CONTAINERS):
+                container = len(self.others)
+                members = []
+                for member_key, member in units_of(decl.decls, container):
+                    if member_key != None:
+                        self.add_unit(member_key, member)
+                        member = fingerprint_without(member, ("stmts", ))
+                    else:
+                        member = fingerprint(member)
+                    members.append(member)
+                self.others.append(
+                    hash((fingerprint_without(decl, ("decls", )), tuple(members)))
+                )
+            else:
+                self.others.append(hash(fingerprint(decl)))
+        self.deps = set() # of the other declarations
+
+    def add_unit(self, key, decl):
+        if key in self.units:
+            # a duplicate symbol, reported by the register
+            self.others.append(("duplicate", key))
+        self.units[key] = Unit(decl)
+
+    def collect_deps(self, sf):
+        units = {}
+        container = 0
+        for key, decl in units_of(sf.decls):
+            if key != None:
+                units[id(decl)] = self.units[key]
+                continue
+            if isinstance(decl, CONTAINERS):
+                for member_key, member in units_of(decl.decls, container):
+                    if member_key != None:
+                        units[id(member)] = self.units[member_key]
+            container += 1
+        self.deps = set(sf.deps or ())
+        for decl in sf.decls:
+            self.collect_decl_deps(decl, units)
+
+    def collect_decl_deps(self, decl, units):
+        if unit := units.get(id(decl)):
+            unit.names = [s.qualname() for s in decl_syms(decl) if s != None]
+            unit.deps = decl.deps or set()
+            return
+        if deps := getattr(decl, "deps", None):
+            self.deps.update(deps)
+        decls = list(getattr(decl, "decls", ()))
+        if isinstance(decl, ast.EnumDecl):
+            for variant in decl.variants:
+                decls += variant.decls
+        for member in decls:
+            self.collect_decl_deps(member, units)
+
+def decl_syms(decl):
+    if isinstance(decl, ast.VarDecl):
+        return [v.sym for v in decl.lefts]
+    elif isinstance(decl, ast.TestDecl):
+        return []
+    return [decl.sym]
+
+def uses(deps, ifaces, added):
+    if not deps.isdisjoint(ifaces):
+        return True
+    # a new symbol can hide another one with the same name (e.g. a symbol
+    # of the universe)
+    return len(added) > 0 and any(
+        dep.rpartition(".")[2] in added for dep in deps
+    )
+
+class Rechecker:
+    def __init__(self):
+        self.data = None # the pickled state of the compiler
+        self.files = {} # `FileInfo`s of the root module files
+        self.scanned = {} # `FileInfo`s of the current build
+
+    # Computes the fingerprints of the fresh files of the root module,
+    # before the modules are imported.
+    def scan(self, comp):
+        self.scanned = {}
+        for i in range(len(comp.parsed_files)):
+            with comp.stats.timed("parsing"):
+                sf = comp.wait_parsed_file(i)
+            if sf.sym.is_root:
+                with comp.stats.timed("rechecker"):
+                    with utils.recursion_limit(cache.RECURSION_LIMIT):
+                        self.scanned[sf.file] = FileInfo(
+                            sf, file_hash(sf.file)
+                        )
+
+    # Saves the state of the compiler after checking the root module; if it
+    # has warnings, the next build checks the whole module again, so that
+    # they are reported again.
+    def save(self, comp, warns):
+        self.data = None
+        if report.WARNS > warns:
+            return
+        with comp.stats.timed("rechecker"):
+            for sf in comp.source_files:
+                if sf.sym.is_root:
+                    if sf.file not in self.scanned:
+                        return
+                    self.scanned[sf.file].collect_deps(sf)
+            comp.vlog("rechecker: saving root module state...")
+            state = {name: getattr(comp, name) for name in cache.CoreSnapshot.ATTRS}
+            state["symbol_count"] = sym.SYMBOL_COUNT
+            with utils.recursion_limit(cache.RECURSION_LIMIT):
+                self.data = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+            self.files = self.scanned
+            self.scanned = {}
+
+    def restore(self, comp):
+        with utils.recursion_limit(cache.RECURSION_LIMIT):
+            state = pickle.loads(self.data)
+        for name in cache.CoreSnapshot.ATTRS:
+            setattr(comp, name, state[name])
+        sym.SYMBOL_COUNT = state["symbol_count"]
+        comp.init_stages()
+
+    # Checks the changed declarations of the root module, and the ones that
+    # depend on them, returns `False` if the whole root module must be
+    # checked.
+    def recheck(self, comp):
+        if self.data == None:
+            return False
+        files = comp.root_files()
+        if sorted(files) != sorted(self.files):
+            comp.vlog("rechecker: the root module files have changed")
+            return False
+        hashes = {file: file_hash(file) for file in files}
+        changed = [file for file in files if hashes[file] != self.files[file].hash]
+        errors, warns = report.ERRORS, report.WARNS
+        with comp.stats.timed("rechecker"):
+            self.restore(comp)
+        root_sym = comp.universe.find(comp.prefs.mod_name)
+        root_files = {
+            sf.file: sf for sf in comp.source_files if sf.sym.is_root
+        }
+
+        # the reports of the parser are emitted only if the module is not
+        # checked again from scratch
+        output = io.StringIO()
+        with contextlib.redirect_stderr(output):
+            fresh = {}
+            for file in changed:
+                if sf := self.parse(comp, root_sym, file):
+                    fresh[file] = sf
+        if report.ERRORS > errors:
+            utils.eprint(output.getvalue(), end = "")
+            comp.abort()
+        elif len(fresh) < len(changed):
+            return self.fallback(comp, errors, warns, "module annotations")
+        scanned = dict(self.files)
+        with comp.stats.timed("rechecker"):
+            with utils.recursion_limit(cache.RECURSION_LIMIT):
+                for file, sf in fresh.items():
+                    scanned[file] = FileInfo(sf, hashes[file])
+            rechecked = self.find_rechecked(changed, scanned)
+        if rechecked == None:
+            return self.fallback(
+                comp, errors, warns, "a type or a signature has changed"
+            )
+        utils.eprint(output.getvalue(), end = "")
+        comp.vlog(
+            f"rechecker: checking {len(rechecked)} declarations of the root module..."
+        )
+
+        todo = []
+        for file in files:
+            if file not in fresh and any(f == file for f, _ in rechecked):
+                if sf := self.parse(comp, root_sym, file):
+                    fresh[file] = sf
+                else:
+                    return self.fallback(
+                        comp, errors, warns, "module annotations"
+                    )
+            if file in fresh:
+                old_sf = root_files[file]
+                with utils.recursion_limit(cache.RECURSION_LIMIT):
+                    old_sf.decls = self.splice(
+                        old_sf, old_sf.decls, fresh[file].decls, -1,
+                        rechecked, file in changed, todo
+                    )
+        if report.ERRORS > errors:
+            comp.abort()
+        self.check_units(comp, root_sym, todo)
+        comp.stats.count("rechecked_decls", len(todo))
+        self.scanned = scanned
+        self.save(comp, warns)
+        return True
+
+    def fallback(self, comp, errors, warns, reason):
+        comp.vlog(f"rechecker: {reason}, checking the whole root module...")
+        report.ERRORS, report.WARNS = errors, warns
+        return False
+
+    def parse(self, comp, root_sym, file):
+        p = parser.Parser(comp)
+        p.mod_sym = root_sym
+        annotations = root_sym.annotations
+        annotations_len = len(annotations.annotations) if annotations else 0
+        with comp.stats.timed("parsing"):
+            sf = p.parse_file(file)
+        annotations = root_sym.annotations
+        if annotations and len(annotations.annotations) > annotations_len:
+            return None
+        return sf
+
+    # Returns the keys (`(file, key)`) of the units that must be checked
+    # again, or `None` if the whole root module must be checked.
+    def find_rechecked(self, changed, scanned):
+        rechecked = set()
+        ifaces = set() # the qualified names of the changed interfaces
+        added = set() # the names of the new units
+        for file in changed:
+            old, new = self.files[file], scanned[file]
+            if old.others != new.others:
+                return None
+            for key, unit in old.units.items():
+                new_unit = new.units.get(key)
+                if new_unit == None:
+                    ifaces.update(unit.names)
+                elif new_unit.iface != unit.iface:
+                    ifaces.update(unit.names)
+                    rechecked.add((file, key))
+                elif new_unit.body != unit.body:
+                    rechecked.add((file, key))
+            for key in new.units:
+                if key not in old.units:
+                    added.update(key[1].split(","))
+                    rechecked.add((file, key))
+        propagated = True
+        while propagated:
+            propagated = False
+            for file, info in self.files.items():
+                if uses(info.deps, ifaces, added):
+                    return None
+                for key, unit in info.units.items():
+                    if (file, key) in rechecked or key not in scanned[
+                        file].units or not uses(unit.deps, ifaces, added):
+                        continue
+                    rechecked.add((file, key))
+                    if unit.propagates:
+                        ifaces.update(unit.names)
+                        propagated = True
+        return rechecked
+
+    # Returns the declarations of the fresh file, the old ones (already
+    # checked) are kept, except those that must be checked again, which are
+    # added to `todo`.
+    def splice(
+        self, sf, old_decls, fresh_decls, container, rechecked, patch, todo,
+        parent = None
+    ):
+        old_units = {}
+        old_others = []
+        for key, decl in units_of(old_decls, container):
+            if key == None:
+                old_others.append(decl)
+            else:
+                old_units[key] = decl
+        decls = []
+        others = 0
+        for key, fresh in units_of(fresh_decls, container):
+            if key == None:
+                old = old_others[others]
+                if patch:
+                    patch_positions(old, fresh)
+                if container == -1 and isinstance(old, CONTAINERS):
+                    old.decls = self.splice(
+                        sf, old.decls, fresh.decls, others, rechecked, patch,
+                        todo, old
+                    )
+                others += 1
+                decls.append(old)
+            elif (sf.file, key) in rechecked:
+                todo.append((sf, old_units.get(key), fresh, parent))
+                decls.append(fresh)
+            else:
+                old = old_units[key]
+                if patch:
+                    patch_positions(old, fresh)
+                decls.append(old)
+            old_units.pop(key, None)
+        for old in old_units.values(): # removed
+            todo.append((sf, old, None, parent))
+        return decls
+
+    def check_units(self, comp, root_sym, todo):
+        with comp.stats.timed("register"):
+            for sf, old, fresh, parent in todo:
+                self.register_unit(comp, root_sym, sf, old, fresh, parent)
+        if report.ERRORS > 0:
+            comp.abort()
+        with comp.stats.timed("resolver"):
+            r = comp.resolver
+            r.load_preludes()
+            r.reached_fns = []
+            r.record_deps = True
+            for sf, _, fresh, parent in todo:
+                if fresh == None:
+                    continue
+                r.sym = root_sym
+                r.source_file = sf
+                r.self_sym = None if parent == None else parent_sym(parent)
+                r.deps = None
+                r.resolve_decls([fresh])
+            r.record_deps = False
+            r.deps = None
+            r.resolve_lazy_fns()
+        if report.ERRORS > 0:
+            comp.abort()
+        with comp.stats.timed("checker"):
+            c = comp.checker
+            # like `Checker.check_files`, the constants and the global
+            # variables are checked first
+            for is_global in (True, False):
+                for sf, _, fresh, _ in todo:
+                    if fresh == None or isinstance(
+                        fresh, (ast.ConstDecl, ast.VarDecl)
+                    ) != is_global:
+                        continue
+                    c.sym = root_sym
+                    c.source_file = sf
+                    c.expected_type = comp.void_t
+                    c.check_decl(fresh)
+            c.check_reached_fns(r.reached_fns)
+        if report.ERRORS > 0:
+            comp.abort()
+
+    # Registers the fresh declaration of a unit, reusing the symbols of the
+    # old declaration, so that the other declarations that use them see the
+    # new ones.
+    def register_unit(self, comp, root_sym, sf, old, fresh, parent):
+        target = root_sym if parent == None else parent_sym(parent)
+        old_syms = []
+        if old != None:
+            for name in names_of(old):
+                if s := target.find(name):
+                    old_syms.append((target.remove(name), s))
+        if fresh == None:
+            return
+        r = comp.register
+        r.sym = target
+        r.source_file = sf
+        r.abi = sym.ABI.Rivet
+        r.walk_decls([fresh])
+        for idx, old_sym in reversed(old_syms):
+            new_sym = target.find(old_sym.name)
+            if new_sym == None:
+                continue
+            target.remove(old_sym.name)
+            if new_sym.__class__ is old_sym.__class__:
+                reuse_sym(old_sym, new_sym)
+                new_sym = old_sym
+            target.insert(idx, new_sym)
+        if isinstance(fresh, ast.VarDecl):
+            for v in fresh.lefts:
+                v.sym = target.find(v.name)
+        elif not isinstance(fresh, ast.TestDecl):
+            fresh.sym = target.find(fresh.name)
+
+def parent_sym(container):
+    if isinstance(container, ast.ExtendDecl):
+        return container.typ.symbol()
+    return container.sym
+
+REUSED_SYM_SLOTS = ("id", "parent", "qualified_name", "is_changed")
+
+def reuse_sym(old, new):
+    for name in slots_of(new.__class__):
+        if name not in REUSED_SYM_SLOTS and hasattr(new, name):
+            setattr(old, name, getattr(new, name))
@@ -222,6 +222,9 @@ class Register:
                         )
                     )
                     decl.sym.is_main = decl.is_main
+                    if decl.lazy_body != None:
+                        decl.lazy_body.source_file = self.source_file
+                        decl.sym.lazy_decl = decl
                 except utils.CompilerError as e:
                     report.error(e.args[0], decl.name_pos)
             elif isinstance(decl, ast.DestructorDecl):
@@ -5,17 +5,12 @@
 import os
 import textwrap
 
-from . import utils
+from . import utils, token
 
 WARNS_ARE_ERRORS = False
 ERRORS = 0
 WARNS = 0
 
-# This dictionary saves the lines of the files that have
-# had reports to avoid having to open them over and over
-# again.
-FILE_LINES = {}
-
 SEP = utils.bold(utils.blue("|"))
 MARK = utils.bold(utils.blue("^"))
 FOOT = utils.bold(utils.blue("="))
@@ -29,21 +24,12 @@ def format_number(num):
 def color(kind, msg):
     return utils.red(msg) if kind == "error:" else utils.yellow(msg)
 
-def _readline(file, line_nr):
-    global FILE_LINES
-    if file in FILE_LINES:
-        lines = FILE_LINES[file]
-        line_nr = min(line_nr, len(lines) - 1)
-        return lines[line_nr]
-    lines = open(file, encoding = 'UTF-8').read().splitlines()
-    FILE_LINES[file] = lines
-    line_nr = min(line_nr, len(lines) - 1)
-    return lines[line_nr]
-
 def readline(pos, kind):
-    line = _readline(pos.file, pos.line)
-    line_str = f"{utils.bold(utils.blue(format_number(pos.line + 1)))}"
-    marker = (" " * (pos.col - 1)) + MARK
+    index = token.line_index(pos.file_id)
+    line_nr = index.line(pos.pos)
+    line = index.line_text(line_nr)
+    line_str = f"{utils.bold(utils.blue(format_number(line_nr + 1)))}"
+    marker = (" " * (index.col(pos.pos) - 1)) + MARK
     return f"{line_str} {SEP} {line}\n      {SEP} {marker}"
 
 def fmt_msg(pos, kind, msg):
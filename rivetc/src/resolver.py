@@ -3,7 +3,8 @@
 # be found in the LICENSE file.
 
 from .token import Kind
-from . import ast, sym, type, report, utils
+from . import ast, sym, type, parser, report, utils
+from .codegen import RUNTIME_FNS
 
 class Resolver:
     def __init__(self, comp):
@@ -13,12 +14,30 @@ class Resolver:
         self.sym = None
         self.self_sym = None
 
+        # the symbols used by each declaration of the root module, for the
+        # re-checks of the watch mode (see `rechecker.py`)
+        self.record_deps = False
+        self.deps = None
+
+        # the functions whose body was skipped by the parser, and that are
+        # used by the resolved declarations (see `resolve_lazy_fns`)
+        self.lazy_fns = []
+        self.reached_fns = []
+
     def resolve_files(self, source_files):
         self.load_preludes()
+        self.reached_fns = []
         for sf in source_files:
             self.sym = sf.sym
             self.source_file = sf
+            self.record_deps = self.comp.rechecker != None and sf.sym.is_root
+            if self.record_deps:
+                sf.deps = set()
+            self.deps = sf.deps
             self.resolve_decls(self.source_file.decls)
+        self.record_deps = False
+        self.deps = None
+        self.resolve_lazy_fns()
 
     def load_preludes(self):
         self.preludes["Error"] = self.comp.error_sym
@@ -27,6 +46,12 @@ class Resolver:
         for decl in decls:
             old_sym = self.sym
             old_self_sym = self.self_sym
+            old_deps = self.deps
+            if self.record_deps and isinstance(
+                decl, (ast.ConstDecl, ast.VarDecl, ast.FnDecl, ast.TestDecl)
+            ):
+                decl.deps = set()
+                self.deps = decl.deps
             if isinstance(decl, ast.ExternDecl):
                 self.resolve_decls(decl.decls)
             elif isinstance(decl, ast.ConstDecl):
@@ -67,7 +92,7 @@ class Resolver:
                         if self.resolve_type(base):
                             base_sym = base.symbol()
                             if base_sym.kind == sym.TypeKind.Trait:
-                                base_sym.info.implements.append(decl.sym)
+                                base_sym.info.add_implementor(decl.sym)
                     for v in decl.variants:
                         if len(v.decls) > 0:
                             self.self_sym = v.typ.symbol()
@@ -110,7 +135,7 @@ class Resolver:
                         if self.resolve_type(base):
                             base_sym = base.symbol()
                             if base_sym.kind == sym.TypeKind.Trait:
-                                base_sym.info.implements.append(self.self_sym)
+                                base_sym.info.add_implementor(self.self_sym)
                             elif self.self_sym.kind == sym.TypeKind.Class and self.self_sym.kind == base_sym.kind:
                                 self.self_sym.info.base = base_sym
                             elif self.self_sym.kind == sym.TypeKind.Struct and self.self_sym.kind == base_sym.kind:
@@ -146,8 +171,12 @@ class Resolver:
                     if arg.has_def_expr:
                         self.resolve_expr(arg.def_expr)
                 self.resolve_type(decl.ret_typ)
-                for stmt in decl.stmts:
-                    self.resolve_stmt(stmt)
+                if decl.lazy_body != None:
+                    if decl.name in RUNTIME_FNS and self.sym.is_core_mod():
+                        self.use_sym(decl.sym)
+                else:
+                    for stmt in decl.stmts:
+                        self.resolve_stmt(stmt)
             elif isinstance(decl, ast.DestructorDecl):
                 self_typ = type.Type(self.self_sym)
                 decl.scope.add(
@@ -164,6 +193,32 @@ class Resolver:
                     self.resolve_stmt(stmt)
             self.sym = old_sym
             self.self_sym = old_self_sym
+            self.deps = old_deps
+
+    # Records a symbol used by the declaration being resolved.
+    def use_sym(self, s):
+        if self.deps != None and isinstance(s, sym.Sym):
+            self.deps.add(s.qualname())
+        if isinstance(s, sym.Fn) and s.lazy_decl != None:
+            self.lazy_fns.append(s.lazy_decl)
+            s.lazy_decl = None
+
+    # Parses and resolves the bodies of the functions skipped by the parser
+    # that are used, once the signatures of all the functions are resolved.
+    # `reached_fns` has their declarations, they are checked and generated
+    # like the others.
+    def resolve_lazy_fns(self):
+        while len(self.lazy_fns) > 0:
+            decl = self.lazy_fns.pop()
+            sf = decl.lazy_body.source_file
+            with self.comp.stats.timed("parsing"):
+                parser.Parser(self.comp).parse_lazy_body(decl)
+            self.sym = sf.sym
+            self.source_file = sf
+            self.self_sym = None
+            for stmt in decl.stmts:
+                self.resolve_stmt(stmt)
+            self.reached_fns.append((sf, decl))
 
     def resolve_stmt(self, stmt):
         if isinstance(stmt, ast.VarDeclStmt):
@@ -428,6 +483,8 @@ class Resolver:
             ident.not_found = True
         elif isinstance(ident.sym, sym.SymRef):
             ident.sym = self.clean_sym_ref(ident.sym)
+        if ident.sym != None:
+            self.use_sym(ident.sym)
 
     def clean_sym_ref(self, sym_ref):
         if not sym_ref.ref_resolved:
@@ -471,6 +528,7 @@ class Resolver:
                     expr.left_sym, expr.field_name, expr.field_pos
                 ):
                     expr.field_sym = field_sym
+                    self.use_sym(field_sym)
                 else:
                     expr.not_found = True
 
@@ -619,6 +677,7 @@ class Resolver:
                         return ast.IntegerLiteral(str(il >> ir), expr.pos)
         elif isinstance(expr, ast.Ident):
             if s := self.source_file.sym.find(expr.name):
+                self.use_sym(s)
                 if isinstance(s, sym.Const):
                     if s.has_evaled_expr:
                         return s.evaled_expr
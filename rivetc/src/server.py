@@ -0,0 +1,133 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+from os import path
+import os, sys, json, socket, traceback
+
+from . import Compiler, sym, token, cache, prefs, report, utils
+
+SOCKET_PATH = path.join(prefs.RIVET_DIR, "server.sock")
+MAX_REQUEST_SIZE = 1024 * 1024
+
+# Returns the working directory and the arguments of a request, the request
+# can be truncated (see `MAX_REQUEST_SIZE`) or come from another program.
+def parse_request(msg):
+    req = json.loads(msg)
+    cwd, args = req["cwd"], req["args"]
+    if not isinstance(cwd, str):
+        raise TypeError("`cwd` must be a string")
+    if not isinstance(args, list) or not all(
+        isinstance(arg, str) for arg in args
+    ):
+        raise TypeError("`args` must be a list of strings")
+    return cwd, args
+
+# `Server` keeps the `core` module (and the modules it imports) loaded and
+# checked in memory, and compiles the modules requested by the clients (see
+# `rivetc/client.py`) through a Unix domain socket. Each client sends its
+# working directory, its arguments and its standard streams, so the
+# compiler (and the test runners) write directly to the client terminal.
+class Server:
+    def __init__(self, socket_path = SOCKET_PATH):
+        self.socket_path = socket_path
+        self.snapshots = {}
+        self.comp = None # the compiler of the last build
+
+    def serve(self):
+        if path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(self.socket_path)
+            sock.listen()
+            utils.eprint(f"rivetc: listening on `{self.socket_path}`...")
+            try:
+                while True:
+                    conn, _ = sock.accept()
+                    with conn:
+                        try:
+                            self.handle(conn)
+                        except OSError as e: # e.g. the client went away
+                            utils.eprint(f"rivetc: server: {e}")
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.remove(self.socket_path)
+
+    def handle(self, conn):
+        msg, fds, _, _ = socket.recv_fds(conn, MAX_REQUEST_SIZE, 3)
+        if len(fds) != 3:
+            for fd in fds:
+                os.close(fd)
+            return
+        try:
+            cwd, args = parse_request(msg)
+        except (ValueError, KeyError, TypeError) as e:
+            for fd in fds:
+                os.close(fd)
+            utils.eprint(f"rivetc: server: invalid request: {e}")
+            conn.sendall(
+                json.dumps({"exit_code": 1, "error": "invalid request"}).encode()
+            )
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_fds = [os.dup(fd) for fd in range(3)]
+        old_wd = os.getcwd()
+        try:
+            for fd, client_fd in enumerate(fds):
+                os.dup2(client_fd, fd)
+            os.chdir(cwd)
+            exit_code = self.build(args)
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except OSError:
+                    pass
+            for fd, saved_fd in enumerate(saved_fds):
+                os.dup2(saved_fd, fd)
+                os.close(saved_fd)
+            for fd in fds:
+                os.close(fd)
+            os.chdir(old_wd)
+        conn.sendall(json.dumps({"exit_code": exit_code}).encode())
+
+    def build(self, args):
+        report.WARNS_ARE_ERRORS = False
+        report.ERRORS = 0
+        report.WARNS = 0
+        token.LINE_INDEXES.clear()
+        try:
+            # the universe is recognized by its id (`0`)
+            sym.SYMBOL_COUNT = 0
+            comp = Compiler(args)
+            self.comp = comp
+            if not comp.prefs.check_syntax:
+                comp.core_snapshot = self.core_snapshot(args, comp)
+                report.ERRORS = 0
+                report.WARNS = 0
+            comp.run()
+        except SystemExit as e:
+            if e.code == None:
+                return 0
+            elif isinstance(e.code, int):
+                return e.code
+            utils.eprint(e.code)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+
+    def core_snapshot(self, args, comp):
+        key = cache.CoreSnapshot.key_of(comp)
+        snapshot = self.snapshots.get(key)
+        if snapshot == None or not snapshot.is_valid_for(comp):
+            sym.SYMBOL_COUNT = 0
+            core_comp = Compiler(args)
+            core_comp.vlog("server: loading `core` module...")
+            core_comp.load_core()
+            snapshot = cache.CoreSnapshot(core_comp)
+            self.snapshots[key] = snapshot
+        return snapshot
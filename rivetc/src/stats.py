@@ -0,0 +1,193 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+import os, sys, json, time, contextlib
+from enum import Enum
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from . import ast, utils
+
+PASSES = [
+    "lexing", "parsing", "imports", "core snapshot", "rechecker",
+    "register", "resolver", "checker", "rir", "cgen", "backend", "tests"
+]
+
+COUNTERS = [
+    "files", "tokens", "ast_nodes", "symbols", "compat_checks",
+    "compat_cache_hits", "rechecked_decls", "rir_instrs", "c_bytes"
+]
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Returns the peak resident set size in KiB of this process, or of its
+# children (the C compiler), or `None` if it cannot be obtained.
+def peak_rss(children = False):
+    if resource == None:
+        return None
+    usage = resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    )
+    if sys.platform == "darwin": # in bytes
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+# Returns the current resident set size in KiB of this process, or `None` if
+# it cannot be obtained (only Linux provides it without a dependency).
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * PAGE_SIZE // 1024
+
+def cpu_time():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+class Pass:
+    def __init__(self, name):
+        self.name = name
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.mem_growth = None
+        self.runs = 0
+        self.started_at = (0.0, 0.0, None)
+
+    def resume(self, now):
+        self.started_at = now
+
+    def pause(self, now):
+        self.wall_time += now[0] - self.started_at[0]
+        self.cpu_time += now[1] - self.started_at[1]
+        if now[2] != None and self.started_at[2] != None:
+            growth = now[2] - self.started_at[2]
+            self.mem_growth = (self.mem_growth or 0) + growth
+
+# `Stats` records the time spent in each pass of the compiler and some
+# counters, see `--time-passes` and `--stats`. The time of a pass does not
+# include the time of the passes nested in it (e.g. the lexing of a file
+# while it is parsed). The memory of a pass is the growth of the RSS while
+# it runs (the peak RSS only grows, so it cannot be split by pass), and the
+# peak RSS is reported for the whole process and for its children (the C
+# compiler and the tests).
+class Stats:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.passes = {name: Pass(name) for name in PASSES}
+        self.counters = {name: 0 for name in COUNTERS}
+        self.stack = []
+        self.started_at = time.perf_counter()
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        if not self.enabled:
+            yield
+            return
+        now = (time.perf_counter(), cpu_time(), current_rss())
+        if len(self.stack) > 0:
+            self.stack[-1].pause(now)
+        p = self.passes[name]
+        p.runs += 1
+        p.resume(now)
+        self.stack.append(p)
+        try:
+            yield
+        finally:
+            now = (time.perf_counter(), cpu_time(), current_rss())
+            self.stack.pop().pause(now)
+            if len(self.stack) > 0:
+                self.stack[-1].resume(now)
+
+    def count(self, name, n = 1):
+        if self.enabled:
+            self.counters[name] += n
+
+    # Returns the percentage of the type compatibility checks answered by the
+    # cache of the checker.
+    def compat_hit_rate(self):
+        checks = self.counters["compat_checks"]
+        if checks == 0:
+            return 0.0
+        return self.counters["compat_cache_hits"] * 100 / checks
+
+    def to_json(self):
+        return json.dumps({
+            "version": utils.VERSION,
+            "total_time": time.perf_counter() - self.started_at,
+            "peak_mem": peak_rss(),
+            "children_peak_mem": peak_rss(True),
+            "passes": {
+                p.name: {
+                    "wall_time": p.wall_time,
+                    "cpu_time": p.cpu_time,
+                    "mem_growth": p.mem_growth,
+                    "runs": p.runs
+                } for p in self.passes.values() if p.runs > 0
+            },
+            "counters": self.counters,
+            "compat_hit_rate": self.compat_hit_rate()
+        }, indent = 2)
+
+    def to_text(self):
+        sb = utils.Builder()
+        sb.writeln(
+            f"{'pass':<16}{'wall (ms)':>12}{'cpu (ms)':>12}{'rss growth (KiB)':>18}"
+        )
+        wall_total, cpu_total = 0.0, 0.0
+        for p in self.passes.values():
+            if p.runs == 0:
+                continue
+            wall_total += p.wall_time
+            cpu_total += p.cpu_time
+            mem = "-" if p.mem_growth == None else f"{p.mem_growth:+}"
+            sb.writeln(
+                f"{p.name:<16}{p.wall_time * 1000:>12.2f}{p.cpu_time * 1000:>12.2f}{mem:>18}"
+            )
+        sb.writeln(
+            f"{'total':<16}{wall_total * 1000:>12.2f}{cpu_total * 1000:>12.2f}"
+        )
+        sb.writeln()
+        for name, mem in (
+            ("peak mem (KiB)", peak_rss()),
+            ("children (KiB)", peak_rss(True))
+        ):
+            sb.writeln(f"{name:<16}{'-' if mem == None else mem:>12}")
+        sb.writeln()
+        for name, value in self.counters.items():
+            sb.writeln(f"{name:<16}{value:>12}")
+        sb.writeln(f"{'compat_hit_rate':<16}{self.compat_hit_rate():>11.2f}%")
+        return str(sb)
+
+    def report(self, fmt, file):
+        out = self.to_json() if fmt == "json" else self.to_text()
+        if len(file) > 0:
+            with open(file, "w") as f:
+                f.write(out)
+                f.write("\n")
+        else:
+            utils.eprint(out.rstrip())
+
+# Returns the number of nodes of the ASTs.
+def count_ast_nodes(source_files):
+    count = 0
+    visited = set()
+    stack = list(source_files)
+    while len(stack) > 0:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack += node
+            continue
+        if type(node).__module__ != ast.__name__ or isinstance(node, Enum):
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        count += 1
+        stack += [getattr(node, name, None) for name in node.__slots__]
+    return count
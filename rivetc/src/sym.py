@@ -8,6 +8,9 @@ from .token import NO_POS
 from .utils import CompilerError
 
 SYMBOL_COUNT = 0
+# incremented each time a trait gets a new implementor, the results cached
+# by the checker that depend on it are discarded
+IMPLEMENTS_VERSION = 0
 
 def new_symbol_id():
     global SYMBOL_COUNT
@@ -21,6 +24,11 @@ class ObjLevel(Enum):
     Local = auto_enum()
 
 class Obj:
+    __slots__ = (
+        "name", "ir_name", "is_mut", "is_used", "is_changed", "is_hidden_ref",
+        "level", "pos", "typ"
+    )
+
     def __init__(self, is_mut, name, typ, level, pos):
         self.name = name
         self.ir_name = name
@@ -33,10 +41,18 @@ class Obj:
         self.typ = typ
 
 class Scope:
+    __slots__ = (
+        "parent", "detached_from_parent", "objects", "objects_index",
+        "childrens", "start", "end"
+    )
+
     def __init__(self, start, parent = None):
         self.parent = parent
         self.detached_from_parent = False
+        # `objects` keeps the order of the declarations, `objects_index` is
+        # used to find them by name
         self.objects = []
+        self.objects_index = {}
         self.childrens = []
         self.start = start
         self.end = 0
@@ -47,6 +63,7 @@ class Scope:
         if self.exists(obj.name):
             raise CompilerError(f"duplicate object `{obj.name}`")
         self.objects.append(obj)
+        self.objects_index[obj.name] = obj
 
     def exists(self, name):
         if _ := self.lookup(name):
@@ -56,9 +73,8 @@ class Scope:
     def lookup(self, name):
         sc = self
         while True:
-            for obj in sc.objects:
-                if obj.name == name:
-                    return obj
+            if obj := sc.objects_index.get(name):
+                return obj
             if sc.dont_lookup_parent():
                 break
             sc = sc.parent
@@ -100,6 +116,12 @@ class ABI(Enum):
         return self.__repr__()
 
 class Sym:
+    __slots__ = (
+        "annotations", "id", "abi", "is_public", "name", "mangled_name",
+        "qualified_name", "parent", "syms", "syms_index", "is_universe",
+        "is_root"
+    )
+
     def __init__(self, is_public, name, abi = ABI.Rivet):
         self.annotations = None
         self.id = new_symbol_id()
@@ -109,7 +131,10 @@ class Sym:
         self.mangled_name = ""
         self.qualified_name = ""
         self.parent = None
+        # `syms` keeps the order of the symbols (for the code generation),
+        # `syms_index` is used to find them by name
         self.syms = []
+        self.syms_index = {}
         self.is_universe = isinstance(self, Mod) and self.id == 0
         self.is_root = False
 
@@ -124,21 +149,23 @@ class Sym:
             )
         sym.parent = self
         self.syms.append(sym)
+        self.syms_index[sym.name] = sym
 
     def add_and_return(self, sym):
-        idx = len(self.syms)
-        for i, asym in enumerate(self.syms):
-            if asym.name == sym.name:
-                if isinstance(asym, Type) and asym.kind == TypeKind.Placeholder:
-                    # update placeholder
-                    asym.update(sym)
-                    return self.syms[i]
-                raise CompilerError(
-                    f"{self.typeof()} `{self.name}` has duplicate symbol `{sym.name}`"
-                )
+        self.add(sym)
+        return self.syms_index[sym.name]
+
+    # Returns the index of the removed symbol.
+    def remove(self, name):
+        sym = self.syms_index.pop(name)
+        idx = self.syms.index(sym)
+        del self.syms[idx]
+        return idx
+
+    def insert(self, idx, sym):
         sym.parent = self
-        self.syms.append(sym)
-        return self.syms[idx]
+        self.syms.insert(idx, sym)
+        self.syms_index[sym.name] = sym
 
     def add_or_get_mod(self, sym):
         if m := self.find(sym.name):
@@ -153,10 +180,7 @@ class Sym:
         return syms
 
     def find(self, name):
-        for sym in self.syms:
-            if sym.name == name:
-                return sym
-        return None
+        return self.syms_index.get(name)
 
     def exists(self, name):
         if _ := self.find(name):
@@ -216,11 +240,15 @@ class Sym:
         return self.syms[idx]
 
     def __eq__(self, other):
-        if other == None:
+        if self is other:
+            return True
+        elif other is None:
             return False
         return self.id == other.id
 
 class SymRef(Sym):
+    __slots__ = ("ref", "ref_resolved")
+
     def __init__(self, is_public, name, ref):
         Sym.__init__(self, is_public, name)
         self.ref = ref
@@ -233,15 +261,32 @@ class SymRef(Sym):
         return self.ref.is_core_mod()
 
 class Mod(Sym):
+    __slots__ = ("types_index", )
+
+    def __init__(self, is_public, name):
+        Sym.__init__(self, is_public, name)
+        # the vectors, arrays and tuples added by `add_or_get_*`, by the key
+        # of their types (see `type.TBase.key`)
+        self.types_index = {}
+
+    def add_interned_type(self, key, sym):
+        sym = self.add_and_return(sym)
+        self.types_index[key] = sym
+        return sym
+
     def add_or_get_array(self, elem_typ, size, is_mut = False):
+        key = (TypeKind.Array, elem_typ.key(), str(size), is_mut)
+        if sym := self.types_index.get(key):
+            return sym
         if is_mut:
             unique_name = f"[{size}]mut {elem_typ.qualstr()}"
         else:
             unique_name = f"[{size}]{elem_typ.qualstr()}"
         if sym := self.find(unique_name):
+            self.types_index[key] = sym
             return sym
-        from .type import Type as type_Type
-        return self.add_and_return(
+        return self.add_interned_type(
+            key,
             Type(
                 True, unique_name, TypeKind.Array,
                 info = ArrayInfo(elem_typ, size, is_mut)
@@ -249,11 +294,15 @@ class Mod(Sym):
         )
 
     def add_or_get_vec(self, elem_typ, is_mut = False):
+        key = (TypeKind.Vec, elem_typ.key(), is_mut)
+        if sym := self.types_index.get(key):
+            return sym
         if is_mut:
             unique_name = f"[]mut {elem_typ.qualstr()}"
         else:
             unique_name = f"[]{elem_typ.qualstr()}"
         if sym := self.find(unique_name):
+            self.types_index[key] = sym
             return sym
         from .type import Type as type_Type
         vec_sym = Type(
@@ -291,17 +340,27 @@ class Mod(Sym):
                 vec_sym.add(delete_m)
             if clear_m := vector_sym.find("clear"):
                 vec_sym.add(clear_m)
-        return self.add_and_return(vec_sym)
+        return self.add_interned_type(key, vec_sym)
 
     def add_or_get_tuple(self, types):
+        key = (TypeKind.Tuple, tuple(t.key() for t in types))
+        if sym := self.types_index.get(key):
+            return sym
         unique_name = f"({', '.join([t.qualstr() for t in types])})"
         if sym := self.find(unique_name):
+            self.types_index[key] = sym
             return sym
-        return self.add_and_return(
+        return self.add_interned_type(
+            key,
             Type(True, unique_name, TypeKind.Tuple, info = TupleInfo(types))
         )
 
 class Const(Sym):
+    __slots__ = (
+        "expr", "evaled_expr", "has_evaled_expr", "ir_expr", "has_ir_expr",
+        "typ"
+    )
+
     def __init__(self, is_public, name, typ, expr):
         Sym.__init__(self, is_public, name)
         self.expr = expr
@@ -312,6 +371,8 @@ class Const(Sym):
         self.typ = typ
 
 class Var(Sym):
+    __slots__ = ("is_extern", "is_mut", "is_changed", "typ", "pos")
+
     def __init__(self, is_public, is_mut, is_extern, abi, name, typ):
         Sym.__init__(self, is_public, name, abi)
         self.is_extern = is_extern
@@ -321,6 +382,10 @@ class Var(Sym):
         self.pos = None
 
 class Field:
+    __slots__ = (
+        "name", "is_mut", "is_public", "typ", "has_def_expr", "def_expr"
+    )
+
     def __init__(
         self, name, is_mut, is_public, typ, has_def_expr = False,
         def_expr = None
@@ -436,12 +501,27 @@ class TypeKind(Enum):
 
 # Type infos
 
+# Properties of the numeric primitive types, `bits` is the size used to
+# promote the numbers (`comptime_int` is bigger than any integer).
+class NumberInfo:
+    __slots__ = ("is_float", "is_signed", "is_comptime", "bits")
+
+    def __init__(self, is_float, is_signed, bits, is_comptime = False):
+        self.is_float = is_float
+        self.is_signed = is_signed
+        self.is_comptime = is_comptime
+        self.bits = bits
+
 class AliasInfo:
+    __slots__ = ("parent", "is_resolved")
+
     def __init__(self, parent):
         self.parent = parent
         self.is_resolved = False
 
 class ArrayInfo:
+    __slots__ = ("elem_typ", "size", "is_mut", "has_contains_method")
+
     def __init__(self, elem_typ, size, is_mut):
         self.elem_typ = elem_typ
         self.size = size
@@ -449,16 +529,22 @@ class ArrayInfo:
         self.has_contains_method = False
 
 class VecInfo:
+    __slots__ = ("elem_typ", "is_mut", "has_contains_method")
+
     def __init__(self, elem_typ, is_mut):
         self.elem_typ = elem_typ
         self.is_mut = is_mut
         self.has_contains_method = False
 
 class TupleInfo:
+    __slots__ = ("types", )
+
     def __init__(self, types):
         self.types = types
 
 class EnumVariant:
+    __slots__ = ("name", "has_typ", "typ", "value", "has_fields")
+
     def __init__(self, name, has_typ, typ, has_fields):
         self.name = name
         self.has_typ = has_typ
@@ -467,6 +553,8 @@ class EnumVariant:
         self.has_fields = has_fields
 
 class EnumInfo:
+    __slots__ = ("underlying_typ", "is_boxed_enum", "variants")
+
     def __init__(self, underlying_typ, is_boxed_enum):
         self.underlying_typ = underlying_typ
         self.is_boxed_enum = is_boxed_enum
@@ -493,6 +581,8 @@ class EnumInfo:
         return False
 
 class TraitInfo:
+    __slots__ = ("has_objects", "bases", "implements")
+
     def __init__(self):
         self.has_objects = False
         self.bases = []
@@ -506,14 +596,22 @@ class TraitInfo:
         return 0
 
     def implement(self, implementor):
-        self.implements.append(implementor)
+        self.add_implementor(implementor)
         for b in self.bases:
-            b.info.implements.append(implementor)
+            b.info.add_implementor(implementor)
+
+    # unlike `implement`, the bases of the trait are not updated
+    def add_implementor(self, implementor):
+        global IMPLEMENTS_VERSION
+        IMPLEMENTS_VERSION += 1
+        self.implements.append(implementor)
 
     def mark_has_objects(self):
         self.has_objects = True
 
 class StructInfo:
+    __slots__ = ("bases", "traits", "is_boxed", "is_opaque", "is_enum_variant")
+
     def __init__(self, is_opaque, is_boxed = False, is_enum_variant = False):
         self.bases = []
         self.traits = []
@@ -522,6 +620,8 @@ class StructInfo:
         self.is_enum_variant = is_enum_variant
 
 class Type(Sym):
+    __slots__ = ("kind", "fields", "full_fields_", "info", "size", "align")
+
     def __init__(self, is_public, name, kind, fields = [], info = None):
         Sym.__init__(self, is_public, name)
         self.kind = kind
@@ -610,6 +710,10 @@ class Type(Sym):
         return self.kind.is_primitive()
 
 class Arg:
+    __slots__ = (
+        "name", "is_mut", "is_self", "typ", "def_expr", "has_def_expr", "pos"
+    )
+
     def __init__(self, name, is_mut, typ, def_expr, has_def_expr, pos):
         self.name = name
         self.is_mut = is_mut
@@ -620,6 +724,12 @@ class Arg:
         self.pos = pos
 
 class Fn(Sym):
+    __slots__ = (
+        "is_main", "is_extern", "is_unsafe", "is_method", "is_variadic",
+        "self_typ", "self_is_mut", "self_is_ref", "args", "ret_typ",
+        "has_named_args", "has_body", "name_pos", "lazy_decl"
+    )
+
     def __init__(
         self, abi, is_public, is_extern, is_unsafe, is_method, is_variadic,
         name, args, ret_typ, has_named_args, has_body, name_pos, self_is_mut,
@@ -640,6 +750,9 @@ class Fn(Sym):
         self.has_named_args = has_named_args
         self.has_body = has_body
         self.name_pos = name_pos
+        # the declaration of the function while its body is not parsed, see
+        # `ast.LazyBody`
+        self.lazy_decl = None
 
     def get_arg(self, idx):
         arg = self.args[idx]
@@ -667,7 +780,7 @@ class Fn(Sym):
             self.is_variadic, self.ret_typ, self.self_is_mut, self.self_is_ref
         )
 
-def universe():
+def universe(pointer_bits = 64):
     from .type import Ptr, Type as type_Type
 
     uni = Mod(False, "universe")
@@ -676,20 +789,70 @@ def universe():
     uni.add(Type(True, "none", TypeKind.None_))
     uni.add(Type(True, "bool", TypeKind.Bool))
     uni.add(Type(True, "rune", TypeKind.Rune))
-    uni.add(Type(True, "int8", TypeKind.Int8))
-    uni.add(Type(True, "int16", TypeKind.Int16))
-    uni.add(Type(True, "int32", TypeKind.Int32))
-    uni.add(Type(True, "int64", TypeKind.Int64))
-    uni.add(Type(True, "isize", TypeKind.Isize))
-    uni.add(Type(True, "uint8", TypeKind.Uint8))
-    uni.add(Type(True, "uint16", TypeKind.Uint16))
-    uni.add(Type(True, "uint32", TypeKind.Uint32))
-    uni.add(Type(True, "uint64", TypeKind.Uint64))
-    uni.add(Type(True, "usize", TypeKind.Usize))
-    uni.add(Type(True, "comptime_int", TypeKind.ComptimeInt))
-    uni.add(Type(True, "comptime_float", TypeKind.ComptimeFloat))
-    uni.add(Type(True, "float32", TypeKind.Float32))
-    uni.add(Type(True, "float64", TypeKind.Float64))
+    uni.add(
+        Type(True, "int8", TypeKind.Int8, info = NumberInfo(False, True, 8))
+    )
+    uni.add(
+        Type(True, "int16", TypeKind.Int16, info = NumberInfo(False, True, 16))
+    )
+    uni.add(
+        Type(True, "int32", TypeKind.Int32, info = NumberInfo(False, True, 32))
+    )
+    uni.add(
+        Type(True, "int64", TypeKind.Int64, info = NumberInfo(False, True, 64))
+    )
+    uni.add(
+        Type(
+            True, "isize", TypeKind.Isize,
+            info = NumberInfo(False, True, pointer_bits)
+        )
+    )
+    uni.add(
+        Type(True, "uint8", TypeKind.Uint8, info = NumberInfo(False, False, 8))
+    )
+    uni.add(
+        Type(
+            True, "uint16", TypeKind.Uint16, info = NumberInfo(False, False, 16)
+        )
+    )
+    uni.add(
+        Type(
+            True, "uint32", TypeKind.Uint32, info = NumberInfo(False, False, 32)
+        )
+    )
+    uni.add(
+        Type(
+            True, "uint64", TypeKind.Uint64, info = NumberInfo(False, False, 64)
+        )
+    )
+    uni.add(
+        Type(
+            True, "usize", TypeKind.Usize,
+            info = NumberInfo(False, False, pointer_bits)
+        )
+    )
+    uni.add(
+        Type(
+            True, "comptime_int", TypeKind.ComptimeInt,
+            info = NumberInfo(False, True, 75, True)
+        )
+    )
+    uni.add(
+        Type(
+            True, "comptime_float", TypeKind.ComptimeFloat,
+            info = NumberInfo(True, False, 64, True)
+        )
+    )
+    uni.add(
+        Type(
+            True, "float32", TypeKind.Float32, info = NumberInfo(True, False, 32)
+        )
+    )
+    uni.add(
+        Type(
+            True, "float64", TypeKind.Float64, info = NumberInfo(True, False, 64)
+        )
+    )
     uni.add(
         Type(
             True, "string", TypeKind.String,
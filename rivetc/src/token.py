@@ -2,6 +2,8 @@
 # Use of this source code is governed by an MIT license that can
 # be found in the LICENSE file.
 
+import bisect
+from array import array
 from enum import IntEnum as Enum, auto as auto_enum
 
 class Kind(Enum):
@@ -296,22 +298,96 @@ def lookup(lit):
 def is_keyword(lit):
     return lit in KEYWORDS
 
+# The source files, the positions refer to them by their index.
+FILES = [""]
+FILE_IDS = {"": 0}
+
+# The line index of each file (by its id), created when it is needed.
+LINE_INDEXES = {}
+
+def add_file(file):
+    file_id = FILE_IDS.get(file)
+    if file_id == None:
+        file_id = len(FILES)
+        FILES.append(file)
+        FILE_IDS[file] = file_id
+    return file_id
+
+def line_index(file_id):
+    index = LINE_INDEXES.get(file_id)
+    if index == None:
+        index = LineIndex(FILES[file_id])
+        LINE_INDEXES[file_id] = index
+    return index
+
+# `LineIndex` stores the offset of each new line of a file, to get the line
+# and the column of an offset.
+class LineIndex:
+    def __init__(self, file):
+        self.text = open(file, encoding = 'UTF-8').read() if file else ""
+        self.newlines = array("I")
+        nl = self.text.find("\n")
+        while nl != -1:
+            self.newlines.append(nl)
+            nl = self.text.find("\n", nl + 1)
+
+    def line(self, pos):
+        return bisect.bisect_left(self.newlines, pos)
+
+    def col(self, pos):
+        line = self.line(pos)
+        return max(1, pos - (self.newlines[line - 1] if line > 0 else 0))
+
+    def line_text(self, line):
+        lines_len = len(self.newlines)
+        if len(self.text) > 0 and not self.text.endswith("\n"):
+            lines_len += 1
+        line = min(line, lines_len - 1)
+        start = self.newlines[line - 1] + 1 if line > 0 else 0
+        end = self.newlines[line] if line < len(self.newlines
+                                                ) else len(self.text)
+        return self.text[start:end]
+
+# `Pos` only stores the file id and the offset, the line and the column are
+# computed when they are needed (reports and debug information).
 class Pos:
-    def __init__(self, file, line, col, pos):
-        self.file = file
-        self.line = line
-        self.col = col
+    __slots__ = ("file_id", "pos")
+
+    def __init__(self, file_id, pos):
+        self.file_id = file_id
         self.pos = pos
 
+    @property
+    def file(self):
+        return FILES[self.file_id]
+
+    @property
+    def line(self):
+        return line_index(self.file_id).line(self.pos)
+
+    @property
+    def col(self):
+        return line_index(self.file_id).col(self.pos)
+
+    # the file ids are only valid in this process
+    def __getstate__(self):
+        return (FILES[self.file_id], self.pos)
+
+    def __setstate__(self, state):
+        self.file_id = add_file(state[0])
+        self.pos = state[1]
+
     def __repr__(self):
         return f"{self.file}:{self.line+1}:{self.col}"
 
     def __str__(self):
         return self.__repr__()
 
-NO_POS = Pos("", 0, 0, 0)
+NO_POS = Pos(0, 0)
 
 class Token:
+    __slots__ = ("lit", "kind", "pos")
+
     def __init__(self, lit, kind, pos):
         self.lit = lit
         self.kind = kind
@@ -13,9 +13,26 @@ class _Ptr: # ugly hack =/
 
     def store(self, val):
         self.val.__class__ = val.__class__
-        self.val.__dict__ = val.__dict__
-
+        for name in TBase.__slots__:
+            if hasattr(val, name):
+                setattr(self.val, name, getattr(val, name))
+            elif hasattr(self.val, name):
+                delattr(self.val, name)
+
+# All the types share the same slots, so that `_Ptr.store` can change the
+# class of a type in place (unaliasing).
+#
+# `key()` returns a hashable value that identifies a resolved type by its
+# structure, it's used to intern the types that have their own symbol
+# (vectors, arrays and tuples) and the RIR types generated for them. The
+# types are resolved in place, so the key is not cached.
 class TBase:
+    __slots__ = (
+        "sym", "expr", "_unresolved", "typ", "is_mut", "is_indexable", "size",
+        "types", "is_unsafe", "is_extern", "abi", "is_method", "self_is_mut",
+        "self_is_ref", "args", "is_variadic", "ret_typ"
+    )
+
     def symbol(self):
         if isinstance(self, (Vec, Array, Tuple, Variadic)):
             return self.sym
@@ -41,6 +58,8 @@ class TBase:
                 _Ptr(self).store(self.sym.info.parent)
 
 class Type(TBase):
+    __slots__ = ()
+
     def __init__(self, sym):
         self.sym = sym
         self.expr = None
@@ -63,6 +82,9 @@ class Type(TBase):
     def qualstr(self):
         return self.sym.qualname()
 
+    def key(self):
+        return self.sym.id
+
     def symbol(self):
         sy = self.sym
         return sy
@@ -82,6 +104,8 @@ class Type(TBase):
         return res
 
 class Ref(TBase):
+    __slots__ = ()
+
     def __init__(self, typ, is_mut = False):
         self.typ = typ
         self.is_mut = is_mut
@@ -91,6 +115,9 @@ class Ref(TBase):
             return f"&mut {self.typ.qualstr()}"
         return f"&{self.typ.qualstr()}"
 
+    def key(self):
+        return (Ref, self.typ.key(), self.is_mut)
+
     def __eq__(self, other):
         if not isinstance(other, Ref):
             return False
@@ -104,6 +131,8 @@ class Ref(TBase):
         return f"&{self.typ}"
 
 class Ptr(TBase):
+    __slots__ = ()
+
     def __init__(self, typ, is_mut = False, is_indexable = False):
         self.typ = typ
         self.is_mut = is_mut
@@ -130,6 +159,9 @@ class Ptr(TBase):
             return f"[*]{self.typ.qualstr()}"
         return f"*{self.typ.qualstr()}"
 
+    def key(self):
+        return (Ptr, self.typ.key(), self.is_mut, self.is_indexable)
+
     def __eq__(self, other):
         if not isinstance(other, Ptr):
             return False
@@ -151,6 +183,8 @@ class Ptr(TBase):
         return f"*{self.typ}"
 
 class Vec(TBase):
+    __slots__ = ()
+
     def __init__(self, typ, is_mut):
         self.typ = typ
         self.is_mut = is_mut
@@ -164,6 +198,9 @@ class Vec(TBase):
             return f"[]mut {self.typ.qualstr()}"
         return f"[]{self.typ.qualstr()}"
 
+    def key(self):
+        return (Vec, self.typ.key(), self.is_mut)
+
     def __eq__(self, other):
         if not isinstance(other, Vec):
             return False
@@ -175,6 +212,8 @@ class Vec(TBase):
         return f"[]{self.typ}"
 
 class Variadic(TBase):
+    __slots__ = ()
+
     def __init__(self, typ):
         self.typ = typ
         self.sym = None
@@ -185,6 +224,9 @@ class Variadic(TBase):
     def qualstr(self):
         return f"...{self.typ.qualstr()}"
 
+    def key(self):
+        return (Variadic, self.typ.key())
+
     def __eq__(self, other):
         if not isinstance(other, Variadic):
             return False
@@ -194,6 +236,8 @@ class Variadic(TBase):
         return f"...{self.typ}"
 
 class Array(TBase):
+    __slots__ = ()
+
     def __init__(self, typ, size, is_mut):
         self.typ = typ
         self.size = size
@@ -208,6 +252,9 @@ class Array(TBase):
             return f"[{self.size}]mut {self.typ.qualstr()}"
         return f"[{self.size}]{self.typ.qualstr()}"
 
+    def key(self):
+        return (Array, self.typ.key(), str(self.size), self.is_mut)
+
     def __eq__(self, other):
         if not isinstance(other, Array):
             return False
@@ -219,6 +266,8 @@ class Array(TBase):
         return f"[{self.size}]{self.typ}"
 
 class Tuple(TBase):
+    __slots__ = ()
+
     def __init__(self, types):
         self.types = types
         self.sym = None
@@ -229,10 +278,15 @@ class Tuple(TBase):
     def qualstr(self):
         return f"({', '.join([t.qualstr() for t in self.types])})"
 
+    def key(self):
+        return (Tuple, tuple(t.key() for t in self.types))
+
     def __str__(self):
         return f"({', '.join([str(t) for t in self.types])})"
 
 class Fn(TBase):
+    __slots__ = ()
+
     def __init__(
         self, is_extern, abi, is_method, args, is_variadic, ret_typ,
         self_is_mut, self_is_ref
@@ -252,7 +306,7 @@ class Fn(TBase):
             self.abi, True, self.is_extern, self.is_unsafe, self.is_method,
             self.is_variadic, self.stringify(False),
             self.args, self.ret_typ, False, not self.is_extern,
-            token.Pos("", 0, 0, 0), self.self_is_mut, self.self_is_ref
+            token.NO_POS, self.self_is_mut, self.self_is_ref
         )
 
     def stringify(self, qual):
@@ -293,6 +347,14 @@ class Fn(TBase):
     def qualstr(self):
         return str(self)
 
+    def key(self):
+        return (
+            Fn, self.is_unsafe, self.is_extern, self.abi, self.is_method,
+            self.self_is_mut, self.self_is_ref, self.is_variadic,
+            tuple((arg.is_mut, arg.typ.key()) for arg in self.args),
+            self.ret_typ.key()
+        )
+
     def __str__(self):
         return self.stringify(False)
 
@@ -320,6 +382,8 @@ class Fn(TBase):
         return self.ret_typ == got.ret_typ
 
 class Option(TBase):
+    __slots__ = ()
+
     def __init__(self, typ):
         self.typ = typ
         self.sym = None
@@ -331,6 +395,9 @@ class Option(TBase):
     def qualstr(self):
         return f"?{self.typ.qualstr()}"
 
+    def key(self):
+        return (Option, self.typ.key())
+
     def __eq__(self, other):
         if not isinstance(other, Option):
             return False
@@ -340,6 +407,8 @@ class Option(TBase):
         return f"?{self.typ}"
 
 class Result(TBase):
+    __slots__ = ()
+
     def __init__(self, typ):
         self.typ = typ
         self.sym = None
@@ -347,6 +416,9 @@ class Result(TBase):
     def qualstr(self):
         return f"!{self.typ.qualstr()}"
 
+    def key(self):
+        return (Result, self.typ.key())
+
     def __eq__(self, other):
         if not isinstance(other, Result):
             return False
@@ -3,7 +3,7 @@
 # be found in the LICENSE file.
 
 from io import StringIO
-import os, sys, subprocess
+import os, sys, subprocess, contextlib
 
 VERSION = "0.1.0a"
 HELP = """Usage: rivetc [OPTIONS] INPUT
@@ -76,6 +76,61 @@ Options:
    --keep-c
       Don't remove the output C source file.
 
+   -j <n>, --jobs <n>
+      Use up to <n> processes to lex and parse the module files, and to compile
+      the C units (see `--incremental` and `--split-c`) in parallel. By default,
+      the files are parsed sequentially and the C units are compiled using all
+      the CPU cores.
+
+   --incremental
+      Compile each module into its own object file. The objects of the modules
+      that have not changed are reused from `~/.rivet_lang/obj/`, so only those
+      that changed are compiled again before linking.
+
+   --split-c <n>
+      Put the shared C declarations in a header and spread the function bodies
+      across <n> C files, which are compiled in parallel and then linked.
+
+   --no-dce
+      Generate code for all the functions and types of the imported modules,
+      even if they are not reachable from `main` (or the tests). The bodies
+      of their unused functions are also checked.
+
+   --no-cache
+      Don't use the files cached in `~/.rivet_lang/cache/` (the parsed files,
+      the checked `core` module and the index of modules), everything is
+      searched, parsed and compiled from scratch.
+
+   --watch
+      Build the module again each time one of its files (or a file of the
+      modules it imports) changes, until Ctrl-C is pressed. Only the modules
+      affected by the changes are checked again, and in the module itself,
+      only the changed functions, constants, variables and tests, and the
+      ones that use them. Changing a type, a trait, an alias, a field, an
+      import or the signature of a method checks the whole module again.
+
+   --time-passes
+      Print the time spent in each pass of the compiler (lexing, parsing,
+      register, checker, C compiler, etc.), the growth of the resident
+      memory during each pass, the peak memory of the compiler and of the C
+      compiler, and some counters (files, tokens, symbols, etc.). Same as
+      `--stats text`.
+
+   --stats <format>
+      Print the statistics of `--time-passes` in the given format (`text`
+      or `json`) to stderr.
+
+   --stats-file <file>
+      Write the statistics to <file> instead of stderr (in JSON by default).
+
+   --server
+      Start a compiler server, which keeps the `core` module loaded and checked
+      in memory and listens on `~/.rivet_lang/server.sock`.
+
+   --client <options> INPUT
+      Send the build to the compiler server (see `--server`); if no server is
+      running, the module is compiled normally. Must be the first option.
+
    -v, --verbose
       Print additional messages to the console.
 
@@ -134,9 +189,17 @@ def red(msg):
 def commit_hash():
     return execute("git", "log", "-n", "1", '--pretty=format:%h').out
 
+# The commit is obtained only once, the first time it is needed.
+FULL_VERSION = ""
+
 def full_version():
-    commit_date = execute("git", "log", "-n", "1", '--pretty=format:%h %as').out
-    return f"rivetc {VERSION} ({commit_date})"
+    global FULL_VERSION
+    if len(FULL_VERSION) == 0:
+        commit_date = execute(
+            "git", "log", "-n", "1", '--pretty=format:%h %as'
+        ).out
+        FULL_VERSION = f"rivetc {VERSION} ({commit_date})"
+    return FULL_VERSION
 
 # Rounds the number `n` up to the next multiple `multiple`.
 # NOTE: `multiple` must be a power of 2.
@@ -155,6 +218,15 @@ def execute(*args):
     stderr = res.stderr.strip() if res.stderr else ""
     return ProcessResult(stdout, stderr, res.returncode)
 
+@contextlib.contextmanager
+def recursion_limit(limit):
+    old_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, old_limit))
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(old_limit)
+
 class Builder:
     def __init__(self):
         self.buf = StringIO()
@@ -334,83 +406,14 @@ def smart_quote(str, raw):
         result.write(current)
     return result.__str__()
 
-class OrderedDepMap:
-    def __init__(self, keys = [], data = {}):
-        self.keys = keys.copy()
-        self.data = data.copy()
-
-    def set(self, name, deps):
-        if name not in self.data:
-            self.keys.append(name)
-        self.data[name] = deps
-
-    def add(self, name, deps):
-        d = self.get(name)
-        for dep in deps:
-            if dep not in d:
-                d.append(dep)
-        self.set(name, d)
-
-    def get(self, name):
-        return self.data[name] if name in self.data else []
-
-    def delete(self, name):
-        if name not in self.data:
-            raise KeyError(f"OrderedDepMap.delete: no such key `{name}`")
-        for i, _ in enumerate(self.keys):
-            if self.keys[i] == name:
-                self.keys.pop(i)
-                break
-        self.data.pop(name)
-
-    def apply_diff(self, name, deps):
-        diff = []
-        deps_of_name = self.get(name)
-        for dep in deps_of_name:
-            if dep not in deps:
-                diff.append(dep)
-        self.set(name, diff)
-
-    def size(self):
-        return len(self.data)
-
 class DepGraphNode:
     def __init__(self, name, deps):
         self.name = name
         self.deps = deps
 
-class NodeNames:
-    def __init__(self, is_cycle = {}, names = {}):
-        self.is_cycle = is_cycle.copy()
-        self.names = names.copy()
-
-    def is_part_of_cycle(self, name, already_seen):
-        seen = False
-        new_already_seen = already_seen.copy()
-        if name in self.is_cycle:
-            return self.is_cycle[name], new_already_seen
-
-        if name in already_seen:
-            new_already_seen.append(name)
-            self.is_cycle[name] = True
-            return True, new_already_seen
-
-        new_already_seen.append(name)
-        deps = self.names[name] if name in self.names else []
-        if len(deps) == 0:
-            self.is_cycle[name] = False
-            return False, new_already_seen
-
-        for d in deps:
-            d_already_seen = new_already_seen.copy()
-            seen, d_already_seen = self.is_part_of_cycle(d, d_already_seen)
-            if seen:
-                new_already_seen = d_already_seen.copy()
-                self.is_cycle[name] = True
-                return True, new_already_seen
-        self.is_cycle[name] = False
-        return False, new_already_seen
-
+# `DepGraph` sorts its nodes so that each node comes after its dependencies.
+# Both `resolve` and `cycles` run in linear time, so they can be used with
+# the import graph of big projects and with all the types of a program.
 class DepGraph:
     def __init__(self, acyclic = True, nodes = []):
         self.acyclic = acyclic
@@ -419,31 +422,56 @@ class DepGraph:
     def add(self, name, deps):
         self.nodes.append(DepGraphNode(name, deps))
 
-    def resolve(self):
-        node_names = OrderedDepMap()
-        node_deps = OrderedDepMap()
+    # Returns the names of the nodes (in order of appearance, the nodes with
+    # the same name are merged) and the indexes of their dependencies;
+    # dependencies that are not nodes of the graph have the index `-1`.
+    def indexed(self):
+        index = {}
+        names = []
+        deps = []
         for node in self.nodes:
-            node_names.add(node.name, node.deps)
-            node_deps.add(node.name, node.deps)
-        iterations = 0
+            if node.name not in index:
+                index[node.name] = len(names)
+                names.append(node.name)
+                deps.append([])
+            node_deps = deps[index[node.name]]
+            for dep in node.deps:
+                if dep not in node_deps:
+                    node_deps.append(dep)
+        deps_idx = [[index.get(dep, -1) for dep in d] for d in deps]
+        return names, deps, deps_idx
+
+    # Kahn's algorithm, by levels: the nodes whose dependencies are already
+    # resolved are added in order of appearance, then the nodes that depend
+    # on them, and so on. If some nodes cannot be resolved (cycles, or
+    # dependencies that are not nodes of the graph), returns a non-acyclic
+    # graph with those nodes.
+    def resolve(self):
+        names, deps, deps_idx = self.indexed()
+        pending = [len(d) for d in deps]
+        dependents = [[] for _ in names]
+        for i, node_deps in enumerate(deps_idx):
+            for dep in node_deps:
+                if dep != -1:
+                    dependents[dep].append(i)
         resolved = DepGraph()
-        while node_deps.size() != 0:
-            iterations += 1
-            ready_set = []
-            for name in node_deps.keys:
-                if len(node_deps.get(name)) == 0:
-                    ready_set.append(name)
-            if len(ready_set) == 0:
-                g = DepGraph()
-                g.acyclic = False
-                for name in node_deps.keys:
-                    g.add(name, node_names.get(name))
-                return g
-            for name in ready_set:
-                node_deps.delete(name)
-                resolved.add(name, node_names.get(name))
-            for name in node_deps.keys:
-                node_deps.apply_diff(name, ready_set)
+        level = [i for i, p in enumerate(pending) if p == 0]
+        while len(level) > 0:
+            next_level = []
+            for i in level:
+                resolved.add(names[i], deps[i])
+                for dependent in dependents[i]:
+                    pending[dependent] -= 1
+                    if pending[dependent] == 0:
+                        next_level.append(dependent)
+            next_level.sort()
+            level = next_level
+        if len(resolved.nodes) < len(names):
+            unresolved = DepGraph(False)
+            for i, name in enumerate(names):
+                if pending[i] > 0:
+                    unresolved.add(name, deps[i])
+            return unresolved
         return resolved
 
     def last_node(self):
@@ -457,16 +485,81 @@ class DepGraph:
         return "\n".join(out)
 
     def display_cycles(self):
-        seen = False
-        out = []
-        nn = NodeNames()
-        for node in self.nodes:
-            nn.names[node.name] = node.deps
-        for k, _ in nn.names.items():
-            cycle_names = []
-            if k in nn.is_cycle:
+        return "\n".join(
+            " > " + " -> ".join(cycle) for cycle in self.cycles()
+        )
+
+    # Returns a cycle for each strongly connected component (Tarjan's
+    # algorithm) with more than one node or with a node that depends on
+    # itself, e.g. `["a", "b", "a"]`.
+    def cycles(self):
+        names, _, deps_idx = self.indexed()
+        n = len(names)
+        order = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        comp = [-1] * n
+        stack = []
+        sccs = []
+        counter = 0
+        for root in range(n):
+            if order[root] != -1:
                 continue
-            seen, cycle_names = nn.is_part_of_cycle(k, cycle_names)
-            if seen:
-                out.append(" > " + " -> ".join(cycle_names))
-        return "\n".join(out)
+            work = [(root, 0)]
+            while len(work) > 0:
+                v, i = work.pop()
+                if i == 0:
+                    order[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                else:
+                    # back from the dependency `i - 1`
+                    low[v] = min(low[v], low[deps_idx[v][i - 1]])
+                while i < len(deps_idx[v]):
+                    w = deps_idx[v][i]
+                    i += 1
+                    if w == -1:
+                        continue
+                    if order[w] == -1:
+                        work.append((v, i))
+                        work.append((w, 0))
+                        break
+                    if on_stack[w]:
+                        low[v] = min(low[v], order[w])
+                else:
+                    if low[v] == order[v]:
+                        scc = []
+                        while True:
+                            w = stack.pop()
+                            on_stack[w] = False
+                            comp[w] = len(sccs)
+                            scc.append(w)
+                            if w == v:
+                                break
+                        sccs.append(scc)
+        cycles = []
+        for c, scc in enumerate(sccs):
+            start = min(scc)
+            if len(scc) == 1 and start not in deps_idx[start]:
+                continue
+            # shortest path from `start` back to itself, inside the component
+            prev = {}
+            queue = [start]
+            for v in queue:
+                for w in deps_idx[v]:
+                    if w != -1 and comp[w] == c and w not in prev:
+                        prev[w] = v
+                        queue.append(w)
+                if start in prev:
+                    break
+            path = [start]
+            v = prev[start]
+            while v != start:
+                path.append(v)
+                v = prev[v]
+            path.append(start)
+            path.reverse()
+            cycles.append((start, [names[v] for v in path]))
+        cycles.sort()
+        return [cycle for _, cycle in cycles]
@@ -0,0 +1,102 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+from os import path
+import os, glob, time
+
+from . import cache, rechecker, utils
+from .server import Server
+
+POLL_INTERVAL = 0.5 # in seconds
+
+# `Watcher` builds the module each time its files (or the files of the
+# modules it imports) change. Like the compiler server, it keeps `core`
+# checked in memory; it also keeps a snapshot of the modules imported by
+# the root module, so if only the root module changes, only its files are
+# parsed and checked again; and only the changed declarations of the root
+# module (and the ones that use them) are checked again, while the modules
+# it imports don't change (see `rechecker.py`). The changed files are
+# detected by polling their size and modification time.
+class Watcher(Server):
+    def __init__(self, args):
+        Server.__init__(self)
+        self.args = [arg for arg in args if arg != "--watch"]
+        self.deps_snapshot = None
+        self.stamps = {}
+        # the snapshot used by the state of `rechecker`
+        self.base_snapshot = None
+        self.rechecker = rechecker.Rechecker()
+
+    def watch(self):
+        try:
+            while True:
+                exit_code = self.build(self.args)
+                utils.eprint(
+                    f"rivetc: build finished with exit code {exit_code}, watching for changes..."
+                )
+                self.stamps = self.current_stamps()
+                changed = []
+                while len(changed) == 0:
+                    time.sleep(POLL_INTERVAL)
+                    changed = self.changed_files()
+                for file in changed:
+                    utils.eprint(f"rivetc: `{file}` has changed")
+        except KeyboardInterrupt:
+            pass
+
+    def core_snapshot(self, args, comp):
+        comp.on_deps_checked = self.save_deps_snapshot
+        if self.deps_snapshot and self.deps_snapshot.is_valid_for(comp):
+            snapshot = self.deps_snapshot
+        else:
+            self.deps_snapshot = None
+            snapshot = Server.core_snapshot(self, args, comp)
+        if snapshot is not self.base_snapshot:
+            # the imported modules have changed
+            self.base_snapshot = snapshot
+            self.rechecker = rechecker.Rechecker()
+        comp.rechecker = self.rechecker
+        return snapshot
+
+    def save_deps_snapshot(self, comp):
+        comp.vlog("watch: saving imported modules snapshot...")
+        self.deps_snapshot = cache.CoreSnapshot(comp)
+        self.base_snapshot = self.deps_snapshot
+
+    # Returns the files of the last build, the files of the root module and
+    # the directories containing them (to detect new and deleted files).
+    def watched_files(self):
+        files = set(self.stamps.keys())
+        if self.comp:
+            files.update(
+                cache.CoreSnapshot.files_of(self.comp.source_files)
+            )
+        root = self.comp.prefs.input if self.comp else self.args[-1]
+        if path.isdir(root):
+            files.add(root)
+            files.update(glob.glob(path.join(root, "*.ri")))
+            src_dir = path.join(root, "src")
+            if path.isdir(src_dir):
+                files.add(src_dir)
+                files.update(glob.glob(path.join(src_dir, "*.ri")))
+        else:
+            files.add(root)
+        return files
+
+    def current_stamps(self):
+        stamps = {}
+        for file in self.watched_files():
+            try:
+                st = os.stat(file)
+                stamps[file] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                stamps[file] = None
+        return stamps
+
+    def changed_files(self):
+        stamps = self.current_stamps()
+        return sorted(
+            file for file, stamp in stamps.items()
+            if self.stamps.get(file) != stamp
+        )
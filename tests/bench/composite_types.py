@@ -0,0 +1,59 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of the composite types, compiles a generated module whose
+# functions use the same vectors, arrays, tuples, options, results and
+# references many times and reports the time of the passes that look up
+# and generate the types, run it with:
+#   python3 tests/bench/composite_types.py [functions]
+
+import os, sys, tempfile
+
+sys.path.insert(0, "rivetc")
+from src import Compiler, prefs
+
+prefs.RIVETC_DIR = os.getcwd() # to find `lib/`
+
+PASSES = ["resolver", "checker", "rir", "cgen"]
+
+def generate(file, n):
+	with open(file, "w") as f:
+		f.write("""struct Point {
+    x: int32;
+    y: int32;
+}
+
+""")
+		for i in range(n):
+			f.write(f"""func make{i}(points: []Point, table: [4]Point, pair: (Point, int32)) !(Point, int32) {{
+    mut res: ?Point := none;
+    if points.len > {i % 4} {{
+        res = points[{i % 4}];
+    }}
+    ref := &table[{i % 4}];
+    if p := res {{
+        return (p, ref.x + pair.1);
+    }}
+    return (pair.0, ref.y);
+}}
+
+""")
+		f.write("""func main() {
+    points := [Point(x: 1, y: 2)];
+    table := [Point(x: 1, y: 2), Point(x: 3, y: 4), Point(x: 5, y: 6), Point(x: 7, y: 8)]!;
+    _ = make0(points, table, (Point(x: 0, y: 0), 1)) catch { };
+}
+""")
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+with tempfile.TemporaryDirectory() as dir:
+	file = os.path.join(dir, "types.ri")
+	generate(file, n)
+	comp = Compiler(["--no-cache", "-o", os.path.join(dir, "types"), file])
+	comp.stats.enabled = True
+	comp.build()
+	print(f"{n} functions")
+	print(f"{'pass':<12}{'time (ms)':>12}")
+	for name in PASSES:
+		print(f"{name:<12}{comp.stats.passes[name].cpu_time * 1000:>12.0f}")
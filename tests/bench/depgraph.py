@@ -0,0 +1,55 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of `utils.DepGraph` with synthetic import graphs (each module
+# imports up to 8 previous modules) and type graphs (long chains of structs
+# with fields of other structs), run it with:
+#   python3 tests/bench/depgraph.py [sizes...]
+
+import sys, time, random
+
+sys.path.insert(0, "rivetc")
+from src import utils
+
+def module_graph(n):
+	g = utils.DepGraph()
+	for i in range(n):
+		deps = set(f"mod{random.randrange(i)}" for _ in range(min(i, 8)))
+		g.add(f"mod{i}", ["core", *sorted(deps)])
+	g.add("core", [])
+	return g
+
+def type_graph(n):
+	g = utils.DepGraph()
+	for i in range(n):
+		deps = [f"_R4Type{i - 1}"] if i > 0 else []
+		if i > 10:
+			deps.append(f"_R4Type{random.randrange(i - 10)}")
+		g.add(f"_R4Type{i}", deps)
+	g.nodes.reverse()
+	return g
+
+def cyclic_graph(n):
+	g = module_graph(n)
+	g.add("mod0", [f"mod{n - 1}"])
+	return g
+
+def bench(name, g):
+	start = time.perf_counter()
+	g_resolved = g.resolve()
+	resolve_time = time.perf_counter() - start
+	start = time.perf_counter()
+	cycles = g_resolved.cycles()
+	cycles_time = time.perf_counter() - start
+	print(
+		f"{name:<10}{len(g.nodes):>8}{resolve_time * 1000:>14.2f}{cycles_time * 1000:>14.2f}{len(cycles):>8}"
+	)
+
+random.seed(0)
+sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000]
+print(f"{'graph':<10}{'nodes':>8}{'resolve (ms)':>14}{'cycles (ms)':>14}{'cycles':>8}")
+for size in sizes:
+	bench("modules", module_graph(size))
+	bench("types", type_graph(size))
+	bench("cyclic", cyclic_graph(size))
@@ -0,0 +1,50 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of the lexer, tokenizes the files of `lib/` (or of the given
+# directories) several times and reports the tokens per second and the
+# memory used by the token buffers, run it with:
+#   python3 tests/bench/lexer.py [dirs...]
+
+import sys, glob, time, tracemalloc
+
+sys.path.insert(0, "rivetc")
+from src import Compiler, lexer
+
+RUNS = 5
+
+comp = Compiler(["lib/core"])
+dirs = sys.argv[1:] or ["lib"]
+files = []
+for dir in dirs:
+	files += sorted(glob.glob(f"{dir}/**/*.ri", recursive = True))
+texts = [open(file, encoding = "UTF-8").read() for file in files]
+
+best, tokens = None, 0
+for _ in range(RUNS):
+	tokens = 0
+	start = time.perf_counter()
+	for text in texts:
+		lex = lexer.Lexer(comp, text)
+		lex.tokenize_remaining_text()
+		tokens += len(lex.kinds)
+	elapsed = time.perf_counter() - start
+	best = elapsed if best == None else min(best, elapsed)
+
+tracemalloc.start()
+lexers = []
+for text in texts:
+	lex = lexer.Lexer(comp, text)
+	lex.tokenize_remaining_text()
+	lexers.append(lex)
+mem = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+
+size = sum(len(text) for text in texts)
+print(f"files:      {len(files)}")
+print(f"bytes:      {size}")
+print(f"tokens:     {tokens}")
+print(f"time (ms):  {best * 1000:.2f}")
+print(f"tokens/s:   {tokens / best:.0f}")
+print(f"memory (KiB): {mem // 1024} ({mem / tokens:.1f} bytes/token)")
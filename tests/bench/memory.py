@@ -0,0 +1,117 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Memory benchmark of the compiler, compiles `tests/valid` and a generated
+# module (structs with methods and functions with loops, conditions and
+# calls) and reports the objects of the compiler (AST nodes, symbols, types,
+# tokens, RIR...) alive and the memory allocated after each stage, run it
+# with:
+#   python3 tests/bench/memory.py [functions]
+
+import os, sys, gc, contextlib, tempfile, tracemalloc
+
+sys.path.insert(0, "rivetc")
+sys.setrecursionlimit(10000)
+from src import Compiler, prefs, stats, report, sym
+
+prefs.RIVETC_DIR = os.getcwd() # to find `lib/`
+
+def generate(file, n):
+	with open(file, "w") as f:
+		for i in range(n):
+			f.write(f"""struct Point{i} {{
+    x: int32;
+    y: int32;
+
+    func sum(&self) int32 {{
+        return self.x + self.y * {i % 7 + 1};
+    }}
+}}
+
+func compute{i}(a: int32, b: int32) int32 {{
+    mut c := a * {i} + b;
+    p := Point{i}(x: a, y: b);
+    while c > 100 {{
+        c -= p.sum();
+    }}
+    if c % 2 == 0 and b != {i} {{
+        c += 1;
+    }} else {{
+        c = c * 2 - a;
+    }}
+    return c + {"compute%d(c, a)" % (i - 1) if i > 0 else "0"};
+}}
+
+test "compute{i}" {{
+    @assert(compute{i}(1, 2) != 0 or true);
+}}
+
+""")
+
+# the output of the tests is discarded
+@contextlib.contextmanager
+def discard_output(enabled):
+	if not enabled:
+		yield
+		return
+	fds = (os.dup(1), os.dup(2))
+	with open(os.devnull, "w") as devnull:
+		os.dup2(devnull.fileno(), 1)
+		os.dup2(devnull.fileno(), 2)
+	try:
+		yield
+	finally:
+		os.dup2(fds[0], 1)
+		os.dup2(fds[1], 2)
+		os.close(fds[0])
+		os.close(fds[1])
+
+def count_objects():
+	return sum(1 for obj in gc.get_objects() if type(obj).__module__.startswith("src."))
+
+def bench(name, input):
+	report.ERRORS = 0
+	report.WARNS = 0
+	sym.SYMBOL_COUNT = 0
+	comp = Compiler(["--no-cache", "-t", input])
+	comp.stats.enabled = True
+	stages = {}
+	# passes with nested passes (`rir` runs `cgen`, ...) are measured when
+	# the first nested pass starts
+	nested = set()
+	timed = comp.stats.timed
+
+	def measure(pass_name):
+		current, peak = tracemalloc.get_traced_memory()
+		stages[pass_name] = (count_objects(), current, peak)
+
+	@contextlib.contextmanager
+	def timed_stage(pass_name):
+		if len(comp.stats.stack) > 0 and pass_name != "lexing":
+			outer = comp.stats.stack[-1].name
+			if outer not in nested:
+				nested.add(outer)
+				measure(outer)
+		with timed(pass_name), discard_output(pass_name == "tests"):
+			yield
+		if pass_name != "lexing" and pass_name not in nested:
+			measure(pass_name)
+
+	comp.stats.timed = timed_stage
+	gc.collect()
+	tracemalloc.start()
+	comp.build()
+	tracemalloc.stop()
+	print(f"{name}:")
+	print(f"  {'stage':<16}{'objects':>12}{'current (KiB)':>16}{'peak (KiB)':>14}")
+	for pass_name in stats.PASSES:
+		if stage := stages.get(pass_name):
+			print(f"  {pass_name:<16}{stage[0]:>12}{stage[1] // 1024:>16}{stage[2] // 1024:>14}")
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+with tempfile.TemporaryDirectory() as dir:
+	file = os.path.join(dir, "synthetic.ri")
+	generate(file, n)
+	bench("tests/valid", "tests/valid")
+	bench(f"synthetic ({n} functions)", file)
@@ -0,0 +1,68 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Micro-benchmark of the numeric types, checks a generated module with
+# arithmetic-heavy functions (mixed integer and float types, literals and
+# casts), reports the time of the checker and the time of the numeric
+# predicates of the compiler (`is_int`, `is_float`, `num_bits`...) over the
+# types of the module, run it with:
+#   python3 tests/bench/numbers.py [functions]
+
+import os, sys, time, tempfile
+
+sys.path.insert(0, "rivetc")
+from src import Compiler, prefs, type
+
+prefs.RIVETC_DIR = os.getcwd() # to find `lib/`
+
+PREDICATES = [
+	"is_number", "is_int", "is_signed_int", "is_unsigned_int", "is_float",
+	"is_comptime_number", "num_bits"
+]
+
+def generate(file, n):
+	with open(file, "w") as f:
+		for i in range(n):
+			f.write(f"""func arith{i}(a: int32, b: int64, c: uint8, d: usize, x: float64) float64 {{
+    mut r := a * {i + 1} + @cast(int32, c) - (a % 7) * 3;
+    mut s := b + @cast(int64, r) * 2 - {i} + (b / 3);
+    t := @cast(usize, c) + d * 4 + (d % 16) - 1;
+    r += @cast(int32, t & 0xFF) | (a >> 2);
+    s -= @cast(int64, r ^ 5) + (s * 2);
+    y := x * 2.5 + @cast(float64, s) / 3.0 - @cast(float64, t);
+    return y + @cast(float64, r) * 0.5 - x / {i + 1}.0;
+}}
+
+""")
+
+def types_of(comp):
+	return [
+		comp.int8_t, comp.int16_t, comp.int32_t, comp.int64_t, comp.isize_t,
+		comp.uint8_t, comp.uint16_t, comp.uint32_t, comp.uint64_t, comp.usize_t,
+		comp.comptime_int_t, comp.comptime_float_t, comp.float32_t,
+		comp.float64_t, comp.bool_t, comp.rune_t, comp.string_t,
+		comp.anyptr_t, type.Ref(comp.int32_t)
+	]
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+with tempfile.TemporaryDirectory() as dir:
+	file = os.path.join(dir, "numbers.ri")
+	generate(file, n)
+	comp = Compiler(["--no-cache", "--check", file])
+	comp.stats.enabled = True
+	comp.build()
+	print(f"{n} arithmetic functions")
+	print(f"{'checker (ms)':<24}{comp.stats.passes['checker'].cpu_time * 1000:>12.0f}")
+	types = types_of(comp)
+	print(f"{'predicate':<24}{'ns/call':>12}")
+	for name in PREDICATES:
+		predicate = getattr(comp, name)
+		calls = 0
+		start = time.perf_counter()
+		for _ in range(5000):
+			for typ in types:
+				predicate(typ)
+			calls += len(types)
+		elapsed = time.perf_counter() - start
+		print(f"{name:<24}{elapsed * 1e9 / calls:>12.0f}")
@@ -0,0 +1,63 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of the parser, parses some expression-heavy files several times
+# (the AST cache is disabled) and reports the best CPU time, the tokens per
+# second and the Python calls per token (which, unlike the time, does not
+# depend on the load of the machine) of each one; the files are parsed as
+# files of the root module, the last column is the time when they are parsed
+# as files of an imported module (the bodies of the top-level functions are
+# skipped, see `ast.LazyBody`), run it with:
+#   python3 tests/bench/parser.py [files...]
+
+import gc, sys, time
+
+sys.path.insert(0, "rivetc")
+from src import Compiler, sym, parser
+
+RUNS = 40
+
+def parse(comp, file, is_root = True):
+	p = parser.Parser(comp)
+	p.mod_sym = sym.Mod(False, "bench")
+	p.mod_sym.is_root = is_root
+	p.parse_file(file)
+	return len(p.lexer.kinds)
+
+def count_calls(comp, file):
+	calls = 0
+	def profile(frame, event, arg):
+		nonlocal calls
+		if event == "call":
+			calls += 1
+	sys.setprofile(profile)
+	try:
+		parse(comp, file)
+	finally:
+		sys.setprofile(None)
+	return calls
+
+def best_time(comp, file, is_root):
+	best = None
+	for _ in range(RUNS):
+		start = time.process_time()
+		parse(comp, file, is_root)
+		elapsed = time.process_time() - start
+		best = elapsed if best == None else min(best, elapsed)
+	return best
+
+comp = Compiler(["--no-cache", "lib/core"])
+files = sys.argv[1:] or [
+	"lib/rivet/src/parser/exprs.ri", "lib/core/src/string.ri"
+]
+gc.disable()
+print(f"{'file':<34}{'tokens':>8}{'time (ms)':>12}{'tokens/s':>12}{'calls/token':>14}{'lazy (ms)':>12}")
+for file in files:
+	tokens = parse(comp, file)
+	best = best_time(comp, file, True)
+	calls = count_calls(comp, file)
+	lazy_best = best_time(comp, file, False)
+	print(
+		f"{file:<34}{tokens:>8}{best * 1000:>12.2f}{tokens / best:>12.0f}{calls / tokens:>14.1f}{lazy_best * 1000:>12.2f}"
+	)
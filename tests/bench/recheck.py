@@ -0,0 +1,63 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of the re-checks of the watch mode, checks a generated module
+# (functions that call each other and use a constant), then changes the
+# body of one function and the value of the constant, and reports the time
+# of each build with and without `rechecker.Rechecker`, run it with:
+#   python3 tests/bench/recheck.py [functions]
+
+import os, sys, time, tempfile
+
+sys.path.insert(0, "rivetc")
+from src import prefs
+from src.watch import Watcher
+
+prefs.RIVETC_DIR = os.getcwd() # to find `lib/`
+
+def generate(file, n, body = 1, limit = 10):
+	with open(file, "w") as f:
+		f.write(f"const LIMIT: int32 = {limit};\n\n")
+		for i in range(n):
+			f.write(f"""func step{i}(a: int32, b: int32) int32 {{
+    mut res := a * {i + (body if i == n // 2 else 1)} + b;
+    if res > LIMIT {{
+        res = res % LIMIT;
+    }}
+    return res + step{max(i - 1, 0)}(b, 1) * {i % 3};
+}}
+
+""")
+		f.write("""func main() {
+    _ = step0(1, 2);
+}
+""")
+
+def build(watcher):
+	start = time.perf_counter()
+	exit_code = watcher.build(watcher.args)
+	assert exit_code == 0
+	return (time.perf_counter() - start) * 1000
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+with tempfile.TemporaryDirectory() as dir:
+	file = os.path.join(dir, "recheck.ri")
+	watchers = {}
+	for name in ("full", "rechecker"):
+		generate(file, n)
+		watcher = Watcher(["--check", file])
+		if name == "full":
+			watcher.rechecker.recheck = lambda comp: False
+		times = [build(watcher), build(watcher)]
+		generate(file, n, body = 2)
+		times.append(build(watcher))
+		generate(file, n, body = 2, limit = 20)
+		times.append(build(watcher))
+		watchers[name] = times
+	print(f"{n} functions")
+	print(f"{'build (ms)':<24}{'full':>12}{'rechecker':>12}")
+	for i, title in enumerate([
+		"first build", "nothing changed", "one function body", "constant value"
+	]):
+		print(f"{title:<24}{watchers['full'][i]:>12.0f}{watchers['rechecker'][i]:>12.0f}")
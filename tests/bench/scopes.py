@@ -0,0 +1,47 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of the lexical scopes, checks a generated module with long
+# functions (hundreds of locals, like machine-generated code) and deeply
+# nested blocks, and reports the time of the passes that declare and look
+# up the locals, run it with:
+#   python3 tests/bench/scopes.py [locals] [depth]
+
+import os, sys, tempfile
+
+sys.path.insert(0, "rivetc")
+from src import Compiler, prefs
+
+prefs.RIVETC_DIR = os.getcwd() # to find `lib/`
+
+FUNCTIONS = 20
+PASSES = ["parsing", "resolver", "checker"]
+
+def generate(file, locals, depth):
+	with open(file, "w") as f:
+		for i in range(FUNCTIONS):
+			f.write(f"func long{i}(arg: int32) int32 {{\n    v0 := arg;\n")
+			for j in range(1, locals):
+				f.write(f"    v{j} := v{j - 1} + v{j // 2} * arg;\n")
+			f.write(f"    return v{locals - 1};\n}}\n\n")
+			f.write(f"func nested{i}(arg: int32) int32 {{\n    mut res := arg;\n")
+			for j in range(depth):
+				indent = "    " * (j + 1)
+				f.write(f"{indent}if res > {j} {{\n{indent}    n{j} := res + arg;\n{indent}    res = n{j};\n")
+			for j in reversed(range(depth)):
+				f.write(f"{'    ' * (j + 1)}}}\n")
+			f.write("    return res;\n}\n\n")
+
+locals = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+depth = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+with tempfile.TemporaryDirectory() as dir:
+	file = os.path.join(dir, "scopes.ri")
+	generate(file, locals, depth)
+	comp = Compiler(["--no-cache", "--check", file])
+	comp.stats.enabled = True
+	comp.build()
+	print(f"{FUNCTIONS} functions with {locals} locals and {FUNCTIONS} with {depth} nested blocks")
+	print(f"{'pass':<12}{'time (ms)':>12}")
+	for name in PASSES:
+		print(f"{name:<12}{comp.stats.passes[name].cpu_time * 1000:>12.0f}")
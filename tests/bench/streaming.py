@@ -0,0 +1,42 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of the streaming mode of the lexer, parses a generated file of
+# tables (64 numbers per line) with and without streaming and reports the peak memory
+# used while it is parsed, run it with:
+#   python3 tests/bench/streaming.py [lines]
+
+import os, sys, time, tempfile, tracemalloc
+
+sys.path.insert(0, "rivetc")
+from src import Compiler, sym, lexer, parser
+
+def generate(file, lines):
+	with open(file, "w") as f:
+		for i in range(lines):
+			row = ", ".join(str((i * 64 + j) * 2654435761 % 4294967296) for j in range(64))
+			f.write(f"var TABLE_{i} = [{row}]!;\n")
+
+def bench(comp, file, is_streaming):
+	lexer.STREAMING_THRESHOLD = 0 if is_streaming else os.path.getsize(file) + 1
+	tracemalloc.start()
+	start = time.perf_counter()
+	p = parser.Parser(comp)
+	p.mod_sym = sym.Mod(False, "tables")
+	source_file = p.parse_file(file)
+	elapsed = time.perf_counter() - start
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	mode = "streaming" if is_streaming else "buffered"
+	print(f"{mode:<12}{elapsed * 1000:>12.2f}{peak // 1024:>16}{len(source_file.decls):>10}")
+
+lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+comp = Compiler(["--no-cache", "lib/core"])
+with tempfile.TemporaryDirectory() as dir:
+	file = os.path.join(dir, "tables.ri")
+	generate(file, lines)
+	print(f"file: {os.path.getsize(file) // 1024} KiB, {lines} lines")
+	print(f"{'mode':<12}{'time (ms)':>12}{'peak (KiB)':>16}{'decls':>10}")
+	bench(comp, file, False)
+	bench(comp, file, True)
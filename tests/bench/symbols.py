@@ -0,0 +1,47 @@
+# Copyright (C) 2023 The Rivet Developers. All rights reserved.
+# Use of this source code is governed by an MIT license that can
+# be found in the LICENSE file.
+
+# Benchmark of the symbol tables, checks a generated module that declares
+# thousands of types and functions (each one uses a vector, an array and a
+# tuple of its own type, which are added to the universe) and reports the
+# time of the passes that add and look up symbols, run it with:
+#   python3 tests/bench/symbols.py [types]
+
+import os, sys, tempfile
+
+sys.path.insert(0, "rivetc")
+from src import Compiler, prefs
+
+prefs.RIVETC_DIR = os.getcwd() # to find `lib/`
+
+PASSES = ["parsing", "register", "resolver", "checker"]
+
+def generate(file, n):
+	with open(file, "w") as f:
+		for i in range(n):
+			f.write(f"""struct Type{i} {{
+    value: int32;
+
+    func get(&self) int32 {{
+        return self.value;
+    }}
+}}
+
+func make{i}(values: []Type{i}, table: [2]Type{i}) (Type{i}, int32) {{
+    return (table[0], @cast(int32, values.len) + table[1].get());
+}}
+
+""")
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+with tempfile.TemporaryDirectory() as dir:
+	file = os.path.join(dir, "types.ri")
+	generate(file, n)
+	comp = Compiler(["--no-cache", "--check", file])
+	comp.stats.enabled = True
+	comp.build()
+	print(f"{n} types and functions, {len(comp.universe.syms)} symbols in the universe")
+	print(f"{'pass':<12}{'time (ms)':>12}")
+	for name in PASSES:
+		print(f"{name:<12}{comp.stats.passes[name].cpu_time * 1000:>12.0f}")